@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /api/analytics endpoints against a synthetic dataset.
+
+Builds product/invoice/orderdetails tables in a scratch schema of the
+Grocery database, fills them with generate_series, builds the
+product_sales_daily buckets and times the endpoint functions with a cold
+and a warm cache. The raw join over orderdetails is timed for comparison.
+
+    python benchmarks/bench_analytics.py --lines 10000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SCHEMA = "bench_analytics"
+# Every connection made by main.get_connection() resolves table names in the
+# scratch schema first
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+
+import main  # noqa: E402
+
+SETUP_SQL = """
+    DROP SCHEMA IF EXISTS {schema} CASCADE;
+    CREATE SCHEMA {schema};
+    SET search_path = {schema};
+
+    CREATE TABLE product (
+        p_id SERIAL PRIMARY KEY, name TEXT, category TEXT,
+        stock INTEGER, price NUMERIC(10, 2), s_id INTEGER,
+        store_id INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE TABLE invoice (
+        i_id SERIAL PRIMARY KEY, date DATE, amount NUMERIC(12, 2),
+        payment_method TEXT, c_id INTEGER, e_id INTEGER,
+        store_id INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE TABLE orderdetails (
+        order_id BIGINT PRIMARY KEY, quantity INTEGER, cost NUMERIC(12, 2),
+        i_id INTEGER, p_id INTEGER, store_id INTEGER NOT NULL DEFAULT 1
+    );
+
+    INSERT INTO product (name, category, stock, price, s_id)
+    SELECT 'Product ' || g, 'Category ' || (g %% %(categories)s), 100, 1 + (g %% 50), 1 + (g %% 20)
+    FROM generate_series(1, %(products)s) g;
+
+    INSERT INTO invoice (date, amount, payment_method)
+    SELECT %(first_day)s + (g %% %(days)s), 0, 'Cash'
+    FROM generate_series(1, %(invoices)s) g;
+
+    INSERT INTO orderdetails (order_id, quantity, cost, i_id, p_id)
+    SELECT g, 1 + (g %% 5), (1 + (g %% 5)) * 0.8, 1 + (g %% %(invoices)s), 1 + ((g * 7919) %% %(products)s)
+    FROM generate_series(1, %(lines)s) g;
+"""
+
+MIGRATIONS = ["0001_reorder_indexes.sql", "0003_product_sales_daily.sql"]
+
+# The store_id part of 0011_stores.sql; the rest of that migration needs
+# tables this benchmark does not create
+STORE_SQL = """
+    ALTER TABLE product_sales_daily ADD COLUMN store_id INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE product_sales_daily DROP CONSTRAINT product_sales_daily_pkey;
+    ALTER TABLE product_sales_daily ADD PRIMARY KEY (store_id, day, p_id) INCLUDE (units, cost);
+"""
+
+RAW_TOP_PRODUCTS_SQL = """
+    SELECT od.p_id, SUM(od.quantity * od.unit_price) AS revenue
+    FROM orderdetails od
+    JOIN invoice i ON i.i_id = od.i_id
+    WHERE i.date BETWEEN %s AND %s
+    GROUP BY od.p_id
+    ORDER BY revenue DESC
+    LIMIT 10;
+"""
+
+def build_dataset(args):
+    first_day = date.today() - timedelta(days=args.days - 1)
+    conn = main.get_connection()
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        cur.execute(SETUP_SQL.format(schema=SCHEMA), {
+            "products": args.products,
+            "categories": args.categories,
+            "invoices": max(args.lines // 4, 1),
+            "lines": args.lines,
+            "days": args.days,
+            "first_day": first_day,
+        })
+        migrations_dir = Path(__file__).resolve().parent.parent / "migrations"
+        for name in MIGRATIONS:
+            cur.execute((migrations_dir / name).read_text())
+        cur.execute(STORE_SQL)
+        # Needs the store_id columns added above
+        cur.execute((migrations_dir / "0016_order_line_prices.sql").read_text())
+        cur.execute("ANALYZE;")
+        conn.commit()
+        print(f"Built {args.lines:,} order lines in {time.perf_counter() - started:.1f}s")
+    finally:
+        cur.close()
+        conn.close()
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<40} p50 {statistics.median(samples):9.2f} ms   p95 {p95:9.2f} ms")
+
+def raw_join(start, end):
+    conn = main.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(RAW_TOP_PRODUCTS_SQL, (start, end))
+        cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+def cold(fn):
+    """Wrap fn so every call starts from an empty analytics cache"""
+    def call():
+        main.invalidate_analytics_cache()
+        return fn()
+    return call
+
+def run(args):
+    today = date.today()
+    for span in (7, 30, 90, 365):
+        start, end = today - timedelta(days=span - 1), today
+        top_products = lambda: main.get_top_products(start=start, end=end)
+        categories = lambda: main.get_category_sales(start=start, end=end)
+        report(f"top-products {span}d (cold)", timed(cold(top_products), args.repeat))
+        report(f"top-products {span}d (cached)", timed(top_products, args.repeat))
+        report(f"categories {span}d (cold)", timed(cold(categories), args.repeat))
+        report(f"raw orderdetails join {span}d", timed(lambda: raw_join(start, end), max(args.repeat // 5, 1)))
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=10_000_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--categories", type=int, default=40)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--skip-build", action="store_true", help="reuse the dataset from a previous run")
+    args = parser.parse_args()
+    if not args.skip_build:
+        build_dataset(args)
+    run(args)
+
+if __name__ == "__main__":
+    main_cli()
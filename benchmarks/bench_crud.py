@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark the table-driven CRUD engine against the previous handlers.
+
+The previous list/by-id handlers fetched rows through RealDictCursor and
+built the response with the dict-based transform_* functions; they are
+reproduced below as the baseline. Both paths run against the same
+synthetic customer and product tables in a scratch schema, and the script
+reports wall time and the number of allocated blocks per row (tracemalloc).
+
+    python benchmarks/bench_crud.py --rows 100000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SCHEMA = "bench_crud"
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+
+import psycopg2.extras  # noqa: E402
+
+import main  # noqa: E402
+
+SETUP_SQL = """
+    DROP SCHEMA IF EXISTS {schema} CASCADE;
+    CREATE SCHEMA {schema};
+    SET search_path = {schema};
+
+    CREATE TABLE customer (
+        c_id SERIAL PRIMARY KEY, first_name TEXT, second_name TEXT,
+        email TEXT, phone TEXT, address TEXT, store_id INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE TABLE product (
+        p_id SERIAL PRIMARY KEY, name TEXT, category TEXT,
+        stock INTEGER, price NUMERIC(10, 2), s_id INTEGER,
+        store_id INTEGER NOT NULL DEFAULT 1
+    );
+
+    INSERT INTO customer (first_name, second_name, email, phone, address)
+    SELECT 'First' || g, 'Second' || g, 'c' || g || '@example.com',
+           '98' || g || ', 97' || g, g || ' Market Road'
+    FROM generate_series(1, %(rows)s) g;
+
+    INSERT INTO product (name, category, stock, price, s_id)
+    SELECT 'Product ' || g, 'Category ' || (g %% 40), g %% 500, 1 + (g %% 50), 1 + (g %% 20)
+    FROM generate_series(1, %(rows)s) g;
+
+    ANALYZE;
+"""
+
+# ---------------------- BASELINE (previous handlers) ----------------------
+
+def legacy_transform_customer(row):
+    phone_str = row.get('phone', '')
+    phone_list = phone_str.split(',') if phone_str else []
+    phone_list = [p.strip() for p in phone_list if p.strip()]
+
+    return {
+        "C_id": str(row.get('c_id', '')),
+        "name": {
+            "firstName": row.get('first_name', ''),
+            "secondName": row.get('second_name', '')
+        },
+        "email": row.get('email', ''),
+        "phone": phone_list if phone_list else [phone_str] if phone_str else [],
+        "address": row.get('address', '')
+    }
+
+def legacy_transform_product(row):
+    return {
+        "P_id": str(row.get('p_id', '')),
+        "name": row.get('name', ''),
+        "category": row.get('category', ''),
+        "stock": row.get('stock', 0),
+        "price": float(row.get('price', 0))
+    }
+
+def legacy_list(table, pk, transform):
+    conn = main.get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute(f"SELECT * FROM {table} ORDER BY {pk};")
+        return [transform(row) for row in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+def legacy_get(table, pk, transform, value):
+    conn = main.get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute(f"SELECT * FROM {table} WHERE {pk} = %s;", (value,))
+        return transform(cur.fetchone())
+    finally:
+        cur.close()
+        conn.close()
+
+# ---------------------- HARNESS ----------------------
+
+def build_dataset(rows):
+    conn = main.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(SETUP_SQL.format(schema=SCHEMA), {"rows": rows})
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+def measure(fn, repeat):
+    """Return (median ms, allocated blocks during one call)"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    result = fn()
+    after = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del result
+    return statistics.median(samples), after - before
+
+def compare(label, baseline, engine, repeat, rows):
+    base_ms, base_blocks = measure(baseline, repeat)
+    new_ms, new_blocks = measure(engine, repeat)
+    print(f"{label}")
+    print(f"  previous handler  {base_ms:9.2f} ms   {base_blocks / rows:7.2f} blocks/row")
+    print(f"  CRUD engine       {new_ms:9.2f} ms   {new_blocks / rows:7.2f} blocks/row")
+    print(f"  speedup {base_ms / new_ms:5.2f}x   allocations {new_blocks / max(base_blocks, 1):5.2f}x")
+
+def run(args):
+    compare(
+        f"list customers ({args.rows:,} rows)",
+        lambda: legacy_list("customer", "c_id", legacy_transform_customer),
+        main.get_customers,
+        args.repeat, args.rows,
+    )
+    compare(
+        f"list products ({args.rows:,} rows)",
+        lambda: legacy_list("product", "p_id", legacy_transform_product),
+        main.get_products,
+        args.repeat, args.rows,
+    )
+    compare(
+        "product by id",
+        lambda: legacy_get("product", "p_id", legacy_transform_product, args.rows // 2),
+        lambda: main.get_product_by_id(args.rows // 2),
+        args.repeat * 50, 1,
+    )
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--skip-build", action="store_true", help="reuse the dataset from a previous run")
+    args = parser.parse_args()
+    if not args.skip_build:
+        build_dataset(args.rows)
+    # The previous handlers had no row cache; compare the database paths
+    main.PRODUCTS.cache_rows = False
+    run(args)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /api/invoices/{id}/full against the multi-call receipt flow.
+
+Without the nested endpoint a client builds a receipt from the invoice, the
+full order-details list (filtered client-side by i_id), one product call
+per line and the customer and employee calls. Both flows run in-process
+against a scratch schema; --rtt-ms adds a simulated network round trip per
+request, which is where most of the multi-call cost goes on a real network.
+
+    python benchmarks/bench_invoice_full.py --invoices 20000 --lines-per-invoice 5 --rtt-ms 2
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SCHEMA = "bench_invoice_full"
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+
+import main  # noqa: E402
+
+SETUP_SQL = """
+    DROP SCHEMA IF EXISTS {schema} CASCADE;
+    CREATE SCHEMA {schema};
+    SET search_path = {schema};
+
+    CREATE TABLE customer (
+        c_id SERIAL PRIMARY KEY, first_name TEXT, second_name TEXT,
+        email TEXT, phone TEXT, address TEXT, store_id INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE TABLE employee (e_id SERIAL PRIMARY KEY, name TEXT, role TEXT, phone TEXT, store_id INTEGER NOT NULL DEFAULT 1);
+    CREATE TABLE product (
+        p_id SERIAL PRIMARY KEY, name TEXT, category TEXT,
+        stock INTEGER, price NUMERIC(10, 2), s_id INTEGER,
+        store_id INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE TABLE invoice (
+        i_id SERIAL PRIMARY KEY, date DATE, amount NUMERIC(12, 2),
+        payment_method TEXT, c_id INTEGER, e_id INTEGER,
+        store_id INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE TABLE orderdetails (
+        order_id BIGINT PRIMARY KEY, quantity INTEGER, cost NUMERIC(12, 2),
+        i_id INTEGER, p_id INTEGER, invoice_date DATE,
+        store_id INTEGER NOT NULL DEFAULT 1
+    );
+
+    INSERT INTO customer (first_name, second_name, email, phone, address)
+    SELECT 'First' || g, 'Second' || g, 'c' || g || '@example.com', '98' || g, g || ' Market Road'
+    FROM generate_series(1, 2000) g;
+
+    INSERT INTO employee (name, role, phone)
+    SELECT 'Employee ' || g, 'Cashier', '97' || g
+    FROM generate_series(1, 50) g;
+
+    INSERT INTO product (name, category, stock, price, s_id)
+    SELECT 'Product ' || g, 'Category ' || (g %% 40), 100, 1 + (g %% 50), 1 + (g %% 20)
+    FROM generate_series(1, 5000) g;
+
+    INSERT INTO invoice (date, amount, payment_method, c_id, e_id)
+    SELECT CURRENT_DATE - (g %% 365), 0, 'Cash', 1 + (g %% 2000), 1 + (g %% 50)
+    FROM generate_series(1, %(invoices)s) g;
+
+    INSERT INTO orderdetails (order_id, quantity, cost, i_id, p_id, invoice_date)
+    SELECT g, 1 + (g %% 5), (1 + (g %% 5)) * 0.8, 1 + (g %% %(invoices)s), 1 + ((g * 7919) %% 5000),
+           CURRENT_DATE - ((1 + (g %% %(invoices)s)) %% 365)
+    FROM generate_series(1, %(invoices)s * %(lines_per_invoice)s) g;
+
+    CREATE INDEX orderdetails_i_id_idx ON orderdetails (i_id) INCLUDE (p_id, quantity);
+    ANALYZE;
+"""
+
+def build_dataset(args):
+    conn = main.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(SETUP_SQL.format(schema=SCHEMA), {
+            "invoices": args.invoices,
+            "lines_per_invoice": args.lines_per_invoice,
+        })
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+def multi_call_receipt(i_id, rtt):
+    """The receipt as a client assembles it today; returns the request count"""
+    invoice = main.get_invoice_by_id(i_id)
+    lines = [od for od in main.get_order_details() if od["i_id"] == i_id]
+    products = [main.get_product_by_id(od["p_id"]) for od in lines if od["p_id"] is not None]
+    customer = main.get_customer_by_id(invoice["c_id"])
+    employee = main.get_employee_by_id(invoice["e_id"])
+    requests = 4 + len(products)
+    time.sleep(rtt * requests)
+    return requests, (invoice, lines, products, customer, employee)
+
+def nested_receipt(i_id, rtt):
+    response = main.get_invoice_full(i_id)
+    time.sleep(rtt)
+    return 1, response
+
+def measure(flow, ids, rtt):
+    samples, requests = [], 0
+    for i_id in ids:
+        started = time.perf_counter()
+        count, _ = flow(i_id, rtt)
+        samples.append((time.perf_counter() - started) * 1000)
+        requests += count
+    return samples, requests / len(ids)
+
+def report(label, samples, requests):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<22} p50 {statistics.median(samples):9.2f} ms   p95 {p95:9.2f} ms   {requests:5.1f} requests")
+
+def run(args):
+    ids = random.Random(1).sample(range(1, args.invoices + 1), min(args.samples, args.invoices))
+    rtt = args.rtt_ms / 1000
+    report("multi-call flow", *measure(multi_call_receipt, ids, rtt))
+    report("/invoices/{id}/full", *measure(nested_receipt, ids, rtt))
+
+    started = time.perf_counter()
+    after, pages = 0, 0
+    while after is not None and pages < args.pages:
+        body = main.get_invoices_full(after=after, limit=50).body
+        after = json.loads(body)["next"]
+        pages += 1
+    print(f"/invoices/full         {(time.perf_counter() - started) * 1000 / pages:9.2f} ms per page of 50")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--invoices", type=int, default=20_000)
+    parser.add_argument("--lines-per-invoice", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=50, help="receipts fetched per flow")
+    parser.add_argument("--pages", type=int, default=20, help="pages fetched from the list variant")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated network round trip per request")
+    parser.add_argument("--skip-build", action="store_true", help="reuse the dataset from a previous run")
+    args = parser.parse_args()
+    if not args.skip_build:
+        build_dataset(args)
+    run(args)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark the API's own overhead (routing, validation, serialization) apart from the database.
+
+Runs with the in-memory storage engine (VIJAY_STORAGE=memory), so it needs
+no Postgres. Each operation is timed twice: calling the entity engine
+directly, and as a full HTTP request driven through the ASGI app in-process
+(middleware, routing, parameter parsing, response encoding). The difference
+is what the framework costs per request.
+
+    python benchmarks/bench_overhead.py --rows 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["VIJAY_STORAGE"] = "memory"
+
+import main  # noqa: E402
+
+def build_dataset(rows):
+    main.SUPPLIERS.store.load(
+        {"s_id": n, "name": f"Supplier {n}", "address": f"{n} Depot Road", "email": f"s{n}@example.com",
+         "phone": f"96{n}"}
+        for n in range(1, 21)
+    )
+    main.CUSTOMERS.store.load(
+        {"c_id": n, "first_name": f"First{n}", "second_name": f"Second{n}", "email": f"c{n}@example.com",
+         "phone": f"98{n}, 97{n}", "address": f"{n} Market Road"}
+        for n in range(1, rows + 1)
+    )
+    main.PRODUCTS.store.load(
+        {"p_id": n, "name": f"Product {n}", "category": f"Category {n % 40}", "stock": n % 500,
+         "price": 1 + n % 50, "s_id": 1 + n % 20}
+        for n in range(1, rows + 1)
+    )
+
+async def asgi_request(method, path, query="", body=None):
+    """Run one request through the app; returns (status, body bytes)"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": query.encode(),
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    status, chunks = None, []
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await main.app(scope, receive, send)
+    return status, b"".join(chunks)
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def compare(label, direct, method, path, query="", body=None, repeat=10):
+    loop = asyncio.new_event_loop()
+    try:
+        status, _ = loop.run_until_complete(asgi_request(method, path, query, body))
+        if status >= 400:
+            raise SystemExit(f"{method} {path}?{query} answered {status}")
+        direct_ms = measure(direct, repeat)
+        http_ms = measure(lambda: loop.run_until_complete(asgi_request(method, path, query, body)), repeat)
+    finally:
+        loop.close()
+    print(f"{label}")
+    print(f"  entity engine     {direct_ms:9.3f} ms")
+    print(f"  HTTP via ASGI     {http_ms:9.3f} ms   framework {http_ms - direct_ms:9.3f} ms ({http_ms / direct_ms:5.1f}x)")
+
+def run(args):
+    middle = args.rows // 2
+    product = {"name": "Bench product", "category": "Bench", "stock": 1, "price": 9.5, "s_id": 1}
+    compare(
+        f"list customers ({args.rows:,} rows)",
+        main.get_customers, "GET", "/api/customers", repeat=args.repeat,
+    )
+    compare(
+        "customers page of 200",
+        lambda: main.get_customers(after=middle, limit=200), "GET", "/api/customers", f"after={middle}&limit=200",
+        repeat=args.repeat * 20,
+    )
+    compare(
+        "product by id",
+        lambda: main.get_product_by_id(middle), "GET", f"/api/products/{middle}", repeat=args.repeat * 100,
+    )
+    compare(
+        "product by id, fields=name,price",
+        lambda: main.get_product_by_id(middle, "name,price"), "GET", f"/api/products/{middle}", "fields=name,price",
+        repeat=args.repeat * 100,
+    )
+    compare(
+        "update product",
+        lambda: main.update_product(middle, main.ProductRequest(**product)),
+        "PUT", f"/api/products/{middle}", body=product, repeat=args.repeat * 100,
+    )
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    build_dataset(args.rows)
+    run(args)
+
+if __name__ == "__main__":
+    main_cli()
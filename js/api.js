@@ -14,7 +14,8 @@ const API_ENDPOINTS = {
         create: `${API_BASE_URL}/customers`,
         update: (id) => `${API_BASE_URL}/customers/${id}`,
         delete: (id) => `${API_BASE_URL}/customers/${id}`,
-        getCount: `${API_BASE_URL}/customers/count`
+        getCount: `${API_BASE_URL}/customers/count`,
+        getTop: `${API_BASE_URL}/customers/top`
     },
 
     // Product endpoints
@@ -34,7 +35,8 @@ const API_ENDPOINTS = {
         create: `${API_BASE_URL}/suppliers`,
         update: (id) => `${API_BASE_URL}/suppliers/${id}`,
         delete: (id) => `${API_BASE_URL}/suppliers/${id}`,
-        getCount: `${API_BASE_URL}/suppliers/count`
+        getCount: `${API_BASE_URL}/suppliers/count`,
+        catalogueSync: (id, dryRun) => `${API_BASE_URL}/suppliers/${id}/catalogue-sync${dryRun ? '?dry_run=true' : ''}`
     },
 
     // Employee endpoints
@@ -54,7 +56,9 @@ const API_ENDPOINTS = {
         create: `${API_BASE_URL}/invoices`,
         update: (id) => `${API_BASE_URL}/invoices/${id}`,
         delete: (id) => `${API_BASE_URL}/invoices/${id}`,
-        getCount: `${API_BASE_URL}/invoices/count`
+        getCount: `${API_BASE_URL}/invoices/count`,
+        getFull: (id) => `${API_BASE_URL}/invoices/${id}/full`,
+        getFullPage: (after = 0, limit = 50) => `${API_BASE_URL}/invoices/full?after=${after}&limit=${limit}`
     },
 
     // Purchase Order endpoints
@@ -64,7 +68,9 @@ const API_ENDPOINTS = {
         create: `${API_BASE_URL}/purchase-orders`,
         update: (id) => `${API_BASE_URL}/purchase-orders/${id}`,
         delete: (id) => `${API_BASE_URL}/purchase-orders/${id}`,
-        getCount: `${API_BASE_URL}/purchase-orders/count`
+        getCount: `${API_BASE_URL}/purchase-orders/count`,
+        lines: (id) => `${API_BASE_URL}/purchase-orders/${id}/lines`,
+        receive: (id) => `${API_BASE_URL}/purchase-orders/${id}/receive`
     },
 
     // Order Details endpoints
@@ -75,53 +81,151 @@ const API_ENDPOINTS = {
         update: (id) => `${API_BASE_URL}/order-details/${id}`,
         delete: (id) => `${API_BASE_URL}/order-details/${id}`,
         getCount: `${API_BASE_URL}/order-details/count`
+    },
+
+    // Inventory endpoints
+    inventory: {
+        reorder: `${API_BASE_URL}/inventory/reorder`
+    },
+
+    // Analytics endpoints
+    analytics: {
+        topProducts: `${API_BASE_URL}/analytics/top-products`,
+        categories: `${API_BASE_URL}/analytics/categories`
+    },
+
+    // Background job endpoints
+    jobs: {
+        getAll: `${API_BASE_URL}/jobs`,
+        getById: (id) => `${API_BASE_URL}/jobs/${id}`,
+        create: `${API_BASE_URL}/jobs`,
+        getResult: (id) => `${API_BASE_URL}/jobs/${id}/result`
     }
 };
 
+const RETRYABLE_METHODS = ['GET', 'POST', 'PUT'];
+const RETRYABLE_STATUSES = [408, 429, 502, 503, 504];
+const MAX_ATTEMPTS = 4;
+
+/**
+ * Generate a key identifying one logical write across retries.
+ * crypto.randomUUID is only available in secure contexts, and the app is
+ * often opened over the store network by IP, so fall back to Math.random.
+ */
+function newIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
 /**
  * API Hook - Generic fetch function with error handling
+ * GET, POST and PUT requests are retried with backoff on network errors
+ * and transient statuses. POST and PUT carry an Idempotency-Key so the
+ * server answers a retried write from its stored response instead of
+ * writing twice. A 409 is a permanent conflict unless it carries
+ * Retry-After: the earlier attempt of the same write is still running.
  */
 async function apiFetch(url, options = {}) {
-    try {
-        const defaultOptions = {
-            headers: {
-                'Content-Type': 'application/json',
-            },
-        };
-
-        const config = {
-            ...defaultOptions,
-            ...options,
-            headers: {
-                ...defaultOptions.headers,
-                ...options.headers,
-            },
-        };
-
-        const response = await fetch(url, config);
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+    const method = (options.method || 'GET').toUpperCase();
+    const defaultOptions = {
+        headers: {
+            'Content-Type': 'application/json',
+        },
+    };
+    if (method === 'POST' || method === 'PUT') {
+        defaultOptions.headers['Idempotency-Key'] = newIdempotencyKey();
+    }
+    // The store this browser works in; the server's default store without it
+    const storeId = localStorage.getItem('storeId');
+    if (storeId) {
+        defaultOptions.headers['X-Store-Id'] = storeId;
+    }
+
+    const config = {
+        ...defaultOptions,
+        ...options,
+        headers: {
+            ...defaultOptions.headers,
+            ...options.headers,
+        },
+    };
+    const attempts = RETRYABLE_METHODS.includes(method) ? MAX_ATTEMPTS : 1;
+
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(url, config);
+
+            if (!response.ok) {
+                const retryable = RETRYABLE_STATUSES.includes(response.status)
+                    || (response.status === 409 && response.headers.has('Retry-After'));
+                if (attempt < attempts && retryable) {
+                    await sleep(250 * 2 ** (attempt - 1));
+                    continue;
+                }
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const data = await response.json();
+            return { success: true, data };
+        } catch (error) {
+            // fetch rejects with a TypeError when the network is unreachable
+            if (error instanceof TypeError && attempt < attempts) {
+                await sleep(250 * 2 ** (attempt - 1));
+                continue;
+            }
+            console.error('API Error:', error);
+            return { success: false, error: error.message };
         }
+    }
+}
+
+/**
+ * Append a sparse fieldset to a list or by-id URL, e.g.
+ * withFields(url, ['P_id', 'name']) -> url?fields=P_id,name
+ */
+function withFields(url, fields) {
+    if (!fields || fields.length === 0) {
+        return url;
+    }
+    const list = Array.isArray(fields) ? fields.join(',') : fields;
+    return `${url}${url.includes('?') ? '&' : '?'}fields=${encodeURIComponent(list)}`;
+}
 
-        const data = await response.json();
-        return { success: true, data };
-    } catch (error) {
-        console.error('API Error:', error);
-        return { success: false, error: error.message };
+/**
+ * Append keyset paging to a list URL: the rows after id `after` (from the
+ * start when omitted), at most `limit` of them
+ */
+function withPage(url, after, limit) {
+    const params = [];
+    if (after !== undefined && after !== null) params.push(`after=${encodeURIComponent(after)}`);
+    if (limit) params.push(`limit=${limit}`);
+    if (params.length === 0) {
+        return url;
     }
+    return `${url}${url.includes('?') ? '&' : '?'}${params.join('&')}`;
 }
 
 /**
  * API Hooks - Custom hooks for each entity
+ * getAll(fields) and getById(id, fields) accept an optional list of
+ * output fields to fetch only those columns; getPage(after, limit, fields)
+ * fetches one page in id order.
  */
 const useCustomers = () => {
-    const getAll = async () => {
-        return await apiFetch(API_ENDPOINTS.customers.getAll);
+    const getAll = async (fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.customers.getAll, fields));
     };
 
-    const getById = async (id) => {
-        return await apiFetch(API_ENDPOINTS.customers.getById(id));
+    const getPage = async (after, limit, fields) => {
+        return await apiFetch(withFields(withPage(API_ENDPOINTS.customers.getAll, after, limit), fields));
+    };
+
+    const getById = async (id, fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.customers.getById(id), fields));
     };
 
     const create = async (customerData) => {
@@ -148,16 +252,20 @@ const useCustomers = () => {
         return await apiFetch(API_ENDPOINTS.customers.getCount);
     };
 
-    return { getAll, getById, create, update, remove, getCount };
+    return { getAll, getPage, getById, create, update, remove, getCount };
 };
 
 const useProducts = () => {
-    const getAll = async () => {
-        return await apiFetch(API_ENDPOINTS.products.getAll);
+    const getAll = async (fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.products.getAll, fields));
+    };
+
+    const getPage = async (after, limit, fields) => {
+        return await apiFetch(withFields(withPage(API_ENDPOINTS.products.getAll, after, limit), fields));
     };
 
-    const getById = async (id) => {
-        return await apiFetch(API_ENDPOINTS.products.getById(id));
+    const getById = async (id, fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.products.getById(id), fields));
     };
 
     const create = async (productData) => {
@@ -184,16 +292,20 @@ const useProducts = () => {
         return await apiFetch(API_ENDPOINTS.products.getCount);
     };
 
-    return { getAll, getById, create, update, remove, getCount };
+    return { getAll, getPage, getById, create, update, remove, getCount };
 };
 
 const useSuppliers = () => {
-    const getAll = async () => {
-        return await apiFetch(API_ENDPOINTS.suppliers.getAll);
+    const getAll = async (fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.suppliers.getAll, fields));
     };
 
-    const getById = async (id) => {
-        return await apiFetch(API_ENDPOINTS.suppliers.getById(id));
+    const getPage = async (after, limit, fields) => {
+        return await apiFetch(withFields(withPage(API_ENDPOINTS.suppliers.getAll, after, limit), fields));
+    };
+
+    const getById = async (id, fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.suppliers.getById(id), fields));
     };
 
     const create = async (supplierData) => {
@@ -220,16 +332,29 @@ const useSuppliers = () => {
         return await apiFetch(API_ENDPOINTS.suppliers.getCount);
     };
 
-    return { getAll, getById, create, update, remove, getCount };
+    // csv: the supplier's full list with a name,category,stock,price header
+    const syncCatalogue = async (id, csv, dryRun = false) => {
+        return await apiFetch(API_ENDPOINTS.suppliers.catalogueSync(id, dryRun), {
+            method: 'POST',
+            headers: { 'Content-Type': 'text/csv' },
+            body: csv,
+        });
+    };
+
+    return { getAll, getPage, getById, create, update, remove, getCount, syncCatalogue };
 };
 
 const useEmployees = () => {
-    const getAll = async () => {
-        return await apiFetch(API_ENDPOINTS.employees.getAll);
+    const getAll = async (fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.employees.getAll, fields));
+    };
+
+    const getPage = async (after, limit, fields) => {
+        return await apiFetch(withFields(withPage(API_ENDPOINTS.employees.getAll, after, limit), fields));
     };
 
-    const getById = async (id) => {
-        return await apiFetch(API_ENDPOINTS.employees.getById(id));
+    const getById = async (id, fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.employees.getById(id), fields));
     };
 
     const create = async (employeeData) => {
@@ -256,16 +381,20 @@ const useEmployees = () => {
         return await apiFetch(API_ENDPOINTS.employees.getCount);
     };
 
-    return { getAll, getById, create, update, remove, getCount };
+    return { getAll, getPage, getById, create, update, remove, getCount };
 };
 
 const useInvoices = () => {
-    const getAll = async () => {
-        return await apiFetch(API_ENDPOINTS.invoices.getAll);
+    const getAll = async (fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.invoices.getAll, fields));
+    };
+
+    const getPage = async (after, limit, fields) => {
+        return await apiFetch(withFields(withPage(API_ENDPOINTS.invoices.getAll, after, limit), fields));
     };
 
-    const getById = async (id) => {
-        return await apiFetch(API_ENDPOINTS.invoices.getById(id));
+    const getById = async (id, fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.invoices.getById(id), fields));
     };
 
     const create = async (invoiceData) => {
@@ -292,16 +421,30 @@ const useInvoices = () => {
         return await apiFetch(API_ENDPOINTS.invoices.getCount);
     };
 
-    return { getAll, getById, create, update, remove, getCount };
+    // Invoice with its lines, product names, customer and employee
+    const getFull = async (id) => {
+        return await apiFetch(API_ENDPOINTS.invoices.getFull(id));
+    };
+
+    // { items, next }: pass next back as `after` for the following page
+    const getFullPage = async (after, limit) => {
+        return await apiFetch(API_ENDPOINTS.invoices.getFullPage(after, limit));
+    };
+
+    return { getAll, getPage, getById, create, update, remove, getCount, getFull, getFullPage };
 };
 
 const usePurchaseOrders = () => {
-    const getAll = async () => {
-        return await apiFetch(API_ENDPOINTS.purchaseOrders.getAll);
+    const getAll = async (fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.purchaseOrders.getAll, fields));
     };
 
-    const getById = async (id) => {
-        return await apiFetch(API_ENDPOINTS.purchaseOrders.getById(id));
+    const getPage = async (after, limit, fields) => {
+        return await apiFetch(withFields(withPage(API_ENDPOINTS.purchaseOrders.getAll, after, limit), fields));
+    };
+
+    const getById = async (id, fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.purchaseOrders.getById(id), fields));
     };
 
     const create = async (purchaseOrderData) => {
@@ -328,16 +471,38 @@ const usePurchaseOrders = () => {
         return await apiFetch(API_ENDPOINTS.purchaseOrders.getCount);
     };
 
-    return { getAll, getById, create, update, remove, getCount };
+    const getLines = async (id) => {
+        return await apiFetch(API_ENDPOINTS.purchaseOrders.lines(id));
+    };
+
+    // lines: [{ p_id, quantity, cost }]
+    const setLines = async (id, lines) => {
+        return await apiFetch(API_ENDPOINTS.purchaseOrders.lines(id), {
+            method: 'PUT',
+            body: JSON.stringify({ lines }),
+        });
+    };
+
+    const receive = async (id) => {
+        return await apiFetch(API_ENDPOINTS.purchaseOrders.receive(id), {
+            method: 'POST',
+        });
+    };
+
+    return { getAll, getPage, getById, create, update, remove, getCount, getLines, setLines, receive };
 };
 
 const useOrderDetails = () => {
-    const getAll = async () => {
-        return await apiFetch(API_ENDPOINTS.orderDetails.getAll);
+    const getAll = async (fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.orderDetails.getAll, fields));
+    };
+
+    const getPage = async (after, limit, fields) => {
+        return await apiFetch(withFields(withPage(API_ENDPOINTS.orderDetails.getAll, after, limit), fields));
     };
 
-    const getById = async (id) => {
-        return await apiFetch(API_ENDPOINTS.orderDetails.getById(id));
+    const getById = async (id, fields) => {
+        return await apiFetch(withFields(API_ENDPOINTS.orderDetails.getById(id), fields));
     };
 
     const create = async (orderDetailsData) => {
@@ -364,7 +529,7 @@ const useOrderDetails = () => {
         return await apiFetch(API_ENDPOINTS.orderDetails.getCount);
     };
 
-    return { getAll, getById, create, update, remove, getCount };
+    return { getAll, getPage, getById, create, update, remove, getCount };
 };
 
 // Export hooks for use in main.js
@@ -138,42 +138,38 @@ async function loadDashboard() {
 }
 
 // Customers
+let customersTable = null;
+
+function renderCustomerRow(customer) {
+    const phones = Array.isArray(customer.phone) ? customer.phone.join(', ') : customer.phone || '';
+    return `
+        <tr>
+            <td>${customer.C_id || customer.id || ''}</td>
+            <td>${customer.name?.firstName || customer.firstName || ''}</td>
+            <td>${customer.name?.secondName || customer.secondName || ''}</td>
+            <td>${customer.email || ''}</td>
+            <td>${phones}</td>
+            <td>${customer.address || ''}</td>
+            <td>
+                <div class="btn-group">
+                    <button class="btn btn-edit" onclick="editCustomer('${customer.C_id || customer.id}')">Edit</button>
+                    <button class="btn btn-danger" onclick="deleteCustomer('${customer.C_id || customer.id}')">Delete</button>
+                </div>
+            </td>
+        </tr>
+    `;
+}
+
 async function loadCustomers() {
-    const tbody = document.getElementById('customers-table-body');
-    tbody.innerHTML = '<tr><td colspan="7" class="loading">Loading customers...</td></tr>';
-    
-    const result = await customersHook.getAll();
-    
-    if (result.success && result.data) {
-        const customers = Array.isArray(result.data) ? result.data : result.data.customers || [];
-        
-        if (customers.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="7" class="empty">No customers found</td></tr>';
-            return;
-        }
-        
-        tbody.innerHTML = customers.map(customer => {
-            const phones = Array.isArray(customer.phone) ? customer.phone.join(', ') : customer.phone || '';
-            return `
-                <tr>
-                    <td>${customer.C_id || customer.id || ''}</td>
-                    <td>${customer.name?.firstName || customer.firstName || ''}</td>
-                    <td>${customer.name?.secondName || customer.secondName || ''}</td>
-                    <td>${customer.email || ''}</td>
-                    <td>${phones}</td>
-                    <td>${customer.address || ''}</td>
-                    <td>
-                        <div class="btn-group">
-                            <button class="btn btn-edit" onclick="editCustomer('${customer.C_id || customer.id}')">Edit</button>
-                            <button class="btn btn-danger" onclick="deleteCustomer('${customer.C_id || customer.id}')">Delete</button>
-                        </div>
-                    </td>
-                </tr>
-            `;
-        }).join('');
-    } else {
-        tbody.innerHTML = '<tr><td colspan="7" class="empty">Error loading customers. Please check API connection.</td></tr>';
-    }
+    customersTable ??= new VirtualTable({
+        tbody: document.getElementById('customers-table-body'),
+        columns: 7,
+        rowKey: (customer) => customer.C_id || customer.id,
+        renderRow: renderCustomerRow,
+        fetchPage: (after, limit) => customersHook.getPage(after, limit),
+        noun: 'customers',
+    });
+    await customersTable.reload();
 }
 
 function openCustomerModal(id = null) {
@@ -214,7 +210,7 @@ async function deleteCustomer(id) {
     const result = await customersHook.remove(id);
     if (result.success) {
         alert('Customer deleted successfully');
-        loadCustomers();
+        customersTable?.remove(id);
         loadDashboard();
     } else {
         alert('Error deleting customer: ' + result.error);
@@ -222,38 +218,36 @@ async function deleteCustomer(id) {
 }
 
 // Products
+let productsTable = null;
+
+function renderProductRow(product) {
+    return `
+        <tr>
+            <td>${product.P_id || product.id || ''}</td>
+            <td>${product.name || ''}</td>
+            <td>${product.category || ''}</td>
+            <td>${product.stock || 0}</td>
+            <td>$${parseFloat(product.price || 0).toFixed(2)}</td>
+            <td>
+                <div class="btn-group">
+                    <button class="btn btn-edit" onclick="editProduct('${product.P_id || product.id}')">Edit</button>
+                    <button class="btn btn-danger" onclick="deleteProduct('${product.P_id || product.id}')">Delete</button>
+                </div>
+            </td>
+        </tr>
+    `;
+}
+
 async function loadProducts() {
-    const tbody = document.getElementById('products-table-body');
-    tbody.innerHTML = '<tr><td colspan="6" class="loading">Loading products...</td></tr>';
-    
-    const result = await productsHook.getAll();
-    
-    if (result.success && result.data) {
-        const products = Array.isArray(result.data) ? result.data : result.data.products || [];
-        
-        if (products.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="6" class="empty">No products found</td></tr>';
-            return;
-        }
-        
-        tbody.innerHTML = products.map(product => `
-            <tr>
-                <td>${product.P_id || product.id || ''}</td>
-                <td>${product.name || ''}</td>
-                <td>${product.category || ''}</td>
-                <td>${product.stock || 0}</td>
-                <td>$${parseFloat(product.price || 0).toFixed(2)}</td>
-                <td>
-                    <div class="btn-group">
-                        <button class="btn btn-edit" onclick="editProduct('${product.P_id || product.id}')">Edit</button>
-                        <button class="btn btn-danger" onclick="deleteProduct('${product.P_id || product.id}')">Delete</button>
-                    </div>
-                </td>
-            </tr>
-        `).join('');
-    } else {
-        tbody.innerHTML = '<tr><td colspan="6" class="empty">Error loading products. Please check API connection.</td></tr>';
-    }
+    productsTable ??= new VirtualTable({
+        tbody: document.getElementById('products-table-body'),
+        columns: 6,
+        rowKey: (product) => product.P_id || product.id,
+        renderRow: renderProductRow,
+        fetchPage: (after, limit) => productsHook.getPage(after, limit),
+        noun: 'products',
+    });
+    await productsTable.reload();
 }
 
 function openProductModal(id = null) {
@@ -293,7 +287,7 @@ async function deleteProduct(id) {
     const result = await productsHook.remove(id);
     if (result.success) {
         alert('Product deleted successfully');
-        loadProducts();
+        productsTable?.remove(id);
         loadDashboard();
     } else {
         alert('Error deleting product: ' + result.error);
@@ -301,41 +295,37 @@ async function deleteProduct(id) {
 }
 
 // Suppliers
+let suppliersTable = null;
+
+function renderSupplierRow(supplier) {
+    const phones = Array.isArray(supplier.phone) ? supplier.phone.join(', ') : supplier.phone || '';
+    return `
+        <tr>
+            <td>${supplier.S_id || supplier.id || ''}</td>
+            <td>${supplier.name || ''}</td>
+            <td>${supplier.address || ''}</td>
+            <td>${supplier.email || ''}</td>
+            <td>${phones}</td>
+            <td>
+                <div class="btn-group">
+                    <button class="btn btn-edit" onclick="editSupplier('${supplier.S_id || supplier.id}')">Edit</button>
+                    <button class="btn btn-danger" onclick="deleteSupplier('${supplier.S_id || supplier.id}')">Delete</button>
+                </div>
+            </td>
+        </tr>
+    `;
+}
+
 async function loadSuppliers() {
-    const tbody = document.getElementById('suppliers-table-body');
-    tbody.innerHTML = '<tr><td colspan="6" class="loading">Loading suppliers...</td></tr>';
-    
-    const result = await suppliersHook.getAll();
-    
-    if (result.success && result.data) {
-        const suppliers = Array.isArray(result.data) ? result.data : result.data.suppliers || [];
-        
-        if (suppliers.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="6" class="empty">No suppliers found</td></tr>';
-            return;
-        }
-        
-        tbody.innerHTML = suppliers.map(supplier => {
-            const phones = Array.isArray(supplier.phone) ? supplier.phone.join(', ') : supplier.phone || '';
-            return `
-                <tr>
-                    <td>${supplier.S_id || supplier.id || ''}</td>
-                    <td>${supplier.name || ''}</td>
-                    <td>${supplier.address || ''}</td>
-                    <td>${supplier.email || ''}</td>
-                    <td>${phones}</td>
-                    <td>
-                        <div class="btn-group">
-                            <button class="btn btn-edit" onclick="editSupplier('${supplier.S_id || supplier.id}')">Edit</button>
-                            <button class="btn btn-danger" onclick="deleteSupplier('${supplier.S_id || supplier.id}')">Delete</button>
-                        </div>
-                    </td>
-                </tr>
-            `;
-        }).join('');
-    } else {
-        tbody.innerHTML = '<tr><td colspan="6" class="empty">Error loading suppliers. Please check API connection.</td></tr>';
-    }
+    suppliersTable ??= new VirtualTable({
+        tbody: document.getElementById('suppliers-table-body'),
+        columns: 6,
+        rowKey: (supplier) => supplier.S_id || supplier.id,
+        renderRow: renderSupplierRow,
+        fetchPage: (after, limit) => suppliersHook.getPage(after, limit),
+        noun: 'suppliers',
+    });
+    await suppliersTable.reload();
 }
 
 function openSupplierModal(id = null) {
@@ -375,7 +365,7 @@ async function deleteSupplier(id) {
     const result = await suppliersHook.remove(id);
     if (result.success) {
         alert('Supplier deleted successfully');
-        loadSuppliers();
+        suppliersTable?.remove(id);
         loadDashboard();
     } else {
         alert('Error deleting supplier: ' + result.error);
@@ -383,40 +373,36 @@ async function deleteSupplier(id) {
 }
 
 // Employees
+let employeesTable = null;
+
+function renderEmployeeRow(employee) {
+    const phones = Array.isArray(employee.phone) ? employee.phone.join(', ') : employee.phone || '';
+    return `
+        <tr>
+            <td>${employee.E_id || employee.id || ''}</td>
+            <td>${employee.name || ''}</td>
+            <td>${employee.role || ''}</td>
+            <td>${phones}</td>
+            <td>
+                <div class="btn-group">
+                    <button class="btn btn-edit" onclick="editEmployee('${employee.E_id || employee.id}')">Edit</button>
+                    <button class="btn btn-danger" onclick="deleteEmployee('${employee.E_id || employee.id}')">Delete</button>
+                </div>
+            </td>
+        </tr>
+    `;
+}
+
 async function loadEmployees() {
-    const tbody = document.getElementById('employees-table-body');
-    tbody.innerHTML = '<tr><td colspan="5" class="loading">Loading employees...</td></tr>';
-    
-    const result = await employeesHook.getAll();
-    
-    if (result.success && result.data) {
-        const employees = Array.isArray(result.data) ? result.data : result.data.employees || [];
-        
-        if (employees.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="5" class="empty">No employees found</td></tr>';
-            return;
-        }
-        
-        tbody.innerHTML = employees.map(employee => {
-            const phones = Array.isArray(employee.phone) ? employee.phone.join(', ') : employee.phone || '';
-            return `
-                <tr>
-                    <td>${employee.E_id || employee.id || ''}</td>
-                    <td>${employee.name || ''}</td>
-                    <td>${employee.role || ''}</td>
-                    <td>${phones}</td>
-                    <td>
-                        <div class="btn-group">
-                            <button class="btn btn-edit" onclick="editEmployee('${employee.E_id || employee.id}')">Edit</button>
-                            <button class="btn btn-danger" onclick="deleteEmployee('${employee.E_id || employee.id}')">Delete</button>
-                        </div>
-                    </td>
-                </tr>
-            `;
-        }).join('');
-    } else {
-        tbody.innerHTML = '<tr><td colspan="5" class="empty">Error loading employees. Please check API connection.</td></tr>';
-    }
+    employeesTable ??= new VirtualTable({
+        tbody: document.getElementById('employees-table-body'),
+        columns: 5,
+        rowKey: (employee) => employee.E_id || employee.id,
+        renderRow: renderEmployeeRow,
+        fetchPage: (after, limit) => employeesHook.getPage(after, limit),
+        noun: 'employees',
+    });
+    await employeesTable.reload();
 }
 
 function openEmployeeModal(id = null) {
@@ -455,7 +441,7 @@ async function deleteEmployee(id) {
     const result = await employeesHook.remove(id);
     if (result.success) {
         alert('Employee deleted successfully');
-        loadEmployees();
+        employeesTable?.remove(id);
         loadDashboard();
     } else {
         alert('Error deleting employee: ' + result.error);
@@ -463,37 +449,35 @@ async function deleteEmployee(id) {
 }
 
 // Invoices
+let invoicesTable = null;
+
+function renderInvoiceRow(invoice) {
+    return `
+        <tr>
+            <td>${invoice.Lid || invoice.id || ''}</td>
+            <td>${invoice.date || ''}</td>
+            <td>$${parseFloat(invoice.amount || 0).toFixed(2)}</td>
+            <td>${invoice.paymentMethod || invoice.payment_method || ''}</td>
+            <td>
+                <div class="btn-group">
+                    <button class="btn btn-edit" onclick="editInvoice('${invoice.Lid || invoice.id}')">Edit</button>
+                    <button class="btn btn-danger" onclick="deleteInvoice('${invoice.Lid || invoice.id}')">Delete</button>
+                </div>
+            </td>
+        </tr>
+    `;
+}
+
 async function loadInvoices() {
-    const tbody = document.getElementById('invoices-table-body');
-    tbody.innerHTML = '<tr><td colspan="5" class="loading">Loading invoices...</td></tr>';
-    
-    const result = await invoicesHook.getAll();
-    
-    if (result.success && result.data) {
-        const invoices = Array.isArray(result.data) ? result.data : result.data.invoices || [];
-        
-        if (invoices.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="5" class="empty">No invoices found</td></tr>';
-            return;
-        }
-        
-        tbody.innerHTML = invoices.map(invoice => `
-            <tr>
-                <td>${invoice.Lid || invoice.id || ''}</td>
-                <td>${invoice.date || ''}</td>
-                <td>$${parseFloat(invoice.amount || 0).toFixed(2)}</td>
-                <td>${invoice.paymentMethod || invoice.payment_method || ''}</td>
-                <td>
-                    <div class="btn-group">
-                        <button class="btn btn-edit" onclick="editInvoice('${invoice.Lid || invoice.id}')">Edit</button>
-                        <button class="btn btn-danger" onclick="deleteInvoice('${invoice.Lid || invoice.id}')">Delete</button>
-                    </div>
-                </td>
-            </tr>
-        `).join('');
-    } else {
-        tbody.innerHTML = '<tr><td colspan="5" class="empty">Error loading invoices. Please check API connection.</td></tr>';
-    }
+    invoicesTable ??= new VirtualTable({
+        tbody: document.getElementById('invoices-table-body'),
+        columns: 5,
+        rowKey: (invoice) => invoice.Lid || invoice.id,
+        renderRow: renderInvoiceRow,
+        fetchPage: (after, limit) => invoicesHook.getPage(after, limit),
+        noun: 'invoices',
+    });
+    await invoicesTable.reload();
 }
 
 function openInvoiceModal(id = null) {
@@ -532,7 +516,7 @@ async function deleteInvoice(id) {
     const result = await invoicesHook.remove(id);
     if (result.success) {
         alert('Invoice deleted successfully');
-        loadInvoices();
+        invoicesTable?.remove(id);
         loadDashboard();
     } else {
         alert('Error deleting invoice: ' + result.error);
@@ -540,36 +524,34 @@ async function deleteInvoice(id) {
 }
 
 // Purchase Orders
+let purchaseOrdersTable = null;
+
+function renderPurchaseOrderRow(po) {
+    return `
+        <tr>
+            <td>${po.Purchase_id || po.PurchaseId || po.id || ''}</td>
+            <td>${po.date || ''}</td>
+            <td>$${parseFloat(po.amount || 0).toFixed(2)}</td>
+            <td>
+                <div class="btn-group">
+                    <button class="btn btn-edit" onclick="editPurchaseOrder('${po.Purchase_id || po.PurchaseId || po.id}')">Edit</button>
+                    <button class="btn btn-danger" onclick="deletePurchaseOrder('${po.Purchase_id || po.PurchaseId || po.id}')">Delete</button>
+                </div>
+            </td>
+        </tr>
+    `;
+}
+
 async function loadPurchaseOrders() {
-    const tbody = document.getElementById('purchase-orders-table-body');
-    tbody.innerHTML = '<tr><td colspan="4" class="loading">Loading purchase orders...</td></tr>';
-    
-    const result = await purchaseOrdersHook.getAll();
-    
-    if (result.success && result.data) {
-        const purchaseOrders = Array.isArray(result.data) ? result.data : result.data.purchaseOrders || [];
-        
-        if (purchaseOrders.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="4" class="empty">No purchase orders found</td></tr>';
-            return;
-        }
-        
-        tbody.innerHTML = purchaseOrders.map(po => `
-            <tr>
-                <td>${po.Purchase_id || po.PurchaseId || po.id || ''}</td>
-                <td>${po.date || ''}</td>
-                <td>$${parseFloat(po.amount || 0).toFixed(2)}</td>
-                <td>
-                    <div class="btn-group">
-                        <button class="btn btn-edit" onclick="editPurchaseOrder('${po.Purchase_id || po.PurchaseId || po.id}')">Edit</button>
-                        <button class="btn btn-danger" onclick="deletePurchaseOrder('${po.Purchase_id || po.PurchaseId || po.id}')">Delete</button>
-                    </div>
-                </td>
-            </tr>
-        `).join('');
-    } else {
-        tbody.innerHTML = '<tr><td colspan="4" class="empty">Error loading purchase orders. Please check API connection.</td></tr>';
-    }
+    purchaseOrdersTable ??= new VirtualTable({
+        tbody: document.getElementById('purchase-orders-table-body'),
+        columns: 4,
+        rowKey: (po) => po.Purchase_id || po.PurchaseId || po.id,
+        renderRow: renderPurchaseOrderRow,
+        fetchPage: (after, limit) => purchaseOrdersHook.getPage(after, limit),
+        noun: 'purchase orders',
+    });
+    await purchaseOrdersTable.reload();
 }
 
 function openPurchaseOrderModal(id = null) {
@@ -607,7 +589,7 @@ async function deletePurchaseOrder(id) {
     const result = await purchaseOrdersHook.remove(id);
     if (result.success) {
         alert('Purchase order deleted successfully');
-        loadPurchaseOrders();
+        purchaseOrdersTable?.remove(id);
         loadDashboard();
     } else {
         alert('Error deleting purchase order: ' + result.error);
@@ -615,36 +597,34 @@ async function deletePurchaseOrder(id) {
 }
 
 // Order Details
+let orderDetailsTable = null;
+
+function renderOrderDetailRow(od) {
+    return `
+        <tr>
+            <td>${od.Order_Id || od.OrderId || od.id || ''}</td>
+            <td>${od.quantity || 0}</td>
+            <td>$${parseFloat(od.cost || 0).toFixed(2)}</td>
+            <td>
+                <div class="btn-group">
+                    <button class="btn btn-edit" onclick="editOrderDetails('${od.Order_Id || od.OrderId || od.id}')">Edit</button>
+                    <button class="btn btn-danger" onclick="deleteOrderDetails('${od.Order_Id || od.OrderId || od.id}')">Delete</button>
+                </div>
+            </td>
+        </tr>
+    `;
+}
+
 async function loadOrderDetails() {
-    const tbody = document.getElementById('order-details-table-body');
-    tbody.innerHTML = '<tr><td colspan="4" class="loading">Loading order details...</td></tr>';
-    
-    const result = await orderDetailsHook.getAll();
-    
-    if (result.success && result.data) {
-        const orderDetails = Array.isArray(result.data) ? result.data : result.data.orderDetails || [];
-        
-        if (orderDetails.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="4" class="empty">No order details found</td></tr>';
-            return;
-        }
-        
-        tbody.innerHTML = orderDetails.map(od => `
-            <tr>
-                <td>${od.Order_Id || od.OrderId || od.id || ''}</td>
-                <td>${od.quantity || 0}</td>
-                <td>$${parseFloat(od.cost || 0).toFixed(2)}</td>
-                <td>
-                    <div class="btn-group">
-                        <button class="btn btn-edit" onclick="editOrderDetails('${od.Order_Id || od.OrderId || od.id}')">Edit</button>
-                        <button class="btn btn-danger" onclick="deleteOrderDetails('${od.Order_Id || od.OrderId || od.id}')">Delete</button>
-                    </div>
-                </td>
-            </tr>
-        `).join('');
-    } else {
-        tbody.innerHTML = '<tr><td colspan="4" class="empty">Error loading order details. Please check API connection.</td></tr>';
-    }
+    orderDetailsTable ??= new VirtualTable({
+        tbody: document.getElementById('order-details-table-body'),
+        columns: 4,
+        rowKey: (od) => od.Order_Id || od.OrderId || od.id,
+        renderRow: renderOrderDetailRow,
+        fetchPage: (after, limit) => orderDetailsHook.getPage(after, limit),
+        noun: 'order details',
+    });
+    await orderDetailsTable.reload();
 }
 
 function openOrderDetailsModal(id = null) {
@@ -683,7 +663,7 @@ async function deleteOrderDetails(id) {
     const result = await orderDetailsHook.remove(id);
     if (result.success) {
         alert('Order detail deleted successfully');
-        loadOrderDetails();
+        orderDetailsTable?.remove(id);
         loadDashboard();
     } else {
         alert('Error deleting order detail: ' + result.error);
@@ -726,7 +706,7 @@ function initializeForms() {
         if (result.success) {
             alert(id ? 'Customer updated successfully' : 'Customer created successfully');
             closeModal('customer-modal');
-            loadCustomers();
+            customersTable?.upsert(result.data);
             loadDashboard();
         } else {
             alert('Error: ' + result.error);
@@ -749,7 +729,7 @@ function initializeForms() {
         if (result.success) {
             alert(id ? 'Product updated successfully' : 'Product created successfully');
             closeModal('product-modal');
-            loadProducts();
+            productsTable?.upsert(result.data);
             loadDashboard();
         } else {
             alert('Error: ' + result.error);
@@ -772,7 +752,7 @@ function initializeForms() {
         if (result.success) {
             alert(id ? 'Supplier updated successfully' : 'Supplier created successfully');
             closeModal('supplier-modal');
-            loadSuppliers();
+            suppliersTable?.upsert(result.data);
             loadDashboard();
         } else {
             alert('Error: ' + result.error);
@@ -794,7 +774,7 @@ function initializeForms() {
         if (result.success) {
             alert(id ? 'Employee updated successfully' : 'Employee created successfully');
             closeModal('employee-modal');
-            loadEmployees();
+            employeesTable?.upsert(result.data);
             loadDashboard();
         } else {
             alert('Error: ' + result.error);
@@ -816,7 +796,7 @@ function initializeForms() {
         if (result.success) {
             alert(id ? 'Invoice updated successfully' : 'Invoice created successfully');
             closeModal('invoice-modal');
-            loadInvoices();
+            invoicesTable?.upsert(result.data);
             loadDashboard();
         } else {
             alert('Error: ' + result.error);
@@ -837,7 +817,7 @@ function initializeForms() {
         if (result.success) {
             alert(id ? 'Purchase order updated successfully' : 'Purchase order created successfully');
             closeModal('purchase-order-modal');
-            loadPurchaseOrders();
+            purchaseOrdersTable?.upsert(result.data);
             loadDashboard();
         } else {
             alert('Error: ' + result.error);
@@ -859,7 +839,11 @@ function initializeForms() {
         if (result.success) {
             alert(id ? 'Order detail updated successfully' : 'Order detail created successfully');
             closeModal('order-details-modal');
-            loadOrderDetails();
+            // Order_Id is editable, so the row may have moved to a new key
+            if (id && String(id) !== String(result.data.Order_Id)) {
+                orderDetailsTable?.remove(id);
+            }
+            orderDetailsTable?.upsert(result.data);
             loadDashboard();
         } else {
             alert('Error: ' + result.error);
@@ -0,0 +1,165 @@
+/**
+ * Virtual-scroll table body
+ * Renders only the rows in view (plus a margin) between two spacer rows,
+ * fetches further pages as the user scrolls towards the end and keeps
+ * its rows up to date in place after edits and deletes.
+ *
+ * const table = new VirtualTable({
+ *     tbody: document.getElementById('customers-table-body'),
+ *     columns: 7,
+ *     rowKey: (customer) => customer.C_id,
+ *     renderRow: (customer) => `<tr>...</tr>`,
+ *     fetchPage: (after, limit) => customersHook.getPage(after, limit),
+ *     noun: 'customers',
+ * });
+ * await table.reload();
+ */
+
+class VirtualTable {
+    constructor({ tbody, columns, rowKey, renderRow, fetchPage, noun = 'rows', pageSize = 200, overscan = 15, rowHeight = 57 }) {
+        this.tbody = tbody;
+        this.columns = columns;
+        this.rowKey = rowKey;
+        this.renderRow = renderRow;
+        this.fetchPage = fetchPage;
+        this.noun = noun;
+        this.pageSize = pageSize;
+        this.overscan = overscan;
+        this.rowHeight = rowHeight;
+        this.measured = false;
+
+        // The nearest .table-container is the scrolling viewport
+        this.viewport = tbody.closest('.table-container');
+        this.viewport.classList.add('virtual-scroll');
+
+        this.rows = [];
+        this.index = new Map();
+        this.done = false;
+        this.loading = null;
+        this.generation = 0;
+        this.frame = null;
+
+        this.viewport.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        window.addEventListener('resize', () => this.scheduleRender());
+    }
+
+    // Drop everything and fetch the first page again
+    async reload() {
+        this.generation++;
+        this.rows = [];
+        this.index = new Map();
+        this.done = false;
+        this.loading = null;
+        this.viewport.scrollTop = 0;
+        this.showMessage('loading', `Loading ${this.noun}...`);
+        await this.loadMore();
+    }
+
+    loadMore() {
+        if (this.done) {
+            return Promise.resolve();
+        }
+        if (!this.loading) {
+            const generation = this.generation;
+            const after = this.rows.length ? this.rowKey(this.rows[this.rows.length - 1]) : null;
+            this.loading = this.fetchPage(after, this.pageSize).then((result) => {
+                // A reload started while this page was in flight
+                if (generation !== this.generation) return;
+                this.loading = null;
+                if (!result.success) {
+                    this.done = true;
+                    if (this.rows.length === 0) {
+                        this.showMessage('empty', `Error loading ${this.noun}. Please check API connection.`);
+                    }
+                    return;
+                }
+                const page = Array.isArray(result.data) ? result.data : [];
+                this.done = page.length < this.pageSize;
+                page.forEach((row) => {
+                    this.index.set(String(this.rowKey(row)), this.rows.length);
+                    this.rows.push(row);
+                });
+                this.render();
+            });
+        }
+        return this.loading;
+    }
+
+    // Replace the row with the same key, or add a new one at the end once
+    // the last page has been fetched (until then it arrives with its page)
+    upsert(row) {
+        const key = String(this.rowKey(row));
+        if (this.index.has(key)) {
+            this.rows[this.index.get(key)] = row;
+        } else if (this.done) {
+            this.index.set(key, this.rows.length);
+            this.rows.push(row);
+        } else {
+            return;
+        }
+        this.scheduleRender();
+    }
+
+    remove(key) {
+        key = String(key);
+        const position = this.index.get(key);
+        if (position === undefined) return;
+        this.rows.splice(position, 1);
+        this.index.delete(key);
+        for (let i = position; i < this.rows.length; i++) {
+            this.index.set(String(this.rowKey(this.rows[i])), i);
+        }
+        this.scheduleRender();
+    }
+
+    scheduleRender() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.render();
+            });
+        }
+    }
+
+    render() {
+        if (this.rows.length === 0) {
+            if (this.loading) return;
+            this.showMessage('empty', `No ${this.noun} found`);
+            return;
+        }
+        const visible = Math.ceil(this.viewport.clientHeight / this.rowHeight) || 20;
+        const first = Math.max(0, Math.floor(this.viewport.scrollTop / this.rowHeight) - this.overscan);
+        const last = Math.min(this.rows.length, first + visible + 2 * this.overscan);
+
+        this.tbody.innerHTML =
+            this.spacer(first * this.rowHeight) +
+            this.rows.slice(first, last).map(this.renderRow).join('') +
+            this.spacer((this.rows.length - last) * this.rowHeight);
+
+        if (!this.measured) {
+            // Use the real row height from now on
+            const row = this.tbody.children[1];
+            if (row && row.offsetHeight) {
+                this.measured = true;
+                if (row.offsetHeight !== this.rowHeight) {
+                    this.rowHeight = row.offsetHeight;
+                    this.scheduleRender();
+                }
+            }
+        }
+        if (!this.done && last >= this.rows.length - this.overscan) {
+            this.loadMore();
+        }
+    }
+
+    spacer(height) {
+        if (height <= 0) return '';
+        return `<tr class="virtual-spacer" style="height: ${height}px"><td colspan="${this.columns}"></td></tr>`;
+    }
+
+    showMessage(className, text) {
+        this.tbody.innerHTML = `<tr><td colspan="${this.columns}" class="${className}">${text}</td></tr>`;
+    }
+}
+
+window.VirtualTable = VirtualTable;
@@ -1,25 +1,649 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional, List
+from collections import Counter, OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+import asyncio
+import bisect
+import contextvars
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import threading
+import time
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import psycopg2.extras
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("vijay_sales")
+
+PROCESS_STARTED = time.monotonic()
 
 # ---------------------- DATABASE CONNECTION ----------------------
 
+DB_CONFIG = {
+    "host": "localhost",
+    "database": "Grocery",
+    "user": "postgres",
+    "password": "Sector@20",
+    "port": 5432,
+}
+DB_POOL_MAX = 20
+DB_POOL_TIMEOUT = 30
+# Connections opened, checked and given their prepared statements at startup
+DB_POOL_MIN = 4
+DB_STARTUP_TIMEOUT = 60
+# "postgres", or "memory" to keep the seven entity tables in process memory
+# (MemoryStore) for benchmarks and tests on a machine without Postgres
+STORAGE_BACKEND = os.environ.get("VIJAY_STORAGE", "postgres")
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection whose close() hands it back to its pool.
+
+    `prepared` records the server-side prepared statements that exist on
+    this session, so they are prepared once per physical connection and
+    again automatically on a replacement connection after a reconnect.
+    `audit_entries` collects the audit entries of the open transaction;
+    they are handed to the audit log on commit and dropped on rollback.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.prepared = set()
+        self.audit_entries = []
+
+    def commit(self):
+        super().commit()
+        if self.audit_entries:
+            entries, self.audit_entries = self.audit_entries, []
+            audit_log.submit(entries)
+
+    def rollback(self):
+        self.audit_entries.clear()
+        super().rollback()
+
+    def close(self):
+        pool, self.pool = self.pool, None
+        if pool is None:
+            return super().close()
+        # A connection that is broken, or cannot be rolled back, is closed
+        # for good; release() then frees its slot for a replacement
+        try:
+            if not self.closed and self.status != psycopg2.extensions.STATUS_READY:
+                self.rollback()
+        except Exception:
+            super().close()
+        finally:
+            pool.release(self)
+
+class ConnectionPool:
+    """Thread-safe LIFO pool of PooledConnection, growing up to `maxconn`"""
+
+    def __init__(self, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT, **config):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.config = config
+        self.idle = []
+        self.size = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            deadline = time.monotonic() + self.timeout
+            while True:
+                while self.idle:
+                    conn = self.idle.pop()
+                    if not conn.closed:
+                        conn.pool = self
+                        return conn
+                    self.size -= 1
+                if self.size < self.maxconn:
+                    self.size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise psycopg2.OperationalError("Timed out waiting for a database connection")
+                self.condition.wait(remaining)
+        try:
+            conn = psycopg2.connect(connection_factory=PooledConnection, **self.config)
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        conn.pool = self
+        return conn
+
+    def prefill(self, count):
+        """Open up to `count` connections, check each with a query and return them to the pool"""
+        conns = []
+        try:
+            for _ in range(min(count, self.maxconn)):
+                conn = self.acquire()
+                conns.append(conn)
+                cur = conn.cursor()
+                try:
+                    cur.execute("SELECT 1;")
+                    cur.fetchone()
+                finally:
+                    cur.close()
+                conn.rollback()
+            return len(conns)
+        finally:
+            for conn in conns:
+                conn.close()
+
+    def release(self, conn):
+        with self.condition:
+            if conn.closed:
+                self.size -= 1
+            else:
+                self.idle.append(conn)
+            self.condition.notify()
+
+    def close_all(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+        for conn in idle:
+            psycopg2.extensions.connection.close(conn)
+
+db_pool = ConnectionPool(**DB_CONFIG)
+
 def get_connection():
-    return psycopg2.connect(
-        host="localhost",
-        database="Grocery",
-        user="postgres",
-        password="Sector@20",
-        port=5432
-    )
+    return db_pool.acquire()
+
+# Hot statements are registered by name and run with EXECUTE, so Postgres
+# parses and plans them once per pooled connection instead of on every call.
+PREPARED_STATEMENTS = {}
+
+def register_prepared(name, sql):
+    """Register `sql` (with %s placeholders) to be run as prepared statement `name`"""
+    placeholders = sql.count("%s")
+    parts = sql.rstrip().rstrip(";").split("%s")
+    body = parts[0] + "".join(f"${n}{part}" for n, part in enumerate(parts[1:], start=1))
+    PREPARED_STATEMENTS[name] = (f"PREPARE {name} AS {body};", placeholders, sql)
+    return name
+
+def execute_prepared(cur, name, params=()):
+    """Run registered statement `name`, preparing it first on this connection if needed"""
+    prepared = cur.connection.prepared
+    prepare_sql, placeholders, _ = PREPARED_STATEMENTS[name]
+    if name not in prepared:
+        cur.execute(prepare_sql)
+        prepared.add(name)
+    try:
+        if placeholders:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * placeholders)});", params)
+        else:
+            cur.execute(f"EXECUTE {name};")
+    except psycopg2.errors.InvalidSqlStatementName:
+        # The session lost its prepared statements (e.g. DISCARD ALL);
+        # forget them so the next use on this connection prepares again
+        prepared.clear()
+        raise
+
+def prepare_all(conn):
+    """Prepare every registered statement on `conn`; returns the names that failed
+
+    A statement over a table whose migration has not been applied yet fails
+    here and is simply prepared again on first use.
+    """
+    failed = []
+    cur = conn.cursor()
+    try:
+        for name, (prepare_sql, _, _) in PREPARED_STATEMENTS.items():
+            if name in conn.prepared:
+                continue
+            try:
+                cur.execute(prepare_sql)
+                conn.commit()
+                conn.prepared.add(name)
+            except psycopg2.Error:
+                conn.rollback()
+                failed.append(name)
+    finally:
+        cur.close()
+    return failed
+
+# ---------------------- IDEMPOTENCY KEYS ----------------------
+
+# POST/PUT requests carrying an Idempotency-Key header are run at most once.
+# The first request reserves the key in idempotency_keys and stores its
+# response; replays with the same key are answered from an in-memory LRU of
+# completed responses, falling back to the table, without reaching the
+# handler again.
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_CACHE_SIZE = 10000
+IDEMPOTENCY_CLEANUP_INTERVAL = 60 * 60
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+class IdempotencyStore:
+    """Idempotency-Key reservations and stored responses"""
+
+    def __init__(self, capacity=IDEMPOTENCY_CACHE_SIZE):
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.last_cleanup = 0.0
+
+    def cached(self, key):
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["created_at"] > IDEMPOTENCY_TTL:
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return entry
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.cache[key] = entry
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+
+    def begin(self, key, fingerprint):
+        """Reserve key for a new request.
+
+        Returns None when the caller should run the request, otherwise the
+        stored entry (status_code None while the first request is in flight).
+        """
+        entry = self.cached(key)
+        if entry is not None:
+            return entry
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            self.cleanup(cur)
+            # Take over reservations that were never completed (e.g. the
+            # process died mid-request) once they are old enough
+            cur.execute("""
+                INSERT INTO idempotency_keys (key, fingerprint)
+                VALUES (%s, %s)
+                ON CONFLICT (key) DO UPDATE
+                SET fingerprint = EXCLUDED.fingerprint, created_at = now()
+                WHERE idempotency_keys.status_code IS NULL
+                  AND idempotency_keys.created_at < now() - %s * interval '1 second'
+                RETURNING key;
+            """, (key, fingerprint, IDEMPOTENCY_LOCK_TIMEOUT))
+            reserved = cur.fetchone()
+            if not reserved:
+                cur.execute("""
+                    SELECT fingerprint, status_code, headers, body, extract(epoch FROM created_at)
+                    FROM idempotency_keys WHERE key = %s;
+                """, (key,))
+                row = cur.fetchone()
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        if reserved:
+            return None
+        if row is None:
+            # The reservation expired and was cleaned up between the two statements
+            return self.begin(key, fingerprint)
+        entry = {
+            "fingerprint": row[0],
+            "status_code": row[1],
+            "headers": row[2] or [],
+            "body": bytes(row[3]) if row[3] is not None else b"",
+            "created_at": float(row[4]),
+        }
+        if entry["status_code"] is not None:
+            self.remember(key, entry)
+        return entry
+
+    def complete(self, key, fingerprint, status_code, headers, body):
+        """Store the response of a reserved request"""
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE idempotency_keys
+                SET status_code = %s, headers = %s, body = %s
+                WHERE key = %s AND fingerprint = %s;
+            """, (status_code, json.dumps(headers), psycopg2.Binary(body), key, fingerprint))
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        self.remember(key, {
+            "fingerprint": fingerprint,
+            "status_code": status_code,
+            "headers": headers,
+            "body": body,
+            "created_at": time.time(),
+        })
+
+    def release(self, key, fingerprint):
+        """Drop a reservation so the request can be retried from scratch"""
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "DELETE FROM idempotency_keys WHERE key = %s AND fingerprint = %s AND status_code IS NULL;",
+                (key, fingerprint),
+            )
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+
+    def cleanup(self, cur):
+        """Delete expired keys, at most once per IDEMPOTENCY_CLEANUP_INTERVAL"""
+        now = time.monotonic()
+        if now - self.last_cleanup < IDEMPOTENCY_CLEANUP_INTERVAL:
+            return
+        self.last_cleanup = now
+        cur.execute(
+            "DELETE FROM idempotency_keys WHERE created_at < now() - %s * interval '1 second';",
+            (IDEMPOTENCY_TTL,),
+        )
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """IdempotencyStore kept in process memory, for VIJAY_STORAGE=memory"""
+
+    def __init__(self, capacity=IDEMPOTENCY_CACHE_SIZE):
+        super().__init__(capacity)
+        self.pending = {}
+
+    def begin(self, key, fingerprint):
+        entry = self.cached(key)
+        if entry is not None:
+            return entry
+        now = time.time()
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is not None and now - entry["created_at"] <= IDEMPOTENCY_LOCK_TIMEOUT:
+                return entry
+            self.pending[key] = {
+                "fingerprint": fingerprint,
+                "status_code": None,
+                "headers": [],
+                "body": b"",
+                "created_at": now,
+            }
+        return None
+
+    def complete(self, key, fingerprint, status_code, headers, body):
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None or entry["fingerprint"] != fingerprint:
+                return
+            del self.pending[key]
+        self.remember(key, {
+            "fingerprint": fingerprint,
+            "status_code": status_code,
+            "headers": headers,
+            "body": body,
+            "created_at": time.time(),
+        })
+
+    def release(self, key, fingerprint):
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                del self.pending[key]
+
+idempotency_store = MemoryIdempotencyStore() if STORAGE_BACKEND == "memory" else IdempotencyStore()
+
+class IdempotencyMiddleware:
+    """ASGI middleware that answers replayed POST/PUT requests from idempotency_store"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            return await self.app(scope, receive, send)
+        key = next((v for k, v in scope["headers"] if k == b"idempotency-key"), None)
+        if key is None:
+            return await self.app(scope, receive, send)
+        key = key.decode("latin-1").strip()
+        if not key or len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            return await JSONResponse(
+                {"detail": f"Idempotency-Key must be 1-{IDEMPOTENCY_MAX_KEY_LENGTH} characters"},
+                status_code=400,
+            )(scope, receive, send)
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        # The same request body means something else in another store
+        store = next((v for k, v in scope["headers"] if k == b"x-store-id"), b"")
+        fingerprint = hashlib.sha256(
+            scope["method"].encode() + b" " + scope["path"].encode() + b" " + store + b"\n" + body
+        ).hexdigest()
+
+        entry = await run_in_threadpool(idempotency_store.begin, key, fingerprint)
+        if entry is not None:
+            if entry["fingerprint"] != fingerprint:
+                response = JSONResponse(
+                    {"detail": "Idempotency-Key was already used for a different request"},
+                    status_code=422,
+                )
+            elif entry["status_code"] is None:
+                # Retry-After marks the one 409 a client should retry
+                response = JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress"},
+                    status_code=409,
+                    headers={"Retry-After": "1"},
+                )
+            else:
+                await send({
+                    "type": "http.response.start",
+                    "status": entry["status_code"],
+                    "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in entry["headers"]]
+                               + [(b"idempotent-replayed", b"true")],
+                })
+                await send({"type": "http.response.body", "body": entry["body"]})
+                return
+            return await response(scope, receive, send)
+
+        replayed_body = False
+
+        async def receive_body():
+            nonlocal replayed_body
+            if not replayed_body:
+                replayed_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        started = {}
+        response_chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                started["status"] = message["status"]
+                started["headers"] = [
+                    (k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, capture)
+        except Exception:
+            await run_in_threadpool(idempotency_store.release, key, fingerprint)
+            raise
+        status = started.get("status", 500)
+        if status >= 500:
+            # Server errors are not stored so the client can retry the write
+            await run_in_threadpool(idempotency_store.release, key, fingerprint)
+        else:
+            await run_in_threadpool(
+                idempotency_store.complete, key, fingerprint, status, started["headers"], b"".join(response_chunks)
+            )
+
+# ---------------------- LIFESPAN ----------------------
+
+# Startup opens and checks the connection pool before any traffic is
+# accepted (and gives up, failing the deploy, if the database stays
+# unreachable), then runs the sections' startup steps (job workers,
+# profiler). Warm-up (prepared statements, hot rows, counts) runs in the
+# background afterwards; /api/ready answers 503 until it has finished.
+STARTUP_STEPS = []
+SHUTDOWN_STEPS = []
+WARMUP_STEPS = []
+
+startup_state = {"ready": False, "readyAfter": None, "warmup": {}, "firstRequest": None}
+
+def on_startup(fn):
+    STARTUP_STEPS.append(fn)
+    return fn
+
+def on_shutdown(fn):
+    SHUTDOWN_STEPS.append(fn)
+    return fn
+
+def on_warmup(fn):
+    WARMUP_STEPS.append(fn)
+    return fn
+
+def open_database_pool():
+    """Fill the pool with checked connections, retrying until DB_STARTUP_TIMEOUT"""
+    deadline = time.monotonic() + DB_STARTUP_TIMEOUT
+    delay = 0.5
+    while True:
+        try:
+            db_pool.prefill(DB_POOL_MIN)
+            return
+        except psycopg2.OperationalError as e:
+            if time.monotonic() + delay > deadline:
+                raise
+            logger.warning("Database not reachable yet (%s); retrying in %.1fs", e, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+
+def warm_up():
+    # Every warm-up step reads Postgres
+    for fn in WARMUP_STEPS if STORAGE_BACKEND == "postgres" else ():
+        started = time.perf_counter()
+        try:
+            detail = fn()
+            startup_state["warmup"][fn.__name__] = {"seconds": round(time.perf_counter() - started, 3), "detail": detail}
+        except Exception as e:
+            logger.exception("Warm-up step %s failed", fn.__name__)
+            startup_state["warmup"][fn.__name__] = {"seconds": round(time.perf_counter() - started, 3), "error": str(e)}
+    startup_state["readyAfter"] = round(time.monotonic() - PROCESS_STARTED, 3)
+    startup_state["ready"] = True
+    logger.info("Ready %.2fs after start: %s", startup_state["readyAfter"], startup_state["warmup"])
+
+@on_warmup
+def prepare_statements():
+    """Prepare every registered statement on the connections opened at startup"""
+    conns = [db_pool.acquire() for _ in range(min(DB_POOL_MIN, db_pool.maxconn))]
+    try:
+        failed = set()
+        for conn in conns:
+            failed.update(prepare_all(conn))
+    finally:
+        for conn in conns:
+            conn.close()
+    return {"connections": len(conns), "statements": len(PREPARED_STATEMENTS), "notPrepared": sorted(failed)}
+
+@asynccontextmanager
+async def lifespan(app):
+    if STORAGE_BACKEND == "postgres":
+        await run_in_threadpool(open_database_pool)
+    for fn in STARTUP_STEPS:
+        await run_in_threadpool(fn)
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    try:
+        yield
+    finally:
+        for fn in reversed(SHUTDOWN_STEPS):
+            await run_in_threadpool(fn)
+        db_pool.close_all()
+
+class FirstRequestTimer:
+    """ASGI middleware logging how long after start the first request came and took"""
+
+    def __init__(self, app):
+        self.app = app
+        self.seen = False
+
+    async def __call__(self, scope, receive, send):
+        if self.seen or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self.seen = True
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            startup_state["firstRequest"] = {
+                "path": scope["path"],
+                "afterStart": round(started - PROCESS_STARTED, 3),
+                "beforeReady": not startup_state["ready"],
+                "seconds": round(time.monotonic() - started, 4),
+            }
+            logger.info("First request: %s", startup_state["firstRequest"])
+
+# ---------------------- STORES ----------------------
+
+# One database serves every shop. Each entity row belongs to a store
+# (store_id), and every request works on the store named by its X-Store-Id
+# header - DEFAULT_STORE_ID when the header is absent, so single-store
+# clients keep working unchanged. Cross-store figures come from the rollup
+# tables (/api/analytics/stores).
+DEFAULT_STORE_ID = int(os.environ.get("VIJAY_DEFAULT_STORE", "1"))
+current_store = contextvars.ContextVar("current_store", default=DEFAULT_STORE_ID)
+
+class StoreScopeMiddleware:
+    """ASGI middleware setting current_store from the X-Store-Id header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        value = next((v for k, v in scope["headers"] if k == b"x-store-id"), None)
+        if value is None:
+            return await self.app(scope, receive, send)
+        value = value.decode("latin-1").strip()
+        if not value.isdigit() or not 0 < int(value) < 2 ** 31:
+            return await JSONResponse(
+                {"detail": "X-Store-Id must be a positive integer"}, status_code=400
+            )(scope, receive, send)
+        token = current_store.set(int(value))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_store.reset(token)
 
 # ---------------------- FASTAPI SETUP ----------------------
 
-app = FastAPI(title="PostgreSQL API", description="API to manage database tables", version="1.0")
+app = FastAPI(title="PostgreSQL API", description="API to manage database tables", version="1.0", lifespan=lifespan)
+
+# Replays are answered inside CORS so they carry the same CORS headers
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(StoreScopeMiddleware)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -28,8 +652,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+app.add_middleware(FirstRequestTimer)
+
 # ---------------------- PYDANTIC MODELS ----------------------
 
 # Frontend request models
@@ -73,6 +700,14 @@ class PurchaseOrderRequest(BaseModel):
     amount: float
     s_id: Optional[int] = None
 
+class PurchaseOrderLine(BaseModel):
+    p_id: int
+    quantity: int
+    cost: float = 0.0
+
+class PurchaseOrderLinesRequest(BaseModel):
+    lines: List[PurchaseOrderLine]
+
 class OrderDetailsRequest(BaseModel):
     Order_Id: str
     quantity: int
@@ -80,86 +715,983 @@ class OrderDetailsRequest(BaseModel):
     i_id: Optional[int] = None
     p_id: Optional[int] = None
 
+class JobRequest(BaseModel):
+    type: str
+    params: dict = {}
+
+class TillSaleLine(BaseModel):
+    p_id: Optional[int] = None
+    quantity: int
+    price: float
+    cost: float = 0.0
+
+class TillSale(BaseModel):
+    clientRef: str
+    date: str
+    paymentMethod: str
+    c_id: Optional[int] = None
+    e_id: Optional[int] = None
+    lines: List[TillSaleLine]
+
+class TillSalesBatch(BaseModel):
+    tillId: str
+    sales: List[TillSale]
+
 # ---------------------- HELPER FUNCTIONS ----------------------
 
-def transform_customer_to_frontend(row):
-    """Transform database row to frontend format"""
-    phone_str = row.get('phone', '')
-    phone_list = phone_str.split(',') if phone_str else []
-    phone_list = [p.strip() for p in phone_list if p.strip()]
-    
-    return {
-        "C_id": str(row.get('c_id', '')),
-        "name": {
-            "firstName": row.get('first_name', ''),
-            "secondName": row.get('second_name', '')
-        },
-        "email": row.get('email', ''),
-        "phone": phone_list if phone_list else [phone_str] if phone_str else [],
-        "address": row.get('address', '')
-    }
+def split_phones(phone_str):
+    """Split the comma-separated phone column into a list"""
+    if not phone_str:
+        return []
+    phone_list = [p.strip() for p in phone_str.split(',') if p.strip()]
+    return phone_list if phone_list else [phone_str]
 
-def transform_product_to_frontend(row):
-    """Transform database row to frontend format"""
-    return {
-        "P_id": str(row.get('p_id', '')),
-        "name": row.get('name', ''),
-        "category": row.get('category', ''),
-        "stock": row.get('stock', 0),
-        "price": float(row.get('price', 0))
-    }
+def join_phones(phones):
+    return ', '.join(phones) if phones else ''
 
-def transform_supplier_to_frontend(row):
-    """Transform database row to frontend format"""
-    phone_str = row.get('phone', '')
-    phone_list = phone_str.split(',') if phone_str else []
-    phone_list = [p.strip() for p in phone_list if p.strip()]
-    
-    return {
-        "S_id": str(row.get('s_id', '')),
-        "name": row.get('name', ''),
-        "address": row.get('address', ''),
-        "email": row.get('email', ''),
-        "phone": phone_list if phone_list else [phone_str] if phone_str else []
-    }
+# Order lines booked by the server (till sales) draw ids from the
+# orderdetails sequence, which starts here; ids typed in by users stay below
+ORDER_ID_SERVER_START = 1_000_000_000
 
-def transform_employee_to_frontend(row):
-    """Transform database row to frontend format"""
-    phone_str = row.get('phone', '')
-    phone_list = phone_str.split(',') if phone_str else []
-    phone_list = [p.strip() for p in phone_list if p.strip()]
-    
+def order_id_from_request(order_detail):
+    """Convert the Order_Id string to int, rejecting non-numeric ids"""
+    if not order_detail.Order_Id.isdigit():
+        raise HTTPException(status_code=400, detail="Order_Id must be a valid integer")
+    return int(order_detail.Order_Id)
+
+def check_client_order_id(order_detail, current=None):
+    """Reject a new Order_Id in the server-assigned range (keeping `current` is fine)"""
+    order_id = order_id_from_request(order_detail)
+    if order_id >= ORDER_ID_SERVER_START and order_id != current:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Order_Id must be below {ORDER_ID_SERVER_START}; higher ids are assigned by the server",
+        )
+
+def transform_customer_summary_to_frontend(values):
+    """Transform (total_spend, invoice_count, first_purchase, last_purchase) to frontend format"""
+    total_spend, invoice_count, first_purchase, last_purchase = values
     return {
-        "E_id": str(row.get('e_id', '')),
-        "name": row.get('name', ''),
-        "role": row.get('role', ''),
-        "phone": phone_list if phone_list else [phone_str] if phone_str else []
+        "totalSpend": float(total_spend or 0),
+        "invoiceCount": invoice_count or 0,
+        "firstPurchase": str(first_purchase) if first_purchase else None,
+        "lastPurchase": str(last_purchase) if last_purchase else None
     }
 
-def transform_invoice_to_frontend(row):
-    """Transform database row to frontend format"""
-    return {
-        "Lid": str(row.get('i_id', '')),
-        "date": str(row.get('date', '')),
-        "amount": float(row.get('amount', 0)),
-        "paymentMethod": row.get('payment_method', '') or row.get('paymentMethod', '')
-    }
+# Writers of a customer's summary row hold this transaction-level advisory
+# lock on (CUSTOMER_SUMMARY_LOCK, c_id) until they commit. A refresh takes it
+# before reading the invoices, so it sees every increment it overwrites.
+CUSTOMER_SUMMARY_LOCK = 1
+
+RECORD_INVOICE_IN_SUMMARY = register_prepared("record_invoice_in_summary", f"""
+    INSERT INTO customer_summary (c_id, store_id, total_spend, invoice_count, first_purchase, last_purchase)
+    SELECT %s, %s, %s, 1, %s, %s
+    FROM (SELECT pg_advisory_xact_lock({CUSTOMER_SUMMARY_LOCK}, %s)) summary_lock
+    ON CONFLICT (c_id) DO UPDATE
+    SET total_spend = customer_summary.total_spend + EXCLUDED.total_spend,
+        invoice_count = customer_summary.invoice_count + 1,
+        first_purchase = LEAST(customer_summary.first_purchase, EXCLUDED.first_purchase),
+        last_purchase = GREATEST(customer_summary.last_purchase, EXCLUDED.last_purchase);
+""")
+
+def record_invoice_in_summary(cur, c_id, store_id, amount, date):
+    """Fold a newly created invoice into its customer's summary row"""
+    if c_id is None:
+        return
+    execute_prepared(cur, RECORD_INVOICE_IN_SUMMARY, (c_id, store_id, amount, date, date, c_id))
+
+def refresh_customer_summaries(cur, c_ids):
+    """Recompute the summary rows of the given customers from their invoices
+    and the totals of their archived invoices"""
+    c_ids = sorted({c_id for c_id in c_ids if c_id is not None})
+    if not c_ids:
+        return
+    # In id order, so two refreshes cannot deadlock; the totals below are
+    # read by a later statement, after any invoice create holding a lock
+    # has committed
+    cur.execute(
+        "SELECT pg_advisory_xact_lock(%s, c_id) FROM unnest(%s::int[]) AS c_id ORDER BY c_id;",
+        (CUSTOMER_SUMMARY_LOCK, c_ids),
+    )
+    # Uses invoice_c_id_idx, so only the affected customers' invoices are
+    # read; LEAST/GREATEST skip the NULL dates of a missing side
+    cur.execute("""
+        INSERT INTO customer_summary (c_id, store_id, total_spend, invoice_count, first_purchase, last_purchase)
+        SELECT c.c_id, c.store_id,
+               COALESCE(SUM(i.amount), 0) + COALESCE(MAX(a.total_spend), 0),
+               COUNT(i.c_id) + COALESCE(MAX(a.invoice_count), 0),
+               LEAST(MIN(i.date), MAX(a.first_purchase)),
+               GREATEST(MAX(i.date), MAX(a.last_purchase))
+        FROM customer c
+        LEFT JOIN customer_summary_archived a ON a.c_id = c.c_id
+        LEFT JOIN invoice i ON i.c_id = c.c_id AND i.store_id = c.store_id
+        WHERE c.c_id = ANY(%s)
+        GROUP BY c.c_id, c.store_id
+        ON CONFLICT (c_id) DO UPDATE
+        SET store_id = EXCLUDED.store_id,
+            total_spend = EXCLUDED.total_spend,
+            invoice_count = EXCLUDED.invoice_count,
+            first_purchase = EXCLUDED.first_purchase,
+            last_purchase = EXCLUDED.last_purchase;
+    """, (c_ids,))
+
+# Order lines can be shifted in or out of the sales buckets one line at a
+# time or a whole invoice at a time
+SALES_ROLLUP_SCOPES = {
+    "line": "od.order_id = %s",
+    "invoice": "od.i_id = %s",
+}
+
+for scope, condition in SALES_ROLLUP_SCOPES.items():
+    register_prepared(f"sales_lock_{scope}", f"SELECT 1 FROM orderdetails od WHERE {condition} FOR UPDATE;")
+    register_prepared(f"sales_shift_{scope}", f"""
+        INSERT INTO product_sales_daily (store_id, day, p_id, units, cost, revenue)
+        SELECT i.store_id, i.date, od.p_id, %s * SUM(od.quantity), %s * SUM(od.cost),
+               %s * COALESCE(SUM(od.quantity * od.unit_price), 0)
+        FROM orderdetails od
+        JOIN invoice i ON i.i_id = od.i_id AND i.store_id = od.store_id
+        WHERE {condition} AND od.p_id IS NOT NULL
+        GROUP BY i.store_id, i.date, od.p_id
+        ON CONFLICT (store_id, day, p_id) DO UPDATE
+        SET units = product_sales_daily.units + EXCLUDED.units,
+            cost = product_sales_daily.cost + EXCLUDED.cost,
+            revenue = product_sales_daily.revenue + EXCLUDED.revenue;
+    """)
+
+def shift_sales_rollup(cur, scope, key, sign):
+    """Add (sign=1) or subtract (sign=-1) the order lines of one line or one
+    invoice to/from the product_sales_daily buckets of their invoice date"""
+    # Lock the lines first so a concurrent edit cannot slip in between the
+    # subtraction of a line's old contribution and the addition of its new one
+    execute_prepared(cur, f"sales_lock_{scope}", (key,))
+    execute_prepared(cur, f"sales_shift_{scope}", (sign, sign, sign, key))
+
+# ---------------------- CRUD ENGINE ----------------------
+
+# The seven entity tables share one engine driven by the metadata below.
+# Rows are fetched with plain tuple cursors and turned into frontend dicts by
+# a mapper function generated once per entity at import time, so each row
+# costs one tuple and one output dict instead of a RealDictRow plus a second
+# dict built through repeated row.get() calls.
+
+# Output coercions, as expression templates over the fetched value
+COERCIONS = {
+    "raw": "{v}",
+    "str": "str({v})",
+    "float": "(float({v}) if {v} is not None else 0.0)",
+    "text_or_empty": "({v} or '')",
+    "phones": "split_phones({v})",
+}
+
+MAPPER_NAMESPACE = {"split_phones": split_phones}
+
+def compile_row_mapper(name, columns, fields):
+    """Generate a function turning a row tuple of `columns` into the output dict.
+
+    `fields` is a list of (output_name, spec) where spec is either
+    (column, coercion) or a nested list of fields.
+    """
+    index = {column: i for i, column in enumerate(columns)}
+
+    def expression(spec):
+        if isinstance(spec, list):
+            return "{" + ", ".join(f"{out!r}: {expression(sub)}" for out, sub in spec) + "}"
+        column, coercion = spec
+        return COERCIONS[coercion].format(v=f"row[{index[column]}]")
+
+    source = f"def {name}(row):\n    return {expression(fields)}\n"
+    namespace = dict(MAPPER_NAMESPACE)
+    exec(compile(source, f"<row mapper {name}>", "exec"), namespace)
+    return namespace[name]
+
+def field_columns(spec):
+    """Columns an output field spec reads, in order"""
+    if isinstance(spec, list):
+        return [column for _, sub in spec for column in field_columns(sub)]
+    return [spec[0]]
+
+PAGE_SIZE = 200
+PAGE_SIZE_MAX = 1000
+
+def check_page_limit(limit):
+    if limit is None:
+        return PAGE_SIZE
+    if limit <= 0 or limit > PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {PAGE_SIZE_MAX}")
+    return limit
+
+class EntityView:
+    """The columns, row mapper and read statements for a subset of an entity's fields"""
+
+    def __init__(self, entity, field_names, suffix):
+        self.field_names = field_names
+        fields = [(out, spec) for out, spec in entity.fields if out in field_names]
+        columns = []
+        for _, spec in fields:
+            columns += [c for c in field_columns(spec) if c not in columns]
+        self.columns = tuple(columns)
+        self.transform = compile_row_mapper(f"transform_{entity.name}{suffix}_to_frontend", self.columns, fields)
+
+        # Every statement is scoped to one store; lists and pages walk the
+        # (store_id, pk) index
+        select_list = ", ".join(self.columns)
+        self.list_sql = f"SELECT {select_list} FROM {entity.table} WHERE store_id = %s ORDER BY {entity.pk};"
+        self.get_sql = f"SELECT {select_list} FROM {entity.table} WHERE {entity.pk} = %s AND store_id = %s;"
+        self.get_statement = register_prepared(f"{entity.name}{suffix}_get", self.get_sql)
+        # Keyset pages: the first one, then the rows after a given id
+        self.first_page_statement = register_prepared(
+            f"{entity.name}{suffix}_first_page",
+            f"SELECT {select_list} FROM {entity.table} WHERE store_id = %s ORDER BY {entity.pk} LIMIT %s;",
+        )
+        self.next_page_statement = register_prepared(
+            f"{entity.name}{suffix}_next_page",
+            f"SELECT {select_list} FROM {entity.table} WHERE store_id = %s AND {entity.pk} > %s "
+            f"ORDER BY {entity.pk} LIMIT %s;",
+        )
+
+class PostgresStore:
+    """An entity's rows in its Postgres table, read and written through prepared statements.
+
+    Writes run in one transaction together with the entity's write hooks
+    and are committed before returning.
+    """
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.find_sql = {
+            column: f"SELECT {{columns}} FROM {entity.table} WHERE store_id = %s AND {column} = %s ORDER BY {entity.pk};"
+            for column in entity.indexed
+        }
 
-def transform_purchase_order_to_frontend(row):
-    """Transform database row to frontend format"""
-    return {
-        "Purchase_id": str(row.get('purchase_id', '')),
-        "date": str(row.get('date', '')),
-        "amount": float(row.get('amount', 0))
-    }
+    def rows(self, store_id, view, after=None, limit=None):
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            if limit is None:
+                cur.execute(view.list_sql, (store_id,))
+            elif after is None:
+                execute_prepared(cur, view.first_page_statement, (store_id, limit))
+            else:
+                execute_prepared(cur, view.next_page_statement, (store_id, after, limit))
+            return cur.fetchall()
+        finally:
+            cur.close()
+            conn.close()
+
+    def row(self, store_id, view, pk):
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            execute_prepared(cur, view.get_statement, (pk, store_id))
+            return cur.fetchone()
+        finally:
+            cur.close()
+            conn.close()
+
+    def find(self, store_id, view, column, value):
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(self.find_sql[column].format(columns=", ".join(view.columns)), (store_id, value))
+            return cur.fetchall()
+        finally:
+            cur.close()
+            conn.close()
+
+    def count(self, store_id):
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(self.entity.count_sql, (store_id,))
+            return cur.fetchone()[0]
+        finally:
+            cur.close()
+            conn.close()
+
+    def owns(self, store_id, pk, cur):
+        """Whether the store has row pk, key-share locking it until `cur` commits"""
+        execute_prepared(cur, self.entity.owns_statement, (pk, store_id))
+        return cur.fetchone() is not None
+
+    def create(self, store_id, values):
+        entity = self.entity
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            entity.check_references(store_id, values, cur)
+            execute_prepared(cur, entity.insert_statement, values + (store_id,))
+            row = cur.fetchone()
+            if entity.hooks.get("after_create"):
+                entity.fire("after_create", cur, None, entity.record(row))
+            conn.commit()
+            return row
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    def update(self, store_id, pk, values):
+        """Returns the (old, new) rows, or None when the store has no row pk"""
+        entity = self.entity
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            entity.check_references(store_id, values, cur)
+            entity.fire("before_update", cur, pk)
+            execute_prepared(cur, entity.update_statement, values + (pk, store_id))
+            row = cur.fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            width = len(entity.columns)
+            old, new = row[:width], row[width:]
+            if entity.hooks.get("after_update"):
+                entity.fire("after_update", cur, entity.record(old), entity.record(new))
+            conn.commit()
+            return old, new
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    def delete(self, store_id, pk):
+        """Returns the deleted row, or None when the store has no row pk"""
+        entity = self.entity
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            entity.fire("before_delete", cur, pk)
+            execute_prepared(cur, entity.delete_statement, (pk, store_id))
+            row = cur.fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            if entity.hooks.get("after_delete"):
+                entity.fire("after_delete", cur, entity.record(row), None)
+            conn.commit()
+            return row
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+class MemoryStore:
+    """An entity's rows held in process memory, for benchmarking without a database.
+
+    Rows are tuples of the entity's columns in a dict keyed by pk (pks are
+    unique across stores, as in Postgres), with each store's pks kept
+    sorted for keyset pages and a (store, value) -> pks index for each
+    foreign key column (`Entity.indexed`). Values are stored as written,
+    without the type conversion Postgres would apply. Only the after_commit
+    hooks run: the other write hooks maintain tables through a cursor.
+    """
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.lock = threading.RLock()
+        self.data = {}
+        self.owner = {}
+        self.pks = defaultdict(list)
+        self.indexes = {column: defaultdict(set) for column in entity.indexed}
+        self.positions = {column: i for i, column in enumerate(entity.columns)}
+        self.next_pk = itertools.count(1)
+        # Only the columns the table has; derived writables (invoice_date)
+        # are stored by Postgres alone
+        self.value_columns = [
+            (self.positions[column], i) for i, column in enumerate(entity.writable) if column in self.positions
+        ]
+
+    def project(self, view, row):
+        if view.columns == self.entity.columns:
+            return row
+        return tuple(row[self.positions[column]] for column in view.columns)
+
+    def load(self, rows):
+        """Bulk-insert rows given as dicts of column values (pk included,
+        store_id defaulting to DEFAULT_STORE_ID)"""
+        with self.lock:
+            for values in rows:
+                row = tuple(values.get(column) for column in self.entity.columns)
+                self.put(values.get("store_id", DEFAULT_STORE_ID), row)
+            self.next_pk = itertools.count(max(self.data, default=0) + 1)
+
+    def put(self, store_id, row):
+        pk = row[self.positions[self.entity.pk]]
+        if pk in self.data:
+            raise ValueError(f"duplicate key value: {self.entity.pk}={pk}")
+        self.data[pk] = row
+        self.owner[pk] = store_id
+        bisect.insort(self.pks[store_id], pk)
+        self.index(store_id, row, pk, add=True)
+
+    def index(self, store_id, row, pk, add):
+        for column, index in self.indexes.items():
+            value = row[self.positions[column]]
+            if value is None:
+                continue
+            key = (store_id, value)
+            if add:
+                index[key].add(pk)
+            else:
+                index[key].discard(pk)
+                if not index[key]:
+                    del index[key]
+
+    def rows(self, store_id, view, after=None, limit=None):
+        with self.lock:
+            pks = self.pks.get(store_id, [])
+            start = bisect.bisect_right(pks, after) if after is not None else 0
+            pks = pks[start:start + limit] if limit is not None else list(pks)
+            return [self.project(view, self.data[pk]) for pk in pks]
+
+    def row(self, store_id, view, pk):
+        row = self.data.get(pk)
+        if row is None or self.owner.get(pk) != store_id:
+            return None
+        return self.project(view, row)
+
+    def find(self, store_id, view, column, value):
+        with self.lock:
+            pks = sorted(self.indexes[column].get((store_id, value), ()))
+            return [self.project(view, self.data[pk]) for pk in pks]
+
+    def count(self, store_id):
+        return len(self.pks.get(store_id, ()))
+
+    def owns(self, store_id, pk, cur=None):
+        return self.owner.get(pk) == store_id
+
+    def build(self, values, pk):
+        row = [None] * len(self.entity.columns)
+        row[self.positions[self.entity.pk]] = pk
+        for position, i in self.value_columns:
+            row[position] = values[i]
+        return tuple(row)
+
+    def create(self, store_id, values):
+        with self.lock:
+            self.entity.check_references(store_id, values)
+            if self.entity.pk in self.entity.writable:
+                pk = values[self.entity.writable.index(self.entity.pk)]
+            else:
+                pk = next(self.next_pk)
+            row = self.build(values, pk)
+            self.put(store_id, row)
+            return row
+
+    def update(self, store_id, pk, values):
+        with self.lock:
+            if self.owner.get(pk) != store_id:
+                return None
+            self.entity.check_references(store_id, values)
+            old = self.data[pk]
+            new = self.build(values, pk)
+            new_pk = new[self.positions[self.entity.pk]]
+            if new_pk != pk and new_pk in self.data:
+                raise ValueError(f"duplicate key value: {self.entity.pk}={new_pk}")
+            self.delete(store_id, pk)
+            self.put(store_id, new)
+            return old, new
+
+    def delete(self, store_id, pk):
+        with self.lock:
+            if self.owner.get(pk) != store_id:
+                return None
+            row = self.data.pop(pk)
+            del self.owner[pk]
+            pks = self.pks[store_id]
+            del pks[bisect.bisect_left(pks, pk)]
+            self.index(store_id, row, pk, add=False)
+            return row
+
+STORES = {"postgres": PostgresStore, "memory": MemoryStore}
+if STORAGE_BACKEND not in STORES:
+    raise RuntimeError(f"VIJAY_STORAGE must be one of: {', '.join(STORES)}")
+
+# Counts are cached per store for every entity, full by-id rows only for
+# entities built with cache_rows (read-mostly reference data). Both are dropped on
+# every committed write to the entity in this process; the TTLs bound how
+# stale they can be after a write made by another worker.
+COUNT_CACHE_TTL = 30
+ROW_CACHE_TTL = 60
+ROW_CACHE_SIZE = 2048
+
+class Entity:
+    """Table metadata plus the generic list/count/get/create/update/delete handlers
+
+    Rows are read and written through `store`, a PostgresStore or a
+    MemoryStore depending on STORAGE_BACKEND.
+    """
+
+    def __init__(self, name, table, pk, columns, writable, fields, label, to_values, write_expressions=None, cache_rows=False):
+        self.name = name
+        self.table = table
+        self.pk = pk
+        self.columns = columns
+        self.writable = writable
+        # SQL used instead of a plain %s for derived writable columns; its
+        # placeholders are filled from to_values like any other
+        self.write_expressions = write_expressions or {}
+        self.fields = fields
+        self.label = label
+        self.to_values = to_values
+        self.hooks = defaultdict(list)
+        self.cache_rows = cache_rows
+        self.cache_lock = threading.Lock()
+        self.cache_version = 0
+        # Keyed by (store_id, pk) and store_id
+        self.row_cache = OrderedDict()
+        self.count_cache = {}
+        self.on("after_commit", self.invalidate_caches)
+        self.field_names = tuple(out for out, _ in fields)
+        self.views = {}
+        self.views_lock = threading.Lock()
+        # Writes always return the full row, so the full view's mapper is the
+        # entity's transform
+        self.full_view = self.view()
+        self.transform = self.full_view.transform
+
+        select_list = ", ".join(columns)
+        self.count_sql = f"SELECT COUNT(*) FROM {table} WHERE store_id = %s;"
+        self.insert_sql = (
+            f"INSERT INTO {table} ({', '.join(writable)}, store_id) "
+            f"VALUES ({', '.join(self.write_expressions.get(c, '%s') for c in writable)}, %s) RETURNING {select_list};"
+        )
+        # Returns the locked pre-update image followed by the new one
+        self.update_sql = (
+            f"UPDATE {table} AS t SET {', '.join(f'{c} = ' + self.write_expressions.get(c, '%s') for c in writable)} "
+            f"FROM (SELECT {select_list} FROM {table} WHERE {pk} = %s AND store_id = %s FOR UPDATE) AS old "
+            f"WHERE t.{pk} = old.{pk} "
+            f"RETURNING {', '.join(f'old.{c}' for c in columns)}, {', '.join(f't.{c}' for c in columns)};"
+        )
+        self.delete_sql = f"DELETE FROM {table} WHERE {pk} = %s AND store_id = %s RETURNING {select_list};"
+        self.warm_count_sql = f"SELECT store_id, COUNT(*) FROM {table} GROUP BY store_id;"
+        self.warm_sql = f"SELECT store_id, {', '.join(self.full_view.columns)} FROM {table} WHERE {pk} = ANY(%s);"
+        # By-id reads and the writes are hot enough to be worth preparing
+        self.insert_statement = register_prepared(f"{name}_insert", self.insert_sql)
+        self.update_statement = register_prepared(f"{name}_update", self.update_sql)
+        self.delete_statement = register_prepared(f"{name}_delete", self.delete_sql)
+        self.owns_statement = register_prepared(
+            f"{name}_owns", f"SELECT 1 FROM {table} WHERE {pk} = %s AND store_id = %s FOR KEY SHARE;"
+        )
+        # Foreign key columns (named after the pk they refer to), which the
+        # memory store keeps a secondary index for
+        self.indexed = tuple(c for c in columns if c.endswith("_id") and c != pk)
+        # Writable foreign key column -> referenced entity; filled in once
+        # every entity exists
+        self.references = {}
+        self.store = STORES[STORAGE_BACKEND](self)
+
+    def on(self, event, fn):
+        """Register a write hook.
+
+        before_update/before_delete: fn(cur, pk), before the statement runs
+        after_create/after_update/after_delete: fn(cur, old, new) with the
+            row images as dicts (None where not applicable), before commit
+        after_commit: fn(), once the write is committed
+        """
+        self.hooks[event].append(fn)
+
+    def view(self, fields=None):
+        """Return the view for a `fields` query parameter ("name,price").
+
+        Field names are checked against the entity's output fields; each
+        distinct subset gets its own column list, generated mapper and
+        prepared by-id statement, built on first use and then reused.
+        """
+        if fields:
+            requested = {f.strip() for f in fields.split(",") if f.strip()}
+            if not requested:
+                raise HTTPException(status_code=400, detail=f"fields must name at least one field of {self.name}")
+            unknown = requested.difference(self.field_names)
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown field(s) for {self.name}: {', '.join(sorted(unknown))}. "
+                           f"Allowed: {', '.join(self.field_names)}",
+                )
+            key = tuple(f for f in self.field_names if f in requested)
+        else:
+            key = self.field_names
+        view = self.views.get(key)
+        if view is None:
+            with self.views_lock:
+                view = self.views.get(key)
+                if view is None:
+                    suffix = "" if key == self.field_names else f"_v{len(self.views)}"
+                    view = self.views[key] = EntityView(self, key, suffix)
+        return view
+
+    def record(self, row):
+        return dict(zip(self.columns, row)) if row is not None else None
+
+    def check_references(self, store_id, values, cur=None):
+        """Reject a write whose foreign keys name rows of another store (or none)"""
+        for column, target in self.references.items():
+            value = values[self.writable.index(column)]
+            if value is not None and not target.store.owns(store_id, value, cur):
+                raise HTTPException(status_code=400, detail=f"{target.label} {value} not found in this store")
+
+    def fire(self, event, *args):
+        for fn in self.hooks.get(event, ()):
+            fn(*args)
+
+    def invalidate_caches(self):
+        with self.cache_lock:
+            self.cache_version += 1
+            self.row_cache.clear()
+            self.count_cache = {}
+
+    def cached_row(self, store_id, pk):
+        """Full-view row for pk in the store from the row cache, or None"""
+        key = (store_id, pk)
+        with self.cache_lock:
+            entry = self.row_cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() > entry[1]:
+                del self.row_cache[key]
+                return None
+            self.row_cache.move_to_end(key)
+            return entry[0]
+
+    def remember_rows(self, store_id, rows, version):
+        """Cache the store's full-view rows read while the cache was at `version`"""
+        expires = time.monotonic() + ROW_CACHE_TTL
+        pk_index = self.full_view.columns.index(self.pk)
+        with self.cache_lock:
+            # A write committed since the read may have changed these rows
+            if version != self.cache_version:
+                return
+            for row in rows:
+                key = (store_id, row[pk_index])
+                self.row_cache[key] = (row, expires)
+                self.row_cache.move_to_end(key)
+            while len(self.row_cache) > ROW_CACHE_SIZE:
+                self.row_cache.popitem(last=False)
+
+    def remember_count(self, store_id, count, version):
+        with self.cache_lock:
+            if version == self.cache_version:
+                self.count_cache[store_id] = (count, time.monotonic() + COUNT_CACHE_TTL)
+
+    def warm(self, cur, pks):
+        """Load the given rows (of any store) into the row cache and every store's count into the count cache"""
+        version = self.cache_version
+        cur.execute(self.warm_count_sql)
+        for store_id, count in cur.fetchall():
+            self.remember_count(store_id, count, version)
+        if self.cache_rows and pks:
+            cur.execute(self.warm_sql, (list(pks),))
+            by_store = defaultdict(list)
+            for row in cur.fetchall():
+                by_store[row[0]].append(row[1:])
+            for store_id, rows in by_store.items():
+                self.remember_rows(store_id, rows, version)
+
+    def list(self, fields=None, after=None, limit=None):
+        """The current store's rows in id order, or with `limit` one page of the rows after id `after`"""
+        view = self.view(fields)
+        if after is not None or limit is not None:
+            limit = check_page_limit(limit)
+        try:
+            return list(map(view.transform, self.store.rows(current_store.get(), view, after, limit)))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def find(self, column, value, fields=None):
+        """The current store's rows whose foreign key `column` (one of `indexed`) equals `value`, in id order"""
+        view = self.view(fields)
+        try:
+            return list(map(view.transform, self.store.find(current_store.get(), view, column, value)))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def count(self):
+        store_id = current_store.get()
+        cached = self.count_cache.get(store_id)
+        if cached is not None and time.monotonic() < cached[1]:
+            return {"count": cached[0]}
+        version = self.cache_version
+        try:
+            count = self.store.count(store_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        self.remember_count(store_id, count, version)
+        return {"count": count}
 
-def transform_order_details_to_frontend(row):
-    """Transform database row to frontend format"""
-    return {
-        "Order_Id": str(row.get('order_id', '')),
-        "quantity": row.get('quantity', 0),
-        "cost": float(row.get('cost', 0))
-    }
+    def get(self, pk, fields=None):
+        store_id = current_store.get()
+        view = self.view(fields)
+        use_cache = self.cache_rows and view is self.full_view
+        if use_cache:
+            row = self.cached_row(store_id, pk)
+            if row is not None:
+                return view.transform(row)
+        version = self.cache_version
+        try:
+            row = self.store.row(store_id, view, pk)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        if not row:
+            raise HTTPException(status_code=404, detail=f"{self.label} not found")
+        if use_cache:
+            self.remember_rows(store_id, [row], version)
+        return view.transform(row)
+
+    def create(self, request):
+        values = self.to_values(request)
+        try:
+            row = self.store.create(current_store.get(), values)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        self.fire("after_commit")
+        return self.transform(row)
+
+    def update(self, pk, request):
+        values = self.to_values(request)
+        try:
+            rows = self.store.update(current_store.get(), pk, values)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if rows is None:
+            raise HTTPException(status_code=404, detail=f"{self.label} not found")
+        self.fire("after_commit")
+        return self.transform(rows[1])
+
+    def delete(self, pk):
+        try:
+            row = self.store.delete(current_store.get(), pk)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"{self.label} not found")
+        self.fire("after_commit")
+        return {"message": f"{self.label} deleted successfully"}
+
+CUSTOMERS = Entity(
+    name="customer",
+    table="customer",
+    pk="c_id",
+    columns=("c_id", "first_name", "second_name", "email", "phone", "address"),
+    writable=("first_name", "second_name", "email", "phone", "address"),
+    fields=[
+        ("C_id", ("c_id", "str")),
+        ("name", [
+            ("firstName", ("first_name", "raw")),
+            ("secondName", ("second_name", "raw")),
+        ]),
+        ("email", ("email", "raw")),
+        ("phone", ("phone", "phones")),
+        ("address", ("address", "raw")),
+    ],
+    label="Customer",
+    to_values=lambda c: (c.name.firstName, c.name.secondName, c.email, join_phones(c.phone), c.address),
+    cache_rows=True,
+)
+
+PRODUCTS = Entity(
+    name="product",
+    table="product",
+    pk="p_id",
+    columns=("p_id", "name", "category", "stock", "price", "s_id"),
+    writable=("name", "category", "stock", "price", "s_id"),
+    fields=[
+        ("P_id", ("p_id", "str")),
+        ("name", ("name", "raw")),
+        ("category", ("category", "raw")),
+        ("stock", ("stock", "raw")),
+        ("price", ("price", "float")),
+    ],
+    label="Product",
+    to_values=lambda p: (p.name, p.category, p.stock, p.price, p.s_id if p.s_id else None),
+    cache_rows=True,
+)
+
+SUPPLIERS = Entity(
+    name="supplier",
+    table="supplier",
+    pk="s_id",
+    columns=("s_id", "name", "address", "email", "phone"),
+    writable=("name", "address", "email", "phone"),
+    fields=[
+        ("S_id", ("s_id", "str")),
+        ("name", ("name", "raw")),
+        ("address", ("address", "raw")),
+        ("email", ("email", "raw")),
+        ("phone", ("phone", "phones")),
+    ],
+    label="Supplier",
+    to_values=lambda s: (s.name, s.address, s.email, join_phones(s.phone)),
+)
+
+EMPLOYEES = Entity(
+    name="employee",
+    table="employee",
+    pk="e_id",
+    columns=("e_id", "name", "role", "phone"),
+    writable=("name", "role", "phone"),
+    fields=[
+        ("E_id", ("e_id", "str")),
+        ("name", ("name", "raw")),
+        ("role", ("role", "raw")),
+        ("phone", ("phone", "phones")),
+    ],
+    label="Employee",
+    to_values=lambda e: (e.name, e.role, join_phones(e.phone)),
+    cache_rows=True,
+)
+
+INVOICES = Entity(
+    name="invoice",
+    table="invoice",
+    pk="i_id",
+    columns=("i_id", "date", "amount", "payment_method", "c_id", "e_id"),
+    writable=("date", "amount", "payment_method", "c_id", "e_id"),
+    fields=[
+        ("Lid", ("i_id", "str")),
+        ("date", ("date", "str")),
+        ("amount", ("amount", "float")),
+        ("paymentMethod", ("payment_method", "text_or_empty")),
+        ("c_id", ("c_id", "raw")),
+        ("e_id", ("e_id", "raw")),
+    ],
+    label="Invoice",
+    to_values=lambda i: (i.date, i.amount, i.paymentMethod, i.c_id, i.e_id),
+)
+
+PURCHASE_ORDERS = Entity(
+    name="purchase_order",
+    table="purchaseorder",
+    pk="purchase_id",
+    columns=("purchase_id", "date", "amount", "s_id"),
+    writable=("date", "amount", "s_id"),
+    fields=[
+        ("Purchase_id", ("purchase_id", "str")),
+        ("date", ("date", "str")),
+        ("amount", ("amount", "float")),
+    ],
+    label="Purchase order",
+    to_values=lambda po: (po.date, po.amount, po.s_id),
+)
+
+ORDER_DETAILS = Entity(
+    name="order_details",
+    table="orderdetails",
+    pk="order_id",
+    columns=("order_id", "quantity", "cost", "i_id", "p_id"),
+    writable=("order_id", "quantity", "cost", "i_id", "p_id", "invoice_date", "unit_price"),
+    fields=[
+        ("Order_Id", ("order_id", "str")),
+        ("quantity", ("quantity", "raw")),
+        ("cost", ("cost", "float")),
+        ("i_id", ("i_id", "raw")),
+        ("p_id", ("p_id", "raw")),
+    ],
+    label="Order detail",
+    # orderdetails is partitioned by the date of its invoice (in the same
+    # store), carried on the line; unit_price keeps the product's price at
+    # the time of the write, which analytics report revenue at
+    to_values=lambda od: (
+        order_id_from_request(od), od.quantity, od.cost, od.i_id, od.p_id,
+        od.i_id, current_store.get(), od.p_id, current_store.get()
+    ),
+    write_expressions={
+        "invoice_date": "(SELECT date FROM invoice WHERE i_id = %s AND store_id = %s)",
+        "unit_price": "(SELECT price FROM product WHERE p_id = %s AND store_id = %s)",
+    },
+)
+
+ENTITIES = (CUSTOMERS, PRODUCTS, SUPPLIERS, EMPLOYEES, INVOICES, PURCHASE_ORDERS, ORDER_DETAILS)
+
+# Foreign keys are named after the pk they refer to
+ENTITY_BY_PK = {entity.pk: entity for entity in ENTITIES}
+for entity in ENTITIES:
+    entity.references = {c: ENTITY_BY_PK[c] for c in entity.indexed if c in entity.writable and c in ENTITY_BY_PK}
+
+transform_customer_to_frontend = CUSTOMERS.transform
+transform_product_to_frontend = PRODUCTS.transform
+transform_supplier_to_frontend = SUPPLIERS.transform
+transform_employee_to_frontend = EMPLOYEES.transform
+transform_invoice_to_frontend = INVOICES.transform
+transform_purchase_order_to_frontend = PURCHASE_ORDERS.transform
+transform_order_details_to_frontend = ORDER_DETAILS.transform
+
+MOVE_INVOICE_LINES = register_prepared(
+    "move_invoice_lines", "UPDATE orderdetails SET invoice_date = %s WHERE i_id = %s AND store_id = %s;"
+)
+
+def move_invoice_lines(cur, old, new):
+    """Carry a changed invoice date onto its lines, moving them to the matching partition"""
+    if old["date"] != new["date"]:
+        execute_prepared(cur, MOVE_INVOICE_LINES, (new["date"], new["i_id"], current_store.get()))
+
+INVOICES.on("after_update", move_invoice_lines)
+
+# Customer summaries follow every invoice write
+INVOICES.on("after_create", lambda cur, old, new: record_invoice_in_summary(
+    cur, new["c_id"], current_store.get(), new["amount"], new["date"]
+))
+INVOICES.on("after_update", lambda cur, old, new: refresh_customer_summaries(cur, [old["c_id"], new["c_id"]]))
+INVOICES.on("after_delete", lambda cur, old, new: refresh_customer_summaries(cur, [old["c_id"]]))
+
+# Sales buckets: subtract the old contribution before the write, add the new one after
+INVOICES.on("before_update", lambda cur, pk: shift_sales_rollup(cur, "invoice", pk, -1))
+INVOICES.on("after_update", lambda cur, old, new: shift_sales_rollup(cur, "invoice", new["i_id"], 1))
+INVOICES.on("before_delete", lambda cur, pk: shift_sales_rollup(cur, "invoice", pk, -1))
+ORDER_DETAILS.on("after_create", lambda cur, old, new: shift_sales_rollup(cur, "line", new["order_id"], 1))
+ORDER_DETAILS.on("before_update", lambda cur, pk: shift_sales_rollup(cur, "line", pk, -1))
+ORDER_DETAILS.on("after_update", lambda cur, old, new: shift_sales_rollup(cur, "line", new["order_id"], 1))
+ORDER_DETAILS.on("before_delete", lambda cur, pk: shift_sales_rollup(cur, "line", pk, -1))
+
+# Rows most likely to be read first after a deploy: best sellers, recent
+# customers and the (small) staff list
+WARM_HOT_ROWS = 500
+HOT_ROW_SQL = {
+    "product": """
+        SELECT p_id FROM product_sales_daily
+        WHERE day >= CURRENT_DATE - 30
+        GROUP BY p_id ORDER BY SUM(units) DESC LIMIT %s;
+    """,
+    "customer": "SELECT c_id FROM customer_summary ORDER BY last_purchase DESC NULLS LAST LIMIT %s;",
+    "employee": "SELECT e_id FROM employee ORDER BY e_id LIMIT %s;",
+}
+
+@on_warmup
+def warm_entity_caches():
+    """Fill the count caches and the row caches with the hot rows"""
+    warmed = {}
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        for entity in ENTITIES:
+            pks = []
+            if entity.name in HOT_ROW_SQL:
+                try:
+                    cur.execute(HOT_ROW_SQL[entity.name], (WARM_HOT_ROWS,))
+                    pks = [row[0] for row in cur.fetchall()]
+                except psycopg2.Error:
+                    # Rollup tables not migrated yet; counts are still worth warming
+                    conn.rollback()
+            entity.warm(cur, pks)
+            warmed[entity.name] = len(entity.row_cache)
+        conn.rollback()
+    finally:
+        cur.close()
+        conn.close()
+    return warmed
 
 # ---------------------- ROUTES ----------------------
 
@@ -171,6 +1703,12 @@ def root():
 def api_root():
     return {"message": "API is running!"}
 
+@app.get("/api/ready")
+def readiness():
+    """200 once startup warm-up has finished, 503 before"""
+    body = {"status": "ready" if startup_state["ready"] else "warming", **startup_state}
+    return JSONResponse(body, status_code=200 if startup_state["ready"] else 503)
+
 @app.get("/api/test-db")
 def test_db_connection():
     try:
@@ -193,14 +1731,21 @@ def test_db_connection():
 
 # ==================== CUSTOMER ENDPOINTS ====================
 
-@app.get("/api/customers")
-def get_customers():
+CUSTOMER_SUMMARY_COLUMNS = "s.total_spend, s.invoice_count, s.first_purchase, s.last_purchase"
+
+def fetch_customers_with_summary(view, sql, params):
+    """Run a query selecting the view's customer columns (as c.*) followed by
+    CUSTOMER_SUMMARY_COLUMNS, returning customers with a summary object"""
+    width = len(view.columns)
     conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur = conn.cursor()
     try:
-        cur.execute("SELECT * FROM customer ORDER BY c_id;")
-        rows = cur.fetchall()
-        customers = [transform_customer_to_frontend(row) for row in rows]
+        cur.execute(sql.format(columns=", ".join(f"c.{column}" for column in view.columns)), params)
+        customers = []
+        for row in cur.fetchall():
+            customer = view.transform(row)
+            customer["summary"] = transform_customer_summary_to_frontend(row[width:])
+            customers.append(customer)
         return customers
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -208,97 +1753,291 @@ def get_customers():
         cur.close()
         conn.close()
 
+@app.get("/api/customers")
+def get_customers(include_summary: bool = False, fields: Optional[str] = None,
+                  after: Optional[int] = None, limit: Optional[int] = None):
+    if include_summary:
+        where, page, params = "WHERE c.store_id = %s", "", (current_store.get(),)
+        if after is not None or limit is not None:
+            # Serial ids start at 1, so -1 stands for "from the first row"
+            where, page = "WHERE c.store_id = %s AND c.c_id > %s", "LIMIT %s"
+            params += (after if after is not None else -1, check_page_limit(limit))
+        return fetch_customers_with_summary(CUSTOMERS.view(fields), f"""
+            SELECT {{columns}}, {CUSTOMER_SUMMARY_COLUMNS}
+            FROM customer c
+            LEFT JOIN customer_summary s ON s.c_id = c.c_id AND s.store_id = c.store_id
+            {where}
+            ORDER BY c.c_id
+            {page};
+        """, params)
+    return CUSTOMERS.list(fields, after, limit)
+
 @app.get("/api/customers/count")
 def get_customer_count():
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT COUNT(*) FROM customer;")
-        count = cur.fetchone()[0]
-        return {"count": count}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+    return CUSTOMERS.count()
+
+TOP_CUSTOMER_ORDERINGS = {
+    "spend": "s.store_id, s.total_spend DESC, s.c_id",
+    "recent": "s.store_id, s.last_purchase DESC NULLS LAST, s.c_id",
+    "count": "s.store_id, s.invoice_count DESC, s.c_id",
+}
+
+@app.get("/api/customers/top")
+def get_top_customers(by: str = "spend", limit: int = 10):
+    order_by = TOP_CUSTOMER_ORDERINGS.get(by)
+    if order_by is None:
+        raise HTTPException(status_code=400, detail=f"by must be one of: {', '.join(TOP_CUSTOMER_ORDERINGS)}")
+    if limit <= 0 or limit > 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    # Walks one of the customer_summary indexes; invoice is never read
+    return fetch_customers_with_summary(CUSTOMERS.full_view, f"""
+        SELECT {{columns}}, {CUSTOMER_SUMMARY_COLUMNS}
+        FROM customer_summary s
+        JOIN customer c ON c.c_id = s.c_id AND c.store_id = s.store_id
+        WHERE s.store_id = %s
+        ORDER BY {order_by}
+        LIMIT %s;
+    """, (current_store.get(), limit))
 
 @app.get("/api/customers/{customer_id}")
-def get_customer_by_id(customer_id: int):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM customer WHERE c_id = %s;", (customer_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        return transform_customer_to_frontend(row)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+def get_customer_by_id(customer_id: int, include_summary: bool = False, fields: Optional[str] = None):
+    if not include_summary:
+        return CUSTOMERS.get(customer_id, fields)
+    rows = fetch_customers_with_summary(CUSTOMERS.view(fields), f"""
+        SELECT {{columns}}, {CUSTOMER_SUMMARY_COLUMNS}
+        FROM customer c
+        LEFT JOIN customer_summary s ON s.c_id = c.c_id AND s.store_id = c.store_id
+        WHERE c.c_id = %s AND c.store_id = %s;
+    """, (customer_id, current_store.get()))
+    if not rows:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return rows[0]
 
 @app.post("/api/customers")
 def create_customer(customer: CustomerRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        phone_str = ', '.join(customer.phone) if customer.phone else ''
-        cur.execute("""
-            INSERT INTO customer (first_name, second_name, email, phone, address)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING *;
-        """, (customer.name.firstName, customer.name.secondName, customer.email, phone_str, customer.address))
-        row = cur.fetchone()
-        conn.commit()
-        return transform_customer_to_frontend(row)
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+    return CUSTOMERS.create(customer)
 
 @app.put("/api/customers/{customer_id}")
 def update_customer(customer_id: int, customer: CustomerRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        phone_str = ', '.join(customer.phone) if customer.phone else ''
-        cur.execute("""
-            UPDATE customer 
-            SET first_name = %s, second_name = %s, email = %s, phone = %s, address = %s
-            WHERE c_id = %s
-            RETURNING *;
-        """, (customer.name.firstName, customer.name.secondName, customer.email, phone_str, customer.address, customer_id))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        conn.commit()
-        return transform_customer_to_frontend(row)
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+    return CUSTOMERS.update(customer_id, customer)
 
 @app.delete("/api/customers/{customer_id}")
 def delete_customer(customer_id: int):
+    return CUSTOMERS.delete(customer_id)
+
+# ==================== PRODUCT ENDPOINTS ====================
+
+@app.get("/api/products")
+def get_products(fields: Optional[str] = None, after: Optional[int] = None, limit: Optional[int] = None):
+    return PRODUCTS.list(fields, after, limit)
+
+@app.get("/api/products/count")
+def get_product_count():
+    return PRODUCTS.count()
+
+@app.get("/api/products/{product_id}")
+def get_product_by_id(product_id: int, fields: Optional[str] = None):
+    return PRODUCTS.get(product_id, fields)
+
+@app.post("/api/products")
+def create_product(product: ProductRequest):
+    return PRODUCTS.create(product)
+
+@app.put("/api/products/{product_id}")
+def update_product(product_id: int, product: ProductRequest):
+    return PRODUCTS.update(product_id, product)
+
+@app.delete("/api/products/{product_id}")
+def delete_product(product_id: int):
+    return PRODUCTS.delete(product_id)
+
+# ==================== SUPPLIER ENDPOINTS ====================
+
+@app.get("/api/suppliers")
+def get_suppliers(fields: Optional[str] = None, after: Optional[int] = None, limit: Optional[int] = None):
+    return SUPPLIERS.list(fields, after, limit)
+
+@app.get("/api/suppliers/count")
+def get_supplier_count():
+    return SUPPLIERS.count()
+
+@app.get("/api/suppliers/{supplier_id}")
+def get_supplier_by_id(supplier_id: int, fields: Optional[str] = None):
+    return SUPPLIERS.get(supplier_id, fields)
+
+@app.post("/api/suppliers")
+def create_supplier(supplier: SupplierRequest):
+    return SUPPLIERS.create(supplier)
+
+@app.put("/api/suppliers/{supplier_id}")
+def update_supplier(supplier_id: int, supplier: SupplierRequest):
+    return SUPPLIERS.update(supplier_id, supplier)
+
+@app.delete("/api/suppliers/{supplier_id}")
+def delete_supplier(supplier_id: int):
+    return SUPPLIERS.delete(supplier_id)
+
+# A supplier's full price/stock list is loaded into a temporary table with
+# COPY and diffed against its products by name in SQL. Only rows that
+# actually differ are written, so an unchanged list leaves no dead tuples
+# behind. Products missing from the list are deleted, except those order or
+# purchase order lines still refer to: those are kept with their stock set
+# to 0.
+CATALOGUE_COLUMNS = {"name": "TEXT", "category": "TEXT", "stock": "INTEGER", "price": "NUMERIC(10, 2)"}
+CATALOGUE_REQUIRED = ("name", "stock", "price")
+
+PRODUCT_OLD_NEW = ", ".join(
+    [f"old.{c}" for c in PRODUCTS.columns] + [f"t.{c}" for c in PRODUCTS.columns]
+)
+
+CATALOGUE_UPDATE_SQL = f"""
+    UPDATE product AS t
+    SET category = COALESCE(old.new_category, old.category), stock = old.new_stock, price = old.new_price
+    FROM (
+        SELECT {", ".join(f"p.{c}" for c in PRODUCTS.columns)},
+               st.category AS new_category, st.stock AS new_stock, st.price AS new_price
+        FROM product p
+        JOIN catalogue_staging st ON st.name = p.name
+        WHERE p.store_id = %(store_id)s AND p.s_id = %(s_id)s
+          AND (p.category IS DISTINCT FROM COALESCE(st.category, p.category)
+               OR p.stock IS DISTINCT FROM st.stock
+               OR p.price IS DISTINCT FROM st.price)
+    ) AS old
+    WHERE t.p_id = old.p_id
+    RETURNING {PRODUCT_OLD_NEW};
+"""
+
+CATALOGUE_INSERT_SQL = f"""
+    INSERT INTO product (name, category, stock, price, s_id, store_id)
+    SELECT st.name, st.category, st.stock, st.price, %(s_id)s, %(store_id)s
+    FROM catalogue_staging st
+    WHERE NOT EXISTS (
+        SELECT 1 FROM product p WHERE p.store_id = %(store_id)s AND p.s_id = %(s_id)s AND p.name = st.name
+    )
+    ORDER BY st.name
+    RETURNING {", ".join(PRODUCTS.columns)};
+"""
+
+CATALOGUE_DELETE_SQL = f"""
+    DELETE FROM product p
+    WHERE p.store_id = %(store_id)s AND p.s_id = %(s_id)s
+      AND NOT EXISTS (SELECT 1 FROM catalogue_staging st WHERE st.name = p.name)
+      AND NOT EXISTS (SELECT 1 FROM orderdetails od WHERE od.p_id = p.p_id)
+      AND NOT EXISTS (SELECT 1 FROM purchaseorder_lines pl WHERE pl.p_id = p.p_id)
+    RETURNING {", ".join(f"p.{c}" for c in PRODUCTS.columns)};
+"""
+
+# Runs after the delete, so the missing products left are the referenced ones
+CATALOGUE_RETAIN_SQL = f"""
+    UPDATE product AS t
+    SET stock = 0
+    FROM (
+        SELECT {", ".join(f"p.{c}" for c in PRODUCTS.columns)}
+        FROM product p
+        WHERE p.store_id = %(store_id)s AND p.s_id = %(s_id)s
+          AND NOT EXISTS (SELECT 1 FROM catalogue_staging st WHERE st.name = p.name)
+          AND p.stock IS DISTINCT FROM 0
+    ) AS old
+    WHERE t.p_id = old.p_id
+    RETURNING {PRODUCT_OLD_NEW};
+"""
+
+def catalogue_header(body):
+    """Validate the CSV header line and return its column names"""
+    header = body.split(b"\n", 1)[0].decode("utf-8-sig").strip()
+    columns = [c.strip().lower() for c in header.split(",")]
+    unknown = [c for c in columns if c not in CATALOGUE_COLUMNS]
+    missing = [c for c in CATALOGUE_REQUIRED if c not in columns]
+    if unknown or missing or len(set(columns)) != len(columns):
+        raise HTTPException(
+            status_code=400,
+            detail=f"CSV header must name the columns {', '.join(CATALOGUE_COLUMNS)} "
+                   f"({', '.join(CATALOGUE_REQUIRED)} required), each once",
+        )
+    return columns
+
+def catalogue_updates(cur, sql, params):
+    """Run a catalogue UPDATE returning old and new images; returns the p_ids"""
+    cur.execute(sql, params)
+    width = len(PRODUCTS.columns)
+    rows = cur.fetchall()
+    if PRODUCTS.hooks.get("after_update"):
+        for row in rows:
+            PRODUCTS.fire("after_update", cur, PRODUCTS.record(row[:width]), PRODUCTS.record(row[width:]))
+    return [row[width] for row in rows]
+
+def catalogue_rows(cur, sql, params, event):
+    """Run a catalogue INSERT or DELETE returning product rows; returns the p_ids"""
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    if PRODUCTS.hooks.get(event):
+        for row in rows:
+            record = PRODUCTS.record(row)
+            PRODUCTS.fire(event, cur, *((None, record) if event == "after_create" else (record, None)))
+    return [row[0] for row in rows]
+
+def apply_catalogue(store_id, supplier_id, body, dry_run):
+    columns = catalogue_header(body)
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM customer WHERE c_id = %s RETURNING c_id;", (customer_id,))
-        result = cur.fetchone()
-        if not result:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        conn.commit()
-        return {"message": "Customer deleted successfully"}
+        cur.execute("SELECT 1 FROM supplier WHERE s_id = %s AND store_id = %s;", (supplier_id, store_id))
+        if cur.fetchone() is None:
+            raise HTTPException(status_code=404, detail="Supplier not found")
+
+        cur.execute(f"""
+            CREATE TEMP TABLE catalogue_staging ({", ".join(f"{c} {t}" for c, t in CATALOGUE_COLUMNS.items())})
+            ON COMMIT DROP;
+        """)
+        try:
+            cur.copy_expert(
+                f"COPY catalogue_staging ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                io.BytesIO(body),
+            )
+        except psycopg2.DataError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid catalogue: {e.pgerror or e}")
+        cur.execute("""
+            SELECT COUNT(*),
+                   COUNT(*) FILTER (WHERE name IS NULL OR stock IS NULL OR price IS NULL),
+                   COUNT(*) - COUNT(DISTINCT name)
+            FROM catalogue_staging;
+        """)
+        received, incomplete, duplicates = cur.fetchone()
+        if incomplete:
+            raise HTTPException(status_code=400, detail=f"{incomplete} row(s) without a name, stock or price")
+        if duplicates:
+            raise HTTPException(status_code=400, detail=f"{duplicates} duplicate product name(s) in the list")
+        cur.execute("ANALYZE catalogue_staging;")
+
+        # Same lock order (by p_id) as every other multi-product write
+        cur.execute(
+            "SELECT p_id FROM product WHERE store_id = %s AND s_id = %s ORDER BY p_id FOR UPDATE;",
+            (store_id, supplier_id),
+        )
+        params = {"store_id": store_id, "s_id": supplier_id}
+        changes = {
+            "updated": catalogue_updates(cur, CATALOGUE_UPDATE_SQL, params),
+            "deleted": catalogue_rows(cur, CATALOGUE_DELETE_SQL, params, "after_delete"),
+            "retained": catalogue_updates(cur, CATALOGUE_RETAIN_SQL, params),
+            "inserted": catalogue_rows(cur, CATALOGUE_INSERT_SQL, params, "after_create"),
+        }
+
+        summary = {
+            "supplier": str(supplier_id),
+            "received": received,
+            "unchanged": received - len(changes["inserted"]) - len(changes["updated"]),
+            **{kind: len(ids) for kind, ids in changes.items()},
+            "dryRun": dry_run,
+            "changes": {kind: [str(i) for i in ids] for kind, ids in changes.items()},
+        }
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+            PRODUCTS.fire("after_commit")
+        return summary
     except HTTPException:
+        conn.rollback()
         raise
     except Exception as e:
         conn.rollback()
@@ -307,163 +2046,243 @@ def delete_customer(customer_id: int):
         cur.close()
         conn.close()
 
-# ==================== PRODUCT ENDPOINTS ====================
+@app.post("/api/suppliers/{supplier_id}/catalogue-sync")
+async def sync_supplier_catalogue(supplier_id: int, request: Request, dry_run: bool = False):
+    """Apply a supplier's full catalogue, sent as CSV (name,category,stock,price)"""
+    body = await request.body()
+    return await run_in_threadpool(apply_catalogue, current_store.get(), supplier_id, body, dry_run)
 
-@app.get("/api/products")
-def get_products():
+# ==================== EMPLOYEE ENDPOINTS ====================
+
+@app.get("/api/employees")
+def get_employees(fields: Optional[str] = None, after: Optional[int] = None, limit: Optional[int] = None):
+    return EMPLOYEES.list(fields, after, limit)
+
+@app.get("/api/employees/count")
+def get_employee_count():
+    return EMPLOYEES.count()
+
+@app.get("/api/employees/{employee_id}")
+def get_employee_by_id(employee_id: int, fields: Optional[str] = None):
+    return EMPLOYEES.get(employee_id, fields)
+
+@app.post("/api/employees")
+def create_employee(employee: EmployeeRequest):
+    return EMPLOYEES.create(employee)
+
+@app.put("/api/employees/{employee_id}")
+def update_employee(employee_id: int, employee: EmployeeRequest):
+    return EMPLOYEES.update(employee_id, employee)
+
+@app.delete("/api/employees/{employee_id}")
+def delete_employee(employee_id: int):
+    return EMPLOYEES.delete(employee_id)
+
+# ==================== INVOICE ENDPOINTS ====================
+
+# A receipt (invoice, its lines, product names, customer and employee) is
+# built by Postgres as one JSON document per invoice and sent on as-is, so
+# a client needs one request instead of one per line.
+INVOICE_FULL_SELECT = """
+    SELECT i.i_id, json_build_object(
+        'Lid', i.i_id::text,
+        'date', i.date,
+        'amount', COALESCE(i.amount, 0),
+        'paymentMethod', COALESCE(i.payment_method, ''),
+        'customer', CASE WHEN c.c_id IS NOT NULL THEN json_build_object(
+            'C_id', c.c_id::text,
+            'name', json_build_object('firstName', c.first_name, 'secondName', c.second_name)
+        ) END,
+        'employee', CASE WHEN e.e_id IS NOT NULL THEN json_build_object(
+            'E_id', e.e_id::text,
+            'name', e.name
+        ) END,
+        'lines', COALESCE(l.lines, '[]'::json)
+    )::text
+    FROM invoice i
+    LEFT JOIN customer c ON c.c_id = i.c_id AND c.store_id = i.store_id
+    LEFT JOIN employee e ON e.e_id = i.e_id AND e.store_id = i.store_id
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+            'Order_Id', od.order_id::text,
+            'quantity', od.quantity,
+            'cost', COALESCE(od.cost, 0),
+            'i_id', od.i_id,
+            'p_id', od.p_id,
+            'product', CASE WHEN p.p_id IS NOT NULL THEN json_build_object(
+                'P_id', p.p_id::text,
+                'name', p.name,
+                'category', p.category,
+                'price', COALESCE(p.price, 0)
+            ) END
+        ) ORDER BY od.order_id) AS lines
+        FROM orderdetails od
+        LEFT JOIN product p ON p.p_id = od.p_id AND p.store_id = od.store_id
+        -- invoice_date lets run-time pruning probe only the invoice's month
+        WHERE od.i_id = i.i_id AND od.invoice_date = i.date AND od.store_id = i.store_id
+    ) l ON true
+"""
+INVOICE_FULL_GET = register_prepared("invoice_full_get", INVOICE_FULL_SELECT + "WHERE i.i_id = %s AND i.store_id = %s;")
+INVOICE_FULL_PAGE = register_prepared(
+    "invoice_full_page", INVOICE_FULL_SELECT + "WHERE i.store_id = %s AND i.i_id > %s ORDER BY i.i_id LIMIT %s;"
+)
+
+@app.get("/api/invoices")
+def get_invoices(fields: Optional[str] = None, after: Optional[int] = None, limit: Optional[int] = None):
+    return INVOICES.list(fields, after, limit)
+
+@app.get("/api/invoices/count")
+def get_invoice_count():
+    return INVOICES.count()
+
+@app.get("/api/invoices/full")
+def get_invoices_full(after: int = 0, limit: int = 50):
+    """Invoices with their lines, in id order; pass `next` back as `after` for the following page"""
+    if limit <= 0 or limit > 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
     conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur = conn.cursor()
     try:
-        cur.execute("SELECT * FROM product ORDER BY p_id;")
+        execute_prepared(cur, INVOICE_FULL_PAGE, (current_store.get(), after, limit + 1))
         rows = cur.fetchall()
-        products = [transform_product_to_frontend(row) for row in rows]
-        return products
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
-
-@app.get("/api/products/count")
-def get_product_count():
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_after = rows[-1][0] if more else None
+    body = '{"items":[' + ",".join(doc for _, doc in rows) + '],"next":' + json.dumps(next_after) + "}"
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/invoices/{invoice_id}/full")
+def get_invoice_full(invoice_id: int):
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("SELECT COUNT(*) FROM product;")
-        count = cur.fetchone()[0]
-        return {"count": count}
+        execute_prepared(cur, INVOICE_FULL_GET, (invoice_id, current_store.get()))
+        row = cur.fetchone()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
+    if not row:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    return Response(content=row[1], media_type="application/json")
 
-@app.get("/api/products/{product_id}")
-def get_product_by_id(product_id: int):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM product WHERE p_id = %s;", (product_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Product not found")
-        return transform_product_to_frontend(row)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+@app.get("/api/invoices/{invoice_id}")
+def get_invoice_by_id(invoice_id: int, fields: Optional[str] = None):
+    return INVOICES.get(invoice_id, fields)
 
-@app.post("/api/products")
-def create_product(product: ProductRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        s_id = product.s_id if product.s_id else None
-        cur.execute("""
-            INSERT INTO product (name, category, stock, price, s_id)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING *;
-        """, (product.name, product.category, product.stock, product.price, s_id))
-        row = cur.fetchone()
-        conn.commit()
-        return transform_product_to_frontend(row)
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+@app.post("/api/invoices")
+def create_invoice(invoice: InvoiceRequest):
+    return INVOICES.create(invoice)
 
-@app.put("/api/products/{product_id}")
-def update_product(product_id: int, product: ProductRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        s_id = product.s_id if product.s_id else None
-        cur.execute("""
-            UPDATE product 
-            SET name = %s, category = %s, stock = %s, price = %s, s_id = %s
-            WHERE p_id = %s
-            RETURNING *;
-        """, (product.name, product.category, product.stock, product.price, s_id, product_id))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Product not found")
-        conn.commit()
-        return transform_product_to_frontend(row)
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+@app.put("/api/invoices/{invoice_id}")
+def update_invoice(invoice_id: int, invoice: InvoiceRequest):
+    return INVOICES.update(invoice_id, invoice)
 
-@app.delete("/api/products/{product_id}")
-def delete_product(product_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM product WHERE p_id = %s RETURNING p_id;", (product_id,))
-        result = cur.fetchone()
-        if not result:
-            raise HTTPException(status_code=404, detail="Product not found")
-        conn.commit()
-        return {"message": "Product deleted successfully"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+@app.delete("/api/invoices/{invoice_id}")
+def delete_invoice(invoice_id: int):
+    return INVOICES.delete(invoice_id)
 
-# ==================== SUPPLIER ENDPOINTS ====================
+# ==================== PURCHASE ORDER ENDPOINTS ====================
 
-@app.get("/api/suppliers")
-def get_suppliers():
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM supplier ORDER BY s_id;")
-        rows = cur.fetchall()
-        suppliers = [transform_supplier_to_frontend(row) for row in rows]
-        return suppliers
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+@app.get("/api/purchase-orders")
+def get_purchase_orders(fields: Optional[str] = None, after: Optional[int] = None, limit: Optional[int] = None):
+    return PURCHASE_ORDERS.list(fields, after, limit)
 
-@app.get("/api/suppliers/count")
-def get_supplier_count():
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT COUNT(*) FROM supplier;")
-        count = cur.fetchone()[0]
-        return {"count": count}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+@app.get("/api/purchase-orders/count")
+def get_purchase_order_count():
+    return PURCHASE_ORDERS.count()
 
-@app.get("/api/suppliers/{supplier_id}")
-def get_supplier_by_id(supplier_id: int):
+@app.get("/api/purchase-orders/{purchase_order_id}")
+def get_purchase_order_by_id(purchase_order_id: int, fields: Optional[str] = None):
+    return PURCHASE_ORDERS.get(purchase_order_id, fields)
+
+@app.post("/api/purchase-orders")
+def create_purchase_order(purchase_order: PurchaseOrderRequest):
+    return PURCHASE_ORDERS.create(purchase_order)
+
+@app.put("/api/purchase-orders/{purchase_order_id}")
+def update_purchase_order(purchase_order_id: int, purchase_order: PurchaseOrderRequest):
+    return PURCHASE_ORDERS.update(purchase_order_id, purchase_order)
+
+@app.delete("/api/purchase-orders/{purchase_order_id}")
+def delete_purchase_order(purchase_order_id: int):
+    return PURCHASE_ORDERS.delete(purchase_order_id)
+
+# Receiving adds each line's quantity to product.stock in one statement.
+# The increment is relative (stock = stock + n), so it composes with any
+# concurrent write to the same rows, and the product rows are locked in
+# p_id order first - the order every multi-product write takes them in -
+# so two such transactions cannot deadlock on each other.
+LOCK_PURCHASE_ORDER = register_prepared(
+    "lock_purchase_order",
+    "SELECT received_at FROM purchaseorder WHERE purchase_id = %s AND store_id = %s FOR UPDATE;",
+)
+LOCK_PURCHASE_ORDER_PRODUCTS = register_prepared(
+    "lock_purchase_order_products",
+    """
+    SELECT p.p_id FROM product p
+    WHERE p.p_id IN (SELECT p_id FROM purchaseorder_lines WHERE purchase_id = %s) AND p.store_id = %s
+    ORDER BY p.p_id
+    FOR UPDATE OF p;
+    """,
+)
+RECEIVE_PURCHASE_ORDER_STOCK = register_prepared(
+    "receive_purchase_order_stock",
+    f"""
+    UPDATE product AS t
+    SET stock = COALESCE(t.stock, 0) + old.quantity
+    FROM (
+        SELECT {", ".join(f"p.{c}" for c in PRODUCTS.columns)}, pl.quantity
+        FROM product p
+        JOIN purchaseorder_lines pl ON pl.p_id = p.p_id
+        WHERE pl.purchase_id = %s AND p.store_id = %s
+    ) AS old
+    WHERE t.p_id = old.p_id
+    RETURNING {PRODUCT_OLD_NEW};
+    """,
+)
+MARK_PURCHASE_ORDER_RECEIVED = register_prepared(
+    "mark_purchase_order_received",
+    "UPDATE purchaseorder SET received_at = now() WHERE purchase_id = %s AND store_id = %s RETURNING received_at;",
+)
+
+def purchase_order_lines(cur, store_id, purchase_order_id):
+    cur.execute("""
+        SELECT pl.p_id, pl.quantity, pl.cost, p.name
+        FROM purchaseorder_lines pl
+        LEFT JOIN product p ON p.p_id = pl.p_id AND p.store_id = %s
+        WHERE pl.purchase_id = %s
+        ORDER BY pl.p_id;
+    """, (store_id, purchase_order_id))
+    return [
+        {"p_id": p_id, "name": name, "quantity": quantity, "cost": float(cost)}
+        for p_id, quantity, cost, name in cur.fetchall()
+    ]
+
+@app.get("/api/purchase-orders/{purchase_order_id}/lines")
+def get_purchase_order_lines(purchase_order_id: int):
+    store_id = current_store.get()
     conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur = conn.cursor()
     try:
-        cur.execute("SELECT * FROM supplier WHERE s_id = %s;", (supplier_id,))
+        cur.execute(
+            "SELECT received_at FROM purchaseorder WHERE purchase_id = %s AND store_id = %s;",
+            (purchase_order_id, store_id),
+        )
         row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Supplier not found")
-        return transform_supplier_to_frontend(row)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Purchase order not found")
+        return {
+            "Purchase_id": str(purchase_order_id),
+            "receivedAt": row[0].isoformat() if row[0] else None,
+            "lines": purchase_order_lines(cur, store_id, purchase_order_id),
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -472,46 +2291,43 @@ def get_supplier_by_id(supplier_id: int):
         cur.close()
         conn.close()
 
-@app.post("/api/suppliers")
-def create_supplier(supplier: SupplierRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        phone_str = ', '.join(supplier.phone) if supplier.phone else ''
-        cur.execute("""
-            INSERT INTO supplier (name, address, email, phone)
-            VALUES (%s, %s, %s, %s)
-            RETURNING *;
-        """, (supplier.name, supplier.address, supplier.email, phone_str))
-        row = cur.fetchone()
-        conn.commit()
-        return transform_supplier_to_frontend(row)
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
-
-@app.put("/api/suppliers/{supplier_id}")
-def update_supplier(supplier_id: int, supplier: SupplierRequest):
+@app.put("/api/purchase-orders/{purchase_order_id}/lines")
+def set_purchase_order_lines(purchase_order_id: int, request: PurchaseOrderLinesRequest):
+    """Replace the lines of a purchase order that has not been received yet"""
+    p_ids = [line.p_id for line in request.lines]
+    if len(set(p_ids)) != len(p_ids):
+        raise HTTPException(status_code=400, detail="Each product may appear on one line only")
+    if any(line.quantity <= 0 for line in request.lines):
+        raise HTTPException(status_code=400, detail="Line quantities must be positive")
+    store_id = current_store.get()
     conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur = conn.cursor()
     try:
-        phone_str = ', '.join(supplier.phone) if supplier.phone else ''
-        cur.execute("""
-            UPDATE supplier 
-            SET name = %s, address = %s, email = %s, phone = %s
-            WHERE s_id = %s
-            RETURNING *;
-        """, (supplier.name, supplier.address, supplier.email, phone_str, supplier_id))
+        execute_prepared(cur, LOCK_PURCHASE_ORDER, (purchase_order_id, store_id))
         row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Supplier not found")
+        if row is None:
+            raise HTTPException(status_code=404, detail="Purchase order not found")
+        if row[0] is not None:
+            raise HTTPException(status_code=409, detail="Purchase order has already been received")
+        # Lines may only order the store's own products
+        cur.execute("SELECT COUNT(*) FROM product WHERE p_id = ANY(%s) AND store_id = %s;", (p_ids, store_id))
+        if cur.fetchone()[0] != len(p_ids):
+            raise HTTPException(status_code=400, detail="Unknown product on purchase order line")
+        cur.execute("DELETE FROM purchaseorder_lines WHERE purchase_id = %s;", (purchase_order_id,))
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO purchaseorder_lines (purchase_id, p_id, quantity, cost) VALUES %s;",
+            [(purchase_order_id, line.p_id, line.quantity, line.cost) for line in request.lines],
+        )
+        lines = purchase_order_lines(cur, store_id, purchase_order_id)
         conn.commit()
-        return transform_supplier_to_frontend(row)
+        return {"Purchase_id": str(purchase_order_id), "receivedAt": None, "lines": lines}
     except HTTPException:
+        conn.rollback()
         raise
+    except psycopg2.errors.ForeignKeyViolation:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail="Unknown product on purchase order line")
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -519,18 +2335,41 @@ def update_supplier(supplier_id: int, supplier: SupplierRequest):
         cur.close()
         conn.close()
 
-@app.delete("/api/suppliers/{supplier_id}")
-def delete_supplier(supplier_id: int):
+@app.post("/api/purchase-orders/{purchase_order_id}/receive")
+def receive_purchase_order(purchase_order_id: int):
+    """Add every line's quantity to stock; an order can be received once"""
+    store_id = current_store.get()
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM supplier WHERE s_id = %s RETURNING s_id;", (supplier_id,))
-        result = cur.fetchone()
-        if not result:
-            raise HTTPException(status_code=404, detail="Supplier not found")
+        execute_prepared(cur, LOCK_PURCHASE_ORDER, (purchase_order_id, store_id))
+        row = cur.fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Purchase order not found")
+        if row[0] is not None:
+            raise HTTPException(status_code=409, detail="Purchase order has already been received")
+
+        execute_prepared(cur, LOCK_PURCHASE_ORDER_PRODUCTS, (purchase_order_id, store_id))
+        execute_prepared(cur, RECEIVE_PURCHASE_ORDER_STOCK, (purchase_order_id, store_id))
+        width = len(PRODUCTS.columns)
+        rows = cur.fetchall()
+        if PRODUCTS.hooks.get("after_update"):
+            for row in rows:
+                PRODUCTS.fire("after_update", cur, PRODUCTS.record(row[:width]), PRODUCTS.record(row[width:]))
+        execute_prepared(cur, MARK_PURCHASE_ORDER_RECEIVED, (purchase_order_id, store_id))
+        received_at = cur.fetchone()[0]
         conn.commit()
-        return {"message": "Supplier deleted successfully"}
+        PRODUCTS.fire("after_commit")
+        return {
+            "Purchase_id": str(purchase_order_id),
+            "receivedAt": received_at.isoformat(),
+            "products": [
+                {"P_id": str(row[width]), "stock": row[width + PRODUCTS.columns.index("stock")]}
+                for row in sorted(rows, key=lambda r: r[width])
+            ],
+        }
     except HTTPException:
+        conn.rollback()
         raise
     except Exception as e:
         conn.rollback()
@@ -539,184 +2378,764 @@ def delete_supplier(supplier_id: int):
         cur.close()
         conn.close()
 
-# ==================== EMPLOYEE ENDPOINTS ====================
+# ==================== ORDER DETAILS ENDPOINTS ====================
 
-@app.get("/api/employees")
-def get_employees():
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM employee ORDER BY e_id;")
-        rows = cur.fetchall()
-        employees = [transform_employee_to_frontend(row) for row in rows]
-        return employees
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+@app.get("/api/order-details")
+def get_order_details(fields: Optional[str] = None, after: Optional[int] = None, limit: Optional[int] = None):
+    return ORDER_DETAILS.list(fields, after, limit)
 
-@app.get("/api/employees/count")
-def get_employee_count():
+@app.get("/api/order-details/count")
+def get_order_detail_count():
+    return ORDER_DETAILS.count()
+
+@app.get("/api/order-details/{order_id}")
+def get_order_detail_by_id(order_id: int, fields: Optional[str] = None):
+    return ORDER_DETAILS.get(order_id, fields)
+
+@app.post("/api/order-details")
+def create_order_detail(order_detail: OrderDetailsRequest):
+    check_client_order_id(order_detail)
+    return ORDER_DETAILS.create(order_detail)
+
+@app.put("/api/order-details/{order_id}")
+def update_order_detail(order_id: int, order_detail: OrderDetailsRequest):
+    check_client_order_id(order_detail, current=order_id)
+    return ORDER_DETAILS.update(order_id, order_detail)
+
+@app.delete("/api/order-details/{order_id}")
+def delete_order_detail(order_id: int):
+    return ORDER_DETAILS.delete(order_id)
+
+# ==================== INVENTORY ENDPOINTS ====================
+
+# Suggestions are computed in one set-based query and cached per parameter
+# set. An entry stays valid while the store's order-line watermark is
+# unchanged and nothing in this process has written products, invoices
+# (whose date moves their lines in or out of the window) or order lines, up
+# to REORDER_CACHE_TTL seconds (which bounds staleness from other workers).
+REORDER_CACHE_TTL = 300
+_reorder_cache = {}
+_reorder_lock = threading.Lock()
+_inventory_version = 0
+
+REORDER_SQL = """
+    WITH sales AS (
+        -- invoice_date is the partition key, so only the window's months are read
+        SELECT od.p_id, SUM(od.quantity) AS units
+        FROM orderdetails od
+        WHERE od.invoice_date >= CURRENT_DATE - %(window_days)s AND od.store_id = %(store_id)s
+        GROUP BY od.p_id
+    ),
+    cover AS (
+        SELECT p.p_id, p.name, p.s_id, p.stock, p.price,
+               COALESCE(s.units, 0)::float / %(window_days)s AS velocity
+        FROM product p
+        LEFT JOIN sales s ON s.p_id = p.p_id
+        WHERE p.store_id = %(store_id)s AND p.s_id IS NOT NULL
+    ),
+    suggested AS (
+        SELECT c.*,
+               CASE WHEN c.velocity > 0 THEN c.stock / c.velocity END AS days_of_cover,
+               GREATEST(CEIL(c.velocity * (%(lead_days)s + %(cover_days)s) - c.stock), 0)::int AS quantity
+        FROM cover c
+        WHERE c.velocity > 0 AND c.stock < c.velocity * (%(lead_days)s + %(cover_days)s)
+    )
+    SELECT sg.s_id, sup.name AS supplier_name,
+           SUM(sg.quantity * sg.price) AS estimated_amount,
+           json_agg(json_build_object(
+               'P_id', sg.p_id::text,
+               'name', sg.name,
+               'stock', sg.stock,
+               'velocity', round(sg.velocity::numeric, 3),
+               'daysOfCover', round(sg.days_of_cover::numeric, 1),
+               'quantity', sg.quantity
+           ) ORDER BY sg.days_of_cover, sg.p_id) AS lines
+    FROM suggested sg
+    LEFT JOIN supplier sup ON sup.s_id = sg.s_id AND sup.store_id = %(store_id)s
+    GROUP BY sg.s_id, sup.name
+    ORDER BY sg.s_id;
+"""
+
+def invalidate_reorder_cache():
+    """Mark cached reorder suggestions stale after a product, invoice or order line write"""
+    global _inventory_version
+    with _reorder_lock:
+        _inventory_version += 1
+
+PRODUCTS.on("after_commit", invalidate_reorder_cache)
+INVOICES.on("after_commit", invalidate_reorder_cache)
+ORDER_DETAILS.on("after_commit", invalidate_reorder_cache)
+
+def compute_reorder_suggestions(cur, store_id, window_days, lead_days, cover_days):
+    """Run the reorder query for one store and shape it into draft purchase orders"""
+    cur.execute(REORDER_SQL, {
+        "store_id": store_id,
+        "window_days": window_days,
+        "lead_days": lead_days,
+        "cover_days": cover_days,
+    })
+    return [
+        {
+            "S_id": str(s_id),
+            "supplierName": supplier_name or '',
+            "estimatedAmount": float(estimated_amount or 0),
+            "lines": lines,
+        }
+        for s_id, supplier_name, estimated_amount, lines in cur.fetchall()
+    ]
+
+@app.get("/api/inventory/reorder")
+def get_reorder_suggestions(window_days: int = 28, lead_days: int = 7, cover_days: int = 14, refresh: bool = False):
+    if window_days <= 0 or lead_days < 0 or cover_days < 0:
+        raise HTTPException(status_code=400, detail="window_days must be positive and lead_days/cover_days non-negative")
+    store_id = current_store.get()
+    key = (store_id, window_days, lead_days, cover_days)
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("SELECT COUNT(*) FROM employee;")
-        count = cur.fetchone()[0]
-        return {"count": count}
+        cur.execute("SELECT COALESCE(MAX(order_id), 0), CURRENT_DATE FROM orderdetails WHERE store_id = %s;", (store_id,))
+        watermark = tuple(cur.fetchone())
+        with _reorder_lock:
+            version = _inventory_version
+            cached = _reorder_cache.get(key)
+        if (not refresh and cached
+                and cached["watermark"] == watermark
+                and cached["version"] == version
+                and time.monotonic() - cached["computed_at"] < REORDER_CACHE_TTL):
+            return cached["result"]
+
+        purchase_orders = compute_reorder_suggestions(cur, store_id, window_days, lead_days, cover_days)
+        result = {
+            "windowDays": window_days,
+            "leadDays": lead_days,
+            "coverDays": cover_days,
+            "generatedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "purchaseOrders": purchase_orders,
+        }
+        with _reorder_lock:
+            _reorder_cache[key] = {
+                "watermark": watermark,
+                "version": version,
+                "computed_at": time.monotonic(),
+                "result": result,
+            }
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
 
-@app.get("/api/employees/{employee_id}")
-def get_employee_by_id(employee_id: int):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM employee WHERE e_id = %s;", (employee_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Employee not found")
-        return transform_employee_to_frontend(row)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+# ==================== ANALYTICS ENDPOINTS ====================
+
+# Analytics read the product_sales_daily buckets, so a range query touches
+# at most (days x products sold) rows however many order lines exist. The
+# buckets are keyed by store first: a store's figures read only its slice.
+# Results are kept in a small LRU keyed by the query parameters and dropped
+# whenever this process writes order lines, invoices or products (names
+# and categories are read from product). Revenue is summed from the prices
+# the lines were sold at (orderdetails.unit_price).
+ANALYTICS_CACHE_TTL = 60
+ANALYTICS_CACHE_SIZE = 256
+_analytics_cache = OrderedDict()
+_analytics_lock = threading.Lock()
+_analytics_version = 0
+
+ANALYTICS_METRICS = {
+    "revenue": "revenue",
+    "units": "units",
+    "margin": "margin",
+}
+
+def invalidate_analytics_cache():
+    """Drop cached analytics after a write that changed the sales buckets or products"""
+    global _analytics_version
+    with _analytics_lock:
+        _analytics_version += 1
+        _analytics_cache.clear()
+
+INVOICES.on("after_commit", invalidate_analytics_cache)
+ORDER_DETAILS.on("after_commit", invalidate_analytics_cache)
+PRODUCTS.on("after_commit", invalidate_analytics_cache)
+
+def cached_analytics(key, compute):
+    """Return the cached result for key, computing and storing it on a miss"""
+    with _analytics_lock:
+        entry = _analytics_cache.get(key)
+        if entry and time.monotonic() - entry[1] < ANALYTICS_CACHE_TTL:
+            _analytics_cache.move_to_end(key)
+            return entry[2]
+        version = _analytics_version
+    result = compute()
+    with _analytics_lock:
+        # A write that landed while computing makes this result stale
+        if version == _analytics_version:
+            _analytics_cache[key] = (version, time.monotonic(), result)
+            _analytics_cache.move_to_end(key)
+            while len(_analytics_cache) > ANALYTICS_CACHE_SIZE:
+                _analytics_cache.popitem(last=False)
+    return result
+
+def resolve_analytics_range(start, end):
+    """Default to the last 30 days and validate the requested range"""
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+def transform_sales_totals(row):
+    """Transform aggregated sales columns to frontend format"""
+    return {
+        "units": int(row['units']),
+        "revenue": float(row['revenue']),
+        "cost": float(row['cost']),
+        "margin": float(row['margin'])
+    }
 
-@app.post("/api/employees")
-def create_employee(employee: EmployeeRequest):
+def run_analytics_query(sql, params):
     conn = get_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     try:
-        phone_str = ', '.join(employee.phone) if employee.phone else ''
-        cur.execute("""
-            INSERT INTO employee (name, role, phone)
-            VALUES (%s, %s, %s)
-            RETURNING *;
-        """, (employee.name, employee.role, phone_str))
-        row = cur.fetchone()
-        conn.commit()
-        return transform_employee_to_frontend(row)
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        cur.execute(sql, params)
+        return cur.fetchall()
     finally:
         cur.close()
         conn.close()
 
-@app.put("/api/employees/{employee_id}")
-def update_employee(employee_id: int, employee: EmployeeRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+@app.get("/api/analytics/top-products")
+def get_top_products(start: Optional[date] = None, end: Optional[date] = None, metric: str = "revenue", limit: int = 10):
+    start, end = resolve_analytics_range(start, end)
+    order_by = ANALYTICS_METRICS.get(metric)
+    if order_by is None:
+        raise HTTPException(status_code=400, detail=f"metric must be one of: {', '.join(ANALYTICS_METRICS)}")
+    if limit <= 0 or limit > 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+
+    store_id = current_store.get()
+
+    def compute():
+        rows = run_analytics_query(f"""
+            WITH totals AS (
+                SELECT p_id, SUM(units) AS units, SUM(cost) AS cost, SUM(revenue) AS revenue
+                FROM product_sales_daily
+                WHERE store_id = %s AND day BETWEEN %s AND %s
+                GROUP BY p_id
+            )
+            SELECT p.p_id, p.name, p.category, t.units, t.cost, t.revenue,
+                   t.revenue - t.cost AS margin
+            FROM totals t
+            JOIN product p ON p.p_id = t.p_id AND p.store_id = %s
+            ORDER BY {order_by} DESC, p.p_id
+            LIMIT %s;
+        """, (store_id, start, end, store_id, limit))
+        return {
+            "start": str(start),
+            "end": str(end),
+            "metric": metric,
+            "products": [
+                {"P_id": str(row['p_id']), "name": row['name'], "category": row['category'], **transform_sales_totals(row)}
+                for row in rows
+            ]
+        }
+
     try:
-        phone_str = ', '.join(employee.phone) if employee.phone else ''
-        cur.execute("""
-            UPDATE employee 
-            SET name = %s, role = %s, phone = %s
-            WHERE e_id = %s
-            RETURNING *;
-        """, (employee.name, employee.role, phone_str, employee_id))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Employee not found")
-        conn.commit()
-        return transform_employee_to_frontend(row)
-    except HTTPException:
-        raise
+        return cached_analytics(("top-products", store_id, start, end, metric, limit), compute)
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/categories")
+def get_category_sales(start: Optional[date] = None, end: Optional[date] = None):
+    start, end = resolve_analytics_range(start, end)
+    store_id = current_store.get()
+
+    def compute():
+        rows = run_analytics_query("""
+            WITH totals AS (
+                SELECT p_id, SUM(units) AS units, SUM(cost) AS cost, SUM(revenue) AS revenue
+                FROM product_sales_daily
+                WHERE store_id = %s AND day BETWEEN %s AND %s
+                GROUP BY p_id
+            )
+            SELECT p.category, SUM(t.units) AS units, SUM(t.cost) AS cost,
+                   SUM(t.revenue) AS revenue,
+                   SUM(t.revenue - t.cost) AS margin
+            FROM totals t
+            JOIN product p ON p.p_id = t.p_id AND p.store_id = %s
+            GROUP BY p.category
+            ORDER BY revenue DESC, p.category;
+        """, (store_id, start, end, store_id))
+        return {
+            "start": str(start),
+            "end": str(end),
+            "categories": [{"category": row['category'], **transform_sales_totals(row)} for row in rows]
+        }
 
-@app.delete("/api/employees/{employee_id}")
-def delete_employee(employee_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM employee WHERE e_id = %s RETURNING e_id;", (employee_id,))
-        result = cur.fetchone()
-        if not result:
-            raise HTTPException(status_code=404, detail="Employee not found")
-        conn.commit()
-        return {"message": "Employee deleted successfully"}
-    except HTTPException:
-        raise
+        return cached_analytics(("categories", store_id, start, end), compute)
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+        raise HTTPException(status_code=500, detail=str(e))
 
-# ==================== INVOICE ENDPOINTS ====================
+@app.get("/api/analytics/stores")
+def get_store_sales(start: Optional[date] = None, end: Optional[date] = None):
+    """Sales of every store side by side; reads only the rollup buckets"""
+    start, end = resolve_analytics_range(start, end)
+
+    def compute():
+        rows = run_analytics_query("""
+            WITH totals AS (
+                SELECT store_id, SUM(units) AS units, SUM(cost) AS cost, SUM(revenue) AS revenue
+                FROM product_sales_daily
+                WHERE day BETWEEN %s AND %s
+                GROUP BY store_id
+            )
+            SELECT t.store_id, st.name, t.units, t.cost, t.revenue,
+                   t.revenue - t.cost AS margin
+            FROM totals t
+            LEFT JOIN store st ON st.store_id = t.store_id
+            ORDER BY t.store_id;
+        """, (start, end))
+        return {
+            "start": str(start),
+            "end": str(end),
+            "stores": [
+                {"store_id": row['store_id'], "name": row['name'] or '', **transform_sales_totals(row)}
+                for row in rows
+            ]
+        }
 
-@app.get("/api/invoices")
-def get_invoices():
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     try:
-        cur.execute("SELECT * FROM invoice ORDER BY i_id;")
-        rows = cur.fetchall()
-        invoices = [transform_invoice_to_frontend(row) for row in rows]
-        return invoices
+        return cached_analytics(("stores", start, end), compute)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
 
-@app.get("/api/invoices/count")
-def get_invoice_count():
+# ==================== JOB ENDPOINTS ====================
+
+# Long-running work (exports, rollup rebuilds) is queued in the jobs table
+# and picked up by a pool of worker threads in every API process. Each job
+# type has its own per-process concurrency limit and retry budget; failed
+# attempts are retried with exponential backoff.
+EXPORT_DIR = Path(__file__).parent / "exports"
+# Written by `migrate.py archive`: one <partition>.csv.gz per detached month
+ARCHIVE_DIR = Path(__file__).parent / "archive"
+JOB_WORKERS = 4
+JOB_POLL_INTERVAL = 2.0
+JOB_HEARTBEAT_TIMEOUT = 300
+# Exports copy the live rows this many at a time, reporting progress after each batch
+EXPORT_BATCH_SIZE = 50000
+
+EXPORT_TABLES = {
+    "customers": ("customer", "c_id"),
+    "products": ("product", "p_id"),
+    "suppliers": ("supplier", "s_id"),
+    "employees": ("employee", "e_id"),
+    "invoices": ("invoice", "i_id"),
+    "purchase-orders": ("purchaseorder", "purchase_id"),
+    "order-details": ("orderdetails", "order_id"),
+}
+
+# The rebuild jobs recompute the rollups of the store that queued them.
+# Days before the oldest live invoice belong to archived partitions and are
+# kept as they are
+REBUILD_SALES_ROLLUP_SQL = """
+    DELETE FROM product_sales_daily
+    WHERE store_id = %(store_id)s
+      AND day >= COALESCE((SELECT MIN(date) FROM invoice), '-infinity');
+    INSERT INTO product_sales_daily (store_id, day, p_id, units, cost, revenue)
+    SELECT i.store_id, i.date, od.p_id, SUM(od.quantity), SUM(od.cost),
+           COALESCE(SUM(od.quantity * od.unit_price), 0)
+    FROM orderdetails od
+    JOIN invoice i ON i.i_id = od.i_id AND i.store_id = od.store_id
+    WHERE od.p_id IS NOT NULL AND od.store_id = %(store_id)s
+    GROUP BY i.store_id, i.date, od.p_id;
+"""
+
+# Archived invoices are only left as per-customer totals
+REBUILD_CUSTOMER_SUMMARIES_SQL = """
+    DELETE FROM customer_summary WHERE store_id = %(store_id)s;
+    INSERT INTO customer_summary (c_id, store_id, total_spend, invoice_count, first_purchase, last_purchase)
+    SELECT c.c_id, c.store_id,
+           COALESCE(l.total_spend, 0) + COALESCE(a.total_spend, 0),
+           COALESCE(l.invoice_count, 0) + COALESCE(a.invoice_count, 0),
+           LEAST(l.first_purchase, a.first_purchase),
+           GREATEST(l.last_purchase, a.last_purchase)
+    FROM (
+        SELECT i.c_id, SUM(i.amount) AS total_spend, COUNT(*) AS invoice_count,
+               MIN(i.date) AS first_purchase, MAX(i.date) AS last_purchase
+        FROM invoice i
+        JOIN customer c ON c.c_id = i.c_id AND c.store_id = i.store_id
+        WHERE i.store_id = %(store_id)s
+        GROUP BY i.c_id
+    ) l
+    FULL JOIN (
+        SELECT a.* FROM customer_summary_archived a
+        JOIN customer c ON c.c_id = a.c_id AND c.store_id = %(store_id)s
+    ) a ON a.c_id = l.c_id
+    JOIN customer c ON c.c_id = COALESCE(l.c_id, a.c_id);
+"""
+
+class JobContext:
+    """Handed to job handlers to report progress on the running job"""
+
+    def __init__(self, job_id, conn, store_id):
+        self.job_id = job_id
+        self.conn = conn
+        # The store of the request that queued the job
+        self.store_id = store_id
+
+    def progress(self, fraction):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                "UPDATE jobs SET progress = %s, heartbeat_at = now() WHERE id = %s;",
+                (max(0.0, min(float(fraction), 1.0)), self.job_id),
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+def archived_partitions(table):
+    """Archived CSV files for a partitioned table, oldest month first"""
+    return sorted((ARCHIVE_DIR / table).glob(f"{table}_*.csv.gz"))
+
+def copy_archived_rows(src, dst, store_id, columns):
+    """Copy the store's rows of one archived partition file, as `columns`
+
+    Files archived before a column was added (store_id, invoice_date) are
+    mapped onto the live columns by name; a missing store_id means all the
+    rows belong to DEFAULT_STORE_ID and other missing columns are left empty.
+    """
+    reader = csv.reader(src)
+    header = next(reader, None)
+    if header is None:
+        return
+    store = str(store_id)
+    if "store_id" in header:
+        column = header.index("store_id")
+        rows = (row for row in reader if row[column] == store)
+    elif store_id == DEFAULT_STORE_ID:
+        rows = reader
+    else:
+        return
+    positions = [header.index(c) if c in header else None for c in columns]
+    # Same line ends as the live rows written by COPY
+    csv.writer(dst, lineterminator="\n").writerows(
+        [row[i] if i is not None else store if c == "store_id" else "" for i, c in zip(positions, columns)]
+        for row in rows
+    )
+
+def run_export_job(params, ctx):
+    """Write one table's rows of the job's store to a gzipped CSV file under EXPORT_DIR
+
+    With include_archived, rows from archived partitions come first, so the
+    file covers the full history of invoices and order details. Live rows
+    are copied EXPORT_BATCH_SIZE at a time in pk order, each batch starting
+    after the last key of the one before. Progress is reported after each
+    archived file and each batch, counting live rows against their total.
+    """
+    entity = params.get("entity")
+    if entity not in EXPORT_TABLES:
+        raise ValueError(f"entity must be one of: {', '.join(EXPORT_TABLES)}")
+    table, pk = EXPORT_TABLES[entity]
+    archives = archived_partitions(table) if params.get("include_archived") else []
+    EXPORT_DIR.mkdir(exist_ok=True)
+    path = EXPORT_DIR / f"job-{ctx.job_id}-{entity}.csv.gz"
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("SELECT COUNT(*) FROM invoice;")
-        count = cur.fetchone()[0]
-        return {"count": count}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # One snapshot for the count and all the batches
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+        cur.execute(f"SELECT COUNT(*) FROM {table} WHERE store_id = %s;", (ctx.store_id,))
+        total = cur.fetchone()[0]
+        # Archived and live rows are both written as the live columns
+        cur.execute(f"SELECT * FROM {table} LIMIT 0;")
+        columns = [d[0] for d in cur.description]
+        steps = len(archives) + 1
+        with gzip.open(path, "wt", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerow(columns)
+            for n, archive in enumerate(archives):
+                with gzip.open(archive, "rt", newline="") as src:
+                    copy_archived_rows(src, f, ctx.store_id, columns)
+                ctx.progress((n + 1) / steps)
+            after, written = None, 0
+            while True:
+                where, args = "store_id = %s", [ctx.store_id]
+                if after is not None:
+                    where += f" AND {pk} > %s"
+                    args.append(after)
+                # Last key of this batch; None when the rest fits in it
+                cur.execute(
+                    f"SELECT {pk} FROM {table} WHERE {where} ORDER BY {pk} OFFSET %s LIMIT 1;",
+                    args + [EXPORT_BATCH_SIZE - 1],
+                )
+                row = cur.fetchone()
+                upper = row[0] if row else None
+                if upper is not None:
+                    where += f" AND {pk} <= %s"
+                    args.append(upper)
+                query = cur.mogrify(f"SELECT * FROM {table} WHERE {where} ORDER BY {pk}", args).decode()
+                cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV", f)
+                written = written + EXPORT_BATCH_SIZE if upper is not None else total
+                live = min(written / total, 1.0) if total else 1.0
+                ctx.progress((len(archives) + live) / steps)
+                if upper is None:
+                    break
+                after = upper
     finally:
         cur.close()
         conn.close()
+    return {"path": str(path), "entity": entity}
 
-@app.get("/api/invoices/{invoice_id}")
-def get_invoice_by_id(invoice_id: int):
+def run_sql_rebuild_job(sql):
+    def run(params, ctx):
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            started = time.perf_counter()
+            cur.execute(sql, {"store_id": ctx.store_id})
+            conn.commit()
+            return {"seconds": round(time.perf_counter() - started, 3)}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+    return run
+
+JOB_TYPES = {
+    "export": {"handler": run_export_job, "concurrency": 2, "max_attempts": 3},
+    "rebuild_sales_rollup": {"handler": run_sql_rebuild_job(REBUILD_SALES_ROLLUP_SQL), "concurrency": 1, "max_attempts": 2},
+    "rebuild_customer_summaries": {"handler": run_sql_rebuild_job(REBUILD_CUSTOMER_SUMMARIES_SQL), "concurrency": 1, "max_attempts": 2},
+}
+
+def transform_job_to_frontend(row):
+    """Transform database row to frontend format"""
+    return {
+        "Job_id": str(row.get('id', '')),
+        "type": row.get('job_type', ''),
+        "params": row.get('params') or {},
+        "status": row.get('status', ''),
+        "progress": row.get('progress', 0),
+        "attempts": row.get('attempts', 0),
+        "error": row.get('error'),
+        "hasResult": row.get('status') == 'succeeded',
+        "createdAt": str(row['created_at']) if row.get('created_at') else None,
+        "finishedAt": str(row['finished_at']) if row.get('finished_at') else None
+    }
+
+class JobWorkerPool:
+    """Threads that claim queued jobs and run them outside the request path"""
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self.threads = []
+        self.running = defaultdict(int)
+        self.active = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+
+    def start(self):
+        if self.threads:
+            return
+        self.stopping.clear()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self.heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def stop(self, timeout=10):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def notify(self):
+        self.wakeup.set()
+
+    def claim(self, cur):
+        """Claim the oldest runnable job of a type that still has a free slot"""
+        with self.lock:
+            types = [t for t, spec in JOB_TYPES.items() if self.running[t] < spec["concurrency"]]
+            if not types:
+                return None
+            cur.execute("""
+                UPDATE jobs
+                SET status = 'running', attempts = attempts + 1,
+                    started_at = now(), heartbeat_at = now(), progress = 0
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE status = 'queued' AND job_type = ANY(%s) AND run_after <= now()
+                    ORDER BY id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, job_type, params, attempts, max_attempts, store_id;
+            """, (types,))
+            job = cur.fetchone()
+            cur.connection.commit()
+            if job:
+                self.running[job[1]] += 1
+                self.active.add(job[0])
+            return job
+
+    def heartbeat(self):
+        """Keep the jobs running in this process from being requeued as stale"""
+        conn = None
+        while not self.stopping.wait(JOB_HEARTBEAT_TIMEOUT / 3):
+            with self.lock:
+                active = list(self.active)
+            if not active:
+                continue
+            try:
+                if conn is None or conn.closed:
+                    conn = get_connection()
+                cur = conn.cursor()
+                try:
+                    cur.execute("UPDATE jobs SET heartbeat_at = now() WHERE id = ANY(%s);", (active,))
+                    conn.commit()
+                finally:
+                    cur.close()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+                if conn is not None:
+                    conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    def requeue_stale(self, cur):
+        """Put back jobs whose worker stopped heartbeating (e.g. a crashed process)"""
+        cur.execute("""
+            UPDATE jobs SET status = 'queued', run_after = now()
+            WHERE status = 'running' AND heartbeat_at < now() - %s * interval '1 second';
+        """, (JOB_HEARTBEAT_TIMEOUT,))
+        cur.connection.commit()
+
+    def work(self):
+        conn = None
+        last_requeue = 0.0
+        while not self.stopping.is_set():
+            try:
+                if conn is None or conn.closed:
+                    conn = get_connection()
+                cur = conn.cursor()
+                try:
+                    if time.monotonic() - last_requeue > JOB_HEARTBEAT_TIMEOUT / 2:
+                        self.requeue_stale(cur)
+                        last_requeue = time.monotonic()
+                    job = self.claim(cur)
+                finally:
+                    cur.close()
+                if job is None:
+                    self.wakeup.wait(JOB_POLL_INTERVAL)
+                    self.wakeup.clear()
+                    continue
+                try:
+                    self.run(conn, *job)
+                finally:
+                    with self.lock:
+                        self.running[job[1]] -= 1
+                        self.active.discard(job[0])
+            except Exception:
+                logger.exception("Job worker error")
+                if conn is not None:
+                    conn.close()
+                conn = None
+                self.stopping.wait(JOB_POLL_INTERVAL)
+        if conn is not None:
+            conn.close()
+
+    def run(self, conn, job_id, job_type, params, attempts, max_attempts, store_id):
+        ctx = JobContext(job_id, conn, store_id)
+        try:
+            result = JOB_TYPES[job_type]["handler"](params, ctx)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed on attempt %s", job_id, job_type, attempts)
+            conn.rollback()
+            cur = conn.cursor()
+            try:
+                if attempts < max_attempts:
+                    cur.execute("""
+                        UPDATE jobs SET status = 'queued', error = %s,
+                            run_after = now() + %s * interval '1 second'
+                        WHERE id = %s;
+                    """, (str(e), 2 ** attempts, job_id))
+                else:
+                    cur.execute("""
+                        UPDATE jobs SET status = 'failed', error = %s, finished_at = now()
+                        WHERE id = %s;
+                    """, (str(e), job_id))
+                conn.commit()
+            finally:
+                cur.close()
+            return
+        result = result or {}
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE jobs SET status = 'succeeded', progress = 1, error = NULL,
+                    result = %s, result_path = %s, finished_at = now()
+                WHERE id = %s;
+            """, (json.dumps(result), result.get("path"), job_id))
+            conn.commit()
+        finally:
+            cur.close()
+
+job_pool = JobWorkerPool()
+
+@on_startup
+def start_job_workers():
+    # Jobs are queued in Postgres
+    if STORAGE_BACKEND == "postgres":
+        job_pool.start()
+
+@on_shutdown
+def stop_job_workers():
+    job_pool.stop()
+
+@app.get("/api/jobs")
+def get_jobs(status: Optional[str] = None, limit: int = 50):
     conn = get_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     try:
-        cur.execute("SELECT * FROM invoice WHERE i_id = %s;", (invoice_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Invoice not found")
-        return transform_invoice_to_frontend(row)
-    except HTTPException:
-        raise
+        store_id = current_store.get()
+        if status:
+            cur.execute(
+                "SELECT * FROM jobs WHERE store_id = %s AND status = %s ORDER BY id DESC LIMIT %s;",
+                (store_id, status, limit),
+            )
+        else:
+            cur.execute("SELECT * FROM jobs WHERE store_id = %s ORDER BY id DESC LIMIT %s;", (store_id, limit))
+        return [transform_job_to_frontend(row) for row in cur.fetchall()]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
 
-@app.post("/api/invoices")
-def create_invoice(invoice: InvoiceRequest):
+@app.post("/api/jobs", status_code=202)
+def create_job(job: JobRequest):
+    spec = JOB_TYPES.get(job.type)
+    if spec is None:
+        raise HTTPException(status_code=400, detail=f"type must be one of: {', '.join(JOB_TYPES)}")
     conn = get_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     try:
         cur.execute("""
-            INSERT INTO invoice (date, amount, payment_method, c_id, e_id)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO jobs (job_type, params, max_attempts, store_id)
+            VALUES (%s, %s, %s, %s)
             RETURNING *;
-        """, (invoice.date, invoice.amount, invoice.paymentMethod, invoice.c_id, invoice.e_id))
+        """, (job.type, json.dumps(job.params), spec["max_attempts"], current_store.get()))
         row = cur.fetchone()
         conn.commit()
-        return transform_invoice_to_frontend(row)
+        job_pool.notify()
+        return transform_job_to_frontend(row)
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -724,158 +3143,235 @@ def create_invoice(invoice: InvoiceRequest):
         cur.close()
         conn.close()
 
-@app.put("/api/invoices/{invoice_id}")
-def update_invoice(invoice_id: int, invoice: InvoiceRequest):
+@app.get("/api/jobs/{job_id}")
+def get_job_by_id(job_id: int):
     conn = get_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     try:
-        cur.execute("""
-            UPDATE invoice 
-            SET date = %s, amount = %s, payment_method = %s, c_id = %s, e_id = %s
-            WHERE i_id = %s
-            RETURNING *;
-        """, (invoice.date, invoice.amount, invoice.paymentMethod, invoice.c_id, invoice.e_id, invoice_id))
+        cur.execute("SELECT * FROM jobs WHERE id = %s AND store_id = %s;", (job_id, current_store.get()))
         row = cur.fetchone()
         if not row:
-            raise HTTPException(status_code=404, detail="Invoice not found")
-        conn.commit()
-        return transform_invoice_to_frontend(row)
+            raise HTTPException(status_code=404, detail="Job not found")
+        return transform_job_to_frontend(row)
     except HTTPException:
         raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
-
-@app.delete("/api/invoices/{invoice_id}")
-def delete_invoice(invoice_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM invoice WHERE i_id = %s RETURNING i_id;", (invoice_id,))
-        result = cur.fetchone()
-        if not result:
-            raise HTTPException(status_code=404, detail="Invoice not found")
-        conn.commit()
-        return {"message": "Invoice deleted successfully"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
-
-# ==================== PURCHASE ORDER ENDPOINTS ====================
-
-@app.get("/api/purchase-orders")
-def get_purchase_orders():
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM purchaseorder ORDER BY purchase_id;")
-        rows = cur.fetchall()
-        purchase_orders = [transform_purchase_order_to_frontend(row) for row in rows]
-        return purchase_orders
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
 
-@app.get("/api/purchase-orders/count")
-def get_purchase_order_count():
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT COUNT(*) FROM purchaseorder;")
-        count = cur.fetchone()[0]
-        return {"count": count}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
-
-@app.get("/api/purchase-orders/{purchase_order_id}")
-def get_purchase_order_by_id(purchase_order_id: int):
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: int):
     conn = get_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     try:
-        cur.execute("SELECT * FROM purchaseorder WHERE purchase_id = %s;", (purchase_order_id,))
+        cur.execute(
+            "SELECT status, result, result_path FROM jobs WHERE id = %s AND store_id = %s;",
+            (job_id, current_store.get()),
+        )
         row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Purchase order not found")
-        return transform_purchase_order_to_frontend(row)
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
+    if not row:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if row['status'] != 'succeeded':
+        raise HTTPException(status_code=409, detail=f"Job is {row['status']}")
+    if row['result_path']:
+        path = Path(row['result_path'])
+        if not path.exists():
+            raise HTTPException(status_code=410, detail="Job result file no longer exists")
+        return FileResponse(path, filename=path.name, media_type="application/gzip")
+    return row['result'] or {}
+
+# ==================== TILL SYNC ENDPOINTS ====================
+
+# Each till runs till_agent.py, which keeps a SQLite copy of the entities
+# below and pulls /api/sync/changes every few seconds. Sales rung up at the
+# till (online or not) are queued locally and pushed to /api/sync/sales in
+# batches, each sale carrying a client reference so a retried batch is
+# never booked twice.
+SYNC_ENTITIES = {"products": PRODUCTS, "customers": CUSTOMERS, "employees": EMPLOYEES}
+# updated_at is stamped before commit, so a row can become visible with a
+# timestamp just behind a cursor already handed out; re-reading this window
+# on every pull picks those rows up
+SYNC_OVERLAP_SECONDS = 60
+# Tombstones are kept this long; a till whose cursor is older gets a full reload
+SYNC_TOMBSTONE_RETENTION = 30 * 24 * 60 * 60
+SYNC_MAX_BATCH = 500
+
+SYNC_CHANGES_SQL = {
+    key: f"SELECT {', '.join(entity.full_view.columns)} FROM {entity.table} "
+         f"WHERE store_id = %s AND updated_at > %s::timestamptz - make_interval(secs => {SYNC_OVERLAP_SECONDS}) ORDER BY {entity.pk};"
+    for key, entity in SYNC_ENTITIES.items()
+}
+SYNC_ENTITY_BY_TABLE = {entity.table: key for key, entity in SYNC_ENTITIES.items()}
+
+CLAIM_TILL_SALE = register_prepared("claim_till_sale", """
+    INSERT INTO till_sales (client_ref, till_id) VALUES (%s, %s)
+    ON CONFLICT (client_ref) DO NOTHING
+    RETURNING client_ref;
+""")
+FIND_TILL_SALE = register_prepared("find_till_sale", "SELECT i_id FROM till_sales WHERE client_ref = %s;")
+LINK_TILL_SALE = register_prepared("link_till_sale", "UPDATE till_sales SET i_id = %s WHERE client_ref = %s;")
+NEXT_ORDER_IDS = register_prepared(
+    "next_order_ids",
+    "SELECT nextval(pg_get_serial_sequence('orderdetails', 'order_id')) FROM generate_series(1, %s);",
+)
 
-@app.post("/api/purchase-orders")
-def create_purchase_order(purchase_order: PurchaseOrderRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("""
-            INSERT INTO purchaseorder (date, amount, s_id)
-            VALUES (%s, %s, %s)
-            RETURNING *;
-        """, (purchase_order.date, purchase_order.amount, purchase_order.s_id))
-        row = cur.fetchone()
-        conn.commit()
-        return transform_purchase_order_to_frontend(row)
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+_last_tombstone_prune = 0.0
+
+def prune_sync_tombstones(cur):
+    """Delete tombstones past their retention, at most once an hour"""
+    global _last_tombstone_prune
+    if time.time() - _last_tombstone_prune < 60 * 60:
+        return
+    _last_tombstone_prune = time.time()
+    cur.execute(
+        "DELETE FROM sync_tombstones WHERE deleted_at < now() - make_interval(secs => %s);",
+        (SYNC_TOMBSTONE_RETENTION,),
+    )
 
-@app.put("/api/purchase-orders/{purchase_order_id}")
-def update_purchase_order(purchase_order_id: int, purchase_order: PurchaseOrderRequest):
+def ingest_till_sale(cur, store_id, till_id, sale, prices, customers, employees):
+    """Book one till sale as an invoice with its order lines.
+
+    The till may have been offline for a while, so what it sold can have
+    changed on the server since: a deleted product, customer or employee is
+    dropped from the sale (the money is still booked) and a price that no
+    longer matches is kept as charged. Each such case is reported as a
+    conflict alongside the created invoice.
+    """
+    execute_prepared(cur, CLAIM_TILL_SALE, (sale.clientRef, till_id))
+    if cur.fetchone() is None:
+        execute_prepared(cur, FIND_TILL_SALE, (sale.clientRef,))
+        i_id = cur.fetchone()[0]
+        return {"clientRef": sale.clientRef, "status": "duplicate", "invoiceId": str(i_id) if i_id else None}
+
+    conflicts = []
+    c_id, e_id = sale.c_id, sale.e_id
+    if c_id is not None and c_id not in customers:
+        conflicts.append({"field": "c_id", "value": c_id, "reason": "customer no longer exists"})
+        c_id = None
+    if e_id is not None and e_id not in employees:
+        conflicts.append({"field": "e_id", "value": e_id, "reason": "employee no longer exists"})
+        e_id = None
+
+    amount = round(sum(line.quantity * line.price for line in sale.lines), 2)
+    invoice_request = InvoiceRequest(date=sale.date, amount=amount, paymentMethod=sale.paymentMethod, c_id=c_id, e_id=e_id)
+    execute_prepared(cur, INVOICES.insert_statement, INVOICES.to_values(invoice_request) + (store_id,))
+    invoice = INVOICES.record(cur.fetchone())
+    INVOICES.fire("after_create", cur, None, invoice)
+
+    execute_prepared(cur, NEXT_ORDER_IDS, (len(sale.lines),))
+    order_ids = [row[0] for row in cur.fetchall()]
+    for order_id, line in zip(order_ids, sale.lines):
+        p_id = line.p_id
+        if p_id is not None and p_id not in prices:
+            conflicts.append({"field": "p_id", "value": p_id, "reason": "product no longer exists"})
+            p_id = None
+        elif p_id is not None and float(prices[p_id]) != line.price:
+            conflicts.append({"field": "price", "value": line.price, "reason": f"product {p_id} now sells at {float(prices[p_id])}"})
+        line_request = OrderDetailsRequest(
+            Order_Id=str(order_id), quantity=line.quantity, cost=line.cost, i_id=invoice["i_id"], p_id=p_id
+        )
+        execute_prepared(cur, ORDER_DETAILS.insert_statement, ORDER_DETAILS.to_values(line_request) + (store_id,))
+        ORDER_DETAILS.fire("after_create", cur, None, ORDER_DETAILS.record(cur.fetchone()))
+
+    execute_prepared(cur, LINK_TILL_SALE, (invoice["i_id"], sale.clientRef))
+    return {"clientRef": sale.clientRef, "status": "created", "invoiceId": str(invoice["i_id"]), "conflicts": conflicts}
+
+@app.get("/api/sync/changes")
+def get_sync_changes(since: Optional[str] = None):
+    """Rows of the synced entities changed after `since`, plus deleted ids.
+
+    Pass the returned cursor as `since` on the next call. Without `since`,
+    or with one older than the tombstone retention, every row is returned
+    and `reset` tells the till to replace its copy.
+    """
+    store_id = current_store.get()
     conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur = conn.cursor()
     try:
-        cur.execute("""
-            UPDATE purchaseorder 
-            SET date = %s, amount = %s, s_id = %s
-            WHERE purchase_id = %s
-            RETURNING *;
-        """, (purchase_order.date, purchase_order.amount, purchase_order.s_id, purchase_order_id))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Purchase order not found")
+        if since is None:
+            cur.execute("SELECT now(), true;")
+        else:
+            cur.execute(
+                "SELECT now(), %s::timestamptz < now() - make_interval(secs => %s);",
+                (since, SYNC_TOMBSTONE_RETENTION),
+            )
+        cursor, reset = cur.fetchone()
+        upserts = {}
+        for key, entity in SYNC_ENTITIES.items():
+            if reset:
+                cur.execute(entity.full_view.list_sql, (store_id,))
+            else:
+                cur.execute(SYNC_CHANGES_SQL[key], (store_id, since))
+            upserts[key] = list(map(entity.transform, cur.fetchall()))
+        deletes = {key: [] for key in SYNC_ENTITIES}
+        if not reset:
+            cur.execute(
+                "SELECT entity, pk FROM sync_tombstones "
+                "WHERE store_id = %s AND deleted_at > %s::timestamptz - make_interval(secs => %s);",
+                (store_id, since, SYNC_OVERLAP_SECONDS),
+            )
+            for table, pk in cur.fetchall():
+                if table in SYNC_ENTITY_BY_TABLE:
+                    deletes[SYNC_ENTITY_BY_TABLE[table]].append(pk)
+        prune_sync_tombstones(cur)
         conn.commit()
-        return transform_purchase_order_to_frontend(row)
-    except HTTPException:
-        raise
+        return {"cursor": cursor.isoformat(), "reset": reset, "upserts": upserts, "deletes": deletes}
+    except psycopg2.DataError:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail="since must be a timestamp returned as a sync cursor")
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
 
-@app.delete("/api/purchase-orders/{purchase_order_id}")
-def delete_purchase_order(purchase_order_id: int):
+@app.post("/api/sync/sales")
+def ingest_till_sales(batch: TillSalesBatch):
+    """Book a batch of till sales in one transaction, one result per sale.
+
+    A sale that fails is rolled back on its own and reported as rejected;
+    the rest of the batch is still booked.
+    """
+    if len(batch.sales) > SYNC_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {SYNC_MAX_BATCH} sales per batch")
+    p_ids = sorted({line.p_id for sale in batch.sales for line in sale.lines if line.p_id is not None})
+    c_ids = sorted({sale.c_id for sale in batch.sales if sale.c_id is not None})
+    e_ids = sorted({sale.e_id for sale in batch.sales if sale.e_id is not None})
+    store_id = current_store.get()
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM purchaseorder WHERE purchase_id = %s RETURNING purchase_id;", (purchase_order_id,))
-        result = cur.fetchone()
-        if not result:
-            raise HTTPException(status_code=404, detail="Purchase order not found")
+        cur.execute("SELECT p_id, price FROM product WHERE p_id = ANY(%s) AND store_id = %s;", (p_ids, store_id))
+        prices = dict(cur.fetchall())
+        cur.execute("SELECT c_id FROM customer WHERE c_id = ANY(%s) AND store_id = %s;", (c_ids, store_id))
+        customers = {row[0] for row in cur.fetchall()}
+        cur.execute("SELECT e_id FROM employee WHERE e_id = ANY(%s) AND store_id = %s;", (e_ids, store_id))
+        employees = {row[0] for row in cur.fetchall()}
+
+        results = []
+        for sale in batch.sales:
+            cur.execute("SAVEPOINT till_sale;")
+            audited = len(conn.audit_entries)
+            try:
+                results.append(ingest_till_sale(cur, store_id, batch.tillId, sale, prices, customers, employees))
+                cur.execute("RELEASE SAVEPOINT till_sale;")
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT till_sale;")
+                del conn.audit_entries[audited:]
+                results.append({"clientRef": sale.clientRef, "status": "rejected", "detail": str(e)})
         conn.commit()
-        return {"message": "Purchase order deleted successfully"}
-    except HTTPException:
-        raise
+        if any(result["status"] == "created" for result in results):
+            INVOICES.fire("after_commit")
+            ORDER_DETAILS.fire("after_commit")
+        return {"results": results}
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -883,134 +3379,554 @@ def delete_purchase_order(purchase_order_id: int):
         cur.close()
         conn.close()
 
-# ==================== ORDER DETAILS ENDPOINTS ====================
-
-@app.get("/api/order-details")
-def get_order_details():
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM orderdetails ORDER BY order_id;")
-        rows = cur.fetchall()
-        order_details = [transform_order_details_to_frontend(row) for row in rows]
-        return order_details
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+# ==================== AUDIT ENDPOINTS ====================
+
+# Every create, update and delete made through the entity hooks is recorded
+# in audit_log with its before and after images, taken from the rows the
+# write already returned. Entries are collected on the connection and only
+# queued once the transaction commits; a background thread writes the queue
+# to audit_log with COPY, AUDIT_BATCH_SIZE rows at a time or every
+# AUDIT_FLUSH_INTERVAL seconds. When the queue is full, committing writers
+# wait up to AUDIT_SUBMIT_TIMEOUT for room before entries are dropped (and
+# counted), so a stalled database slows writes down instead of growing
+# memory without bound.
+AUDIT_BUFFER_SIZE = 20000
+AUDIT_BATCH_SIZE = 1000
+AUDIT_FLUSH_INTERVAL = 1.0
+AUDIT_SUBMIT_TIMEOUT = 5.0
+AUDIT_RETRY_DELAY = 5.0
+AUDIT_SHUTDOWN_TIMEOUT = 30.0
+AUDIT_PAGE_SIZE = 100
+# Set from the X-Actor header (or the client address) for each request
+audit_actor = contextvars.ContextVar("audit_actor", default=None)
+
+class AuditLog:
+    """Bounded queue of audit entries flushed to audit_log by one thread"""
+
+    def __init__(self, capacity=AUDIT_BUFFER_SIZE):
+        self.capacity = capacity
+        self.buffer = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def submit(self, entries):
+        deadline = time.monotonic() + AUDIT_SUBMIT_TIMEOUT
+        dropped = 0
+        with self.condition:
+            for entry in entries:
+                while len(self.buffer) >= self.capacity and self.thread is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.notify_all()
+                    self.condition.wait(remaining)
+                if len(self.buffer) >= self.capacity:
+                    dropped += 1
+                    continue
+                self.buffer.append(entry)
+            self.dropped += dropped
+            if len(self.buffer) >= AUDIT_BATCH_SIZE:
+                self.condition.notify_all()
+        if dropped:
+            logger.warning("Audit queue full: dropped %d entries", dropped)
+
+    def start(self):
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, name="audit-flusher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Flush what is queued and stop the flusher"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(AUDIT_SHUTDOWN_TIMEOUT)
+            self.thread = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.stopping and len(self.buffer) < AUDIT_BATCH_SIZE:
+                    self.condition.wait(AUDIT_FLUSH_INTERVAL)
+                batch = [self.buffer.popleft() for _ in range(min(len(self.buffer), AUDIT_BATCH_SIZE))]
+                stopping = self.stopping
+                if batch:
+                    # Writers waiting for room can go on
+                    self.condition.notify_all()
+            if not batch:
+                if stopping:
+                    return
+                continue
+            try:
+                self.write(batch)
+                self.written += len(batch)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                if stopping:
+                    logger.error("Could not write %d audit entries on shutdown: %s", len(batch), e)
+                    self.dropped += len(batch)
+                    continue
+                logger.warning("Writing audit entries failed (%s); retrying in %.0fs", e, AUDIT_RETRY_DELAY)
+                # Back at the front, in order; the queue may briefly exceed
+                # its capacity by this one batch
+                with self.condition:
+                    self.buffer.extendleft(reversed(batch))
+                time.sleep(AUDIT_RETRY_DELAY)
+
+    def write(self, batch):
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for at, store_id, entity, pk, action, actor, before, after in batch:
+            writer.writerow((
+                at.isoformat(), store_id, entity, pk, action, actor,
+                json.dumps(before, default=str) if before is not None else None,
+                json.dumps(after, default=str) if after is not None else None,
+            ))
+        data.seek(0)
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.copy_expert(
+                "COPY audit_log (at, store_id, entity, pk, action, actor, before, after) FROM STDIN WITH (FORMAT csv)",
+                data,
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+audit_log = AuditLog()
+
+def audit_hook(entity, action):
+    def record_change(cur, old, new):
+        if old == new:
+            return
+        pk = (new or old)[entity.pk]
+        cur.connection.audit_entries.append(
+            (datetime.now(timezone.utc), current_store.get(), entity.name, str(pk), action, audit_actor.get(), old, new)
+        )
+    return record_change
+
+for entity in ENTITIES:
+    entity.on("after_create", audit_hook(entity, "create"))
+    entity.on("after_update", audit_hook(entity, "update"))
+    entity.on("after_delete", audit_hook(entity, "delete"))
+
+class AuditActorMiddleware:
+    """ASGI middleware naming who makes each request, for the audit log"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        actor = None
+        for name, value in scope["headers"]:
+            if name == b"x-actor":
+                actor = value.decode("latin-1")[:200]
+                break
+        if actor is None and scope.get("client"):
+            actor = scope["client"][0]
+        token = audit_actor.set(actor)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            audit_actor.reset(token)
+
+app.add_middleware(AuditActorMiddleware)
+
+@on_startup
+def start_audit_log():
+    audit_log.start()
+
+@on_shutdown
+def stop_audit_log():
+    audit_log.stop()
+
+def transform_audit_entry(row):
+    id, at, entity, pk, action, actor, before, after = row
+    return {
+        "id": str(id),
+        "at": at.isoformat(),
+        "entity": entity,
+        "pk": pk,
+        "action": action,
+        "actor": actor,
+        "before": before,
+        "after": after,
+    }
 
-@app.get("/api/order-details/count")
-def get_order_detail_count():
+@app.get("/api/audit")
+def get_audit_entries(
+    entity: Optional[str] = None,
+    pk: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    before: Optional[int] = None,
+    limit: int = AUDIT_PAGE_SIZE,
+):
+    """Audit entries, newest first, filtered by entity (and pk) and time.
+
+    since/until are ISO timestamps (until is exclusive). Pass the last id of
+    a page as `before` for the next one. Entries appear here within about
+    AUDIT_FLUSH_INTERVAL seconds of their commit.
+    """
+    if entity is not None and entity not in {e.name for e in ENTITIES}:
+        raise HTTPException(status_code=400, detail=f"entity must be one of: {', '.join(e.name for e in ENTITIES)}")
+    if pk is not None and entity is None:
+        raise HTTPException(status_code=400, detail="pk needs an entity")
+    limit = check_page_limit(limit)
+    conditions, params = ["store_id = %s"], [current_store.get()]
+    for condition, value in (
+        ("entity = %s", entity),
+        ("pk = %s", pk),
+        ("at >= %s::timestamptz", since),
+        ("at < %s::timestamptz", until),
+        ("id < %s", before),
+    ):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}"
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("SELECT COUNT(*) FROM orderdetails;")
-        count = cur.fetchone()[0]
-        return {"count": count}
+        cur.execute(
+            f"SELECT id, at, entity, pk, action, actor, before, after FROM audit_log {where} ORDER BY id DESC LIMIT %s;",
+            params + [limit],
+        )
+        items = [transform_audit_entry(row) for row in cur.fetchall()]
+        return {"items": items, "next": items[-1]["id"] if len(items) == limit else None}
+    except psycopg2.DataError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e.pgerror or e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
 
-@app.get("/api/order-details/{order_id}")
-def get_order_detail_by_id(order_id: int):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM orderdetails WHERE order_id = %s;", (order_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Order detail not found")
-        return transform_order_details_to_frontend(row)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+@app.get("/api/audit/status")
+def get_audit_status():
+    return {
+        "queued": len(audit_log.buffer),
+        "capacity": audit_log.capacity,
+        "written": audit_log.written,
+        "dropped": audit_log.dropped,
+        "lastError": audit_log.last_error,
+    }
 
-@app.post("/api/order-details")
-def create_order_detail(order_detail: OrderDetailsRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        # Convert Order_Id string to int if it's numeric
-        order_id = int(order_detail.Order_Id) if order_detail.Order_Id.isdigit() else None
-        if order_id is None:
-            raise HTTPException(status_code=400, detail="Order_Id must be a valid integer")
-        
-        cur.execute("""
-            INSERT INTO orderdetails (order_id, quantity, cost, i_id, p_id)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING *;
-        """, (order_id, order_detail.quantity, order_detail.cost, order_detail.i_id, order_detail.p_id))
-        row = cur.fetchone()
-        conn.commit()
-        return transform_order_details_to_frontend(row)
-    except ValueError:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail="Order_Id must be a valid integer")
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+# ==================== DEBUG ENDPOINTS ====================
+
+# A stack sampler for finding where request time goes (psycopg2, the row
+# mappers, FastAPI serialization). While a sampled request is in flight a
+# background thread reads every thread's stack each PROFILE_INTERVAL
+# seconds and charges it to a route:
+#   - on the event loop thread, to the request whose task is running
+#     (middleware, validation, async endpoints, response serialization);
+#   - on a threadpool thread, to the route whose endpoint is on the stack.
+# PROFILE_SAMPLE_RATE of requests are sampled all the time; a capture from
+# /api/debug/profile samples every request and job run, in every worker
+# process, for a fixed number of seconds. Worker processes share nothing
+# but PROFILE_DIR, so captures are announced and collected through files
+# there. Both endpoints need the X-Admin-Token header and are disabled
+# when VIJAY_ADMIN_TOKEN is not set.
+ADMIN_TOKEN = os.environ.get("VIJAY_ADMIN_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.environ.get("VIJAY_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(__file__).parent / "profiles"
+PROFILE_INTERVAL = 0.005
+PROFILE_MAX_DEPTH = 128
+PROFILE_MAX_STACKS = 5000
+PROFILE_FLUSH_INTERVAL = 10
+PROFILE_CAPTURE_POLL = 1.0
+PROFILE_MAX_SECONDS = 300
+
+def route_label(scope):
+    """'GET /api/products/{product_id}' for a request scope"""
+    path = getattr(scope.get("route"), "path", None) or "<unrouted>"
+    return f"{scope['method']} {path}"
+
+class StackSampler:
+    """Samples thread stacks into per-route counters of collapsed stacks"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(Counter)
+        self.dirty = False
+        self.tasks = {}
+        self.loop = None
+        self.loop_thread = None
+        self.endpoints = {}
+        self.frame_names = {}
+        self.capture = None
+        self.seen_captures = set()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self, app):
+        if self.thread is not None or not (PROFILE_SAMPLE_RATE > 0 or ADMIN_TOKEN):
+            return
+        for route in app.routes:
+            methods = sorted(getattr(route, "methods", None) or ())
+            if hasattr(route, "endpoint") and methods:
+                method = next((m for m in methods if m != "HEAD"), methods[0])
+                self.endpoints[route.endpoint.__code__] = f"{method} {route.path}"
+        self.endpoints[JobWorkerPool.run.__code__] = "job"
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+        self.thread.start()
+
+    def wants_request(self):
+        return self.thread is not None and (self.capture is not None or random.random() < PROFILE_SAMPLE_RATE)
+
+    def enter(self, task, scope):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.loop_thread = threading.get_ident()
+        self.tasks[task] = scope
+        self.wakeup.set()
+
+    def leave(self, task):
+        self.tasks.pop(task, None)
+
+    def frame_name(self, code):
+        name = self.frame_names.get(code)
+        if name is None:
+            path = Path(code.co_filename)
+            name = self.frame_names[code] = f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+        return name
+
+    def thread_label(self, frame):
+        """Route (or job type) whose code is on a worker thread's stack, if any"""
+        while frame is not None:
+            label = self.endpoints.get(frame.f_code)
+            if label == "job":
+                return f"job {frame.f_locals.get('job_type')}"
+            if label is not None:
+                return label
+            frame = frame.f_back
+        return None
+
+    def stack(self, frame):
+        names = []
+        while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+            names.append(self.frame_name(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def sample(self):
+        capture = self.capture
+        in_flight = list(self.tasks.items())
+        sampled_routes = {route_label(scope) for _, scope in in_flight}
+        running = asyncio.current_task(self.loop) if self.loop is not None else None
+        me = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            if ident == self.loop_thread:
+                scope = self.tasks.get(running)
+                if scope is None:
+                    continue
+                label = route_label(scope)
+            else:
+                label = self.thread_label(frame)
+                if label is None or (capture is None and label not in sampled_routes):
+                    continue
+            counter = capture["samples"][label] if capture is not None else self.samples[label]
+            stack = self.stack(frame)
+            if stack in counter or len(counter) < PROFILE_MAX_STACKS:
+                counter[stack] += 1
+            else:
+                counter["<other stacks>"] += 1
+            self.dirty = capture is None or self.dirty
+
+    def run(self):
+        last_poll = last_flush = 0.0
+        while True:
+            try:
+                now = time.monotonic()
+                if now - last_poll > PROFILE_CAPTURE_POLL:
+                    self.poll_captures()
+                    last_poll = now
+                if self.dirty and now - last_flush > PROFILE_FLUSH_INTERVAL:
+                    self.flush()
+                    last_flush = now
+                if self.capture is not None or self.tasks:
+                    with self.lock:
+                        self.sample()
+                    time.sleep(PROFILE_INTERVAL)
+                else:
+                    self.wakeup.wait(PROFILE_CAPTURE_POLL)
+                    self.wakeup.clear()
+            except Exception:
+                logger.exception("Profiler error")
+                time.sleep(PROFILE_CAPTURE_POLL)
+
+    def flush(self):
+        """Write this process's sampled-request counters to PROFILE_DIR"""
+        with self.lock:
+            data = {label: dict(counter) for label, counter in self.samples.items()}
+            self.dirty = False
+        write_profile_file(PROFILE_DIR / f"samples-{os.getpid()}.json", data)
+
+    def poll_captures(self):
+        """Start a capture announced by any worker; finish ours at its deadline"""
+        now = time.time()
+        if self.capture is not None and now >= self.capture["deadline"]:
+            capture, self.capture = self.capture, None
+            data = {label: dict(counter) for label, counter in capture["samples"].items()}
+            write_profile_file(PROFILE_DIR / capture["id"] / f"{os.getpid()}.json", data)
+        if self.capture is not None or not PROFILE_DIR.is_dir():
+            return
+        for path in PROFILE_DIR.glob("capture-*.json"):
+            try:
+                announced = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if announced["id"] not in self.seen_captures and now < announced["deadline"]:
+                self.seen_captures.add(announced["id"])
+                self.capture = {"id": announced["id"], "deadline": announced["deadline"], "samples": defaultdict(Counter)}
+                return
+
+def write_profile_file(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data))
+    tmp.replace(path)
+
+def merge_profile_files(paths, route=None):
+    """Sum {route: {stack: count}} files, optionally keeping one route"""
+    merged = defaultdict(Counter)
+    for path in paths:
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for label, stacks in data.items():
+            if route is None or label == route:
+                merged[label].update(stacks)
+    return merged
+
+def collapsed_profile(samples):
+    """Brendan Gregg's collapsed-stack format, one line per route and stack"""
+    lines = [f"{label};{stack} {count}" for label, stacks in sorted(samples.items()) for stack, count in stacks.items()]
+    return "\n".join(lines) + "\n"
+
+def speedscope_profile(samples, name):
+    """A speedscope file with one sampled profile per route"""
+    frames, index = [], {}
+    profiles = []
+    for label, stacks in sorted(samples.items()):
+        stack_list, weights = [], []
+        for stack, count in stacks.items():
+            ids = []
+            for frame in stack.split(";"):
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame})
+                ids.append(index[frame])
+            stack_list.append(ids)
+            weights.append(round(count * PROFILE_INTERVAL * 1000, 3))
+        profiles.append({
+            "type": "sampled",
+            "name": label,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": round(sum(weights), 3),
+            "samples": stack_list,
+            "weights": weights,
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "name": name,
+        "activeProfileIndex": 0,
+        "exporter": "vijay-sales",
+    }
 
-@app.put("/api/order-details/{order_id}")
-def update_order_detail(order_id: int, order_detail: OrderDetailsRequest):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        # Convert Order_Id string to int if it's numeric
-        new_order_id = int(order_detail.Order_Id) if order_detail.Order_Id.isdigit() else None
-        if new_order_id is None:
-            raise HTTPException(status_code=400, detail="Order_Id must be a valid integer")
-        
-        cur.execute("""
-            UPDATE orderdetails 
-            SET order_id = %s, quantity = %s, cost = %s, i_id = %s, p_id = %s
-            WHERE order_id = %s
-            RETURNING *;
-        """, (new_order_id, order_detail.quantity, order_detail.cost, order_detail.i_id, order_detail.p_id, order_id))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Order detail not found")
-        conn.commit()
-        return transform_order_details_to_frontend(row)
-    except ValueError:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail="Order_Id must be a valid integer")
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+def profile_response(samples, name, format):
+    if format == "collapsed":
+        return Response(
+            content=collapsed_profile(samples), media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="{name}.collapsed.txt"'},
+        )
+    return JSONResponse(
+        speedscope_profile(samples, name),
+        headers={"Content-Disposition": f'attachment; filename="{name}.speedscope.json"'},
+    )
 
-@app.delete("/api/order-details/{order_id}")
-def delete_order_detail(order_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
+profiler = StackSampler()
+
+class ProfilingMiddleware:
+    """ASGI middleware marking the requests the stack sampler should follow"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.wants_request():
+            return await self.app(scope, receive, send)
+        task = asyncio.current_task()
+        profiler.enter(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.leave(task)
+
+app.add_middleware(ProfilingMiddleware)
+
+@on_startup
+def start_profiler():
+    profiler.start(app)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def check_profile_format(format):
+    if format not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be speedscope or collapsed")
+
+@app.get("/api/debug/profile/samples", dependencies=[Depends(require_admin)])
+def get_profile_samples(route: Optional[str] = None, format: str = "speedscope"):
+    """Per-route samples of the sampled fraction of requests, from all workers"""
+    check_profile_format(format)
+    if profiler.thread is not None:
+        profiler.flush()
+    samples = merge_profile_files(PROFILE_DIR.glob("samples-*.json"), route)
+    return profile_response(samples, "sampled-requests", format)
+
+@app.get("/api/debug/profile", dependencies=[Depends(require_admin)])
+async def capture_profile(seconds: int = 30, format: str = "speedscope"):
+    """Sample every request in every worker for `seconds`, then return the merged profile"""
+    check_profile_format(format)
+    if seconds <= 0 or seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 1 and {PROFILE_MAX_SECONDS}")
+    if profiler.thread is None:
+        raise HTTPException(status_code=503, detail="Profiler is not running")
+    capture_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{random.randrange(1 << 16):04x}"
+    announcement = PROFILE_DIR / f"capture-{capture_id}.json"
+    write_profile_file(announcement, {"id": capture_id, "deadline": time.time() + seconds})
+    profiler.wakeup.set()
     try:
-        cur.execute("DELETE FROM orderdetails WHERE order_id = %s RETURNING order_id;", (order_id,))
-        result = cur.fetchone()
-        if not result:
-            raise HTTPException(status_code=404, detail="Order detail not found")
-        conn.commit()
-        return {"message": "Order detail deleted successfully"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        # Every worker polls for the announcement and writes its samples
+        # once the deadline passes
+        await asyncio.sleep(seconds + 2 * PROFILE_CAPTURE_POLL + 1)
+        results = PROFILE_DIR / capture_id
+        samples = merge_profile_files(results.glob("*.json"))
+        response = profile_response(samples, f"capture-{capture_id}", format)
+        shutil.rmtree(results, ignore_errors=True)
+        return response
     finally:
-        cur.close()
-        conn.close()
+        announcement.unlink(missing_ok=True)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Apply the SQL migrations in migrations/ to the Grocery database.
+Run this script after pulling changes that add new migration files.
+
+Partition maintenance for invoice and orderdetails:
+    python migrate.py partitions --ahead 3          # create the next 3 months
+    python migrate.py archive --before 2024-01-01   # archive months before a date
+"""
+
+import argparse
+import gzip
+import sys
+from datetime import date
+from pathlib import Path
+
+from main import get_connection, ARCHIVE_DIR
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+# Partitioned table -> partition key
+PARTITIONED_TABLES = {"invoice": "date", "orderdetails": "invoice_date"}
+
+ARCHIVE_CUSTOMER_TOTALS_SQL = """
+    INSERT INTO customer_summary_archived (c_id, total_spend, invoice_count, first_purchase, last_purchase)
+    SELECT i.c_id, SUM(i.amount), COUNT(*), MIN(i.date), MAX(i.date)
+    FROM {partition} i
+    JOIN customer c ON c.c_id = i.c_id
+    GROUP BY i.c_id
+    ON CONFLICT (c_id) DO UPDATE
+    SET total_spend = customer_summary_archived.total_spend + EXCLUDED.total_spend,
+        invoice_count = customer_summary_archived.invoice_count + EXCLUDED.invoice_count,
+        first_purchase = LEAST(customer_summary_archived.first_purchase, EXCLUDED.first_purchase),
+        last_purchase = GREATEST(customer_summary_archived.last_purchase, EXCLUDED.last_purchase);
+"""
+
+def applied_migrations(cur):
+    """Return the set of migration names already recorded in the database"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name TEXT PRIMARY KEY,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    cur.execute("SELECT name FROM schema_migrations;")
+    return {row[0] for row in cur.fetchall()}
+
+def migrate(args=None):
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        done = applied_migrations(cur)
+        conn.commit()
+        pending = [p for p in sorted(MIGRATIONS_DIR.glob("*.sql")) if p.name not in done]
+        if not pending:
+            print("Database is up to date")
+            return
+        for path in pending:
+            print(f"Applying {path.name}...")
+            # Each migration runs in its own transaction so a failure leaves
+            # the earlier ones applied and this one untouched
+            cur.execute(path.read_text())
+            cur.execute("INSERT INTO schema_migrations (name) VALUES (%s);", (path.name,))
+            conn.commit()
+        print(f"Applied {len(pending)} migration(s)")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+def create_partitions(args):
+    """Make sure monthly partitions exist from this month to args.ahead months out
+
+    Months that were missed and already have rows in the default partition
+    get their partitions too; create_monthly_partitions moves those rows in.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        for table, key in PARTITIONED_TABLES.items():
+            cur.execute(
+                f"""
+                SELECT create_monthly_partitions(
+                    %s,
+                    LEAST(CURRENT_DATE, (SELECT MIN({key}) FROM {table}_default)),
+                    (CURRENT_DATE + make_interval(months => %s))::date
+                );
+                """,
+                (table, args.ahead),
+            )
+            print(f"{table}: created {cur.fetchone()[0]} partition(s)")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Creating partitions failed: {e}")
+        sys.exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+def monthly_partitions_before(cur, table, before):
+    """Names of the monthly partitions of table whose range ends on or before `before`"""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits inh
+        JOIN pg_class c ON c.oid = inh.inhrelid
+        WHERE inh.inhparent = %s::regclass
+          AND c.relname ~ '_[0-9]{4}_[0-9]{2}$'
+          AND (to_date(right(c.relname, 7), 'YYYY_MM') + interval '1 month')::date <= %s
+        ORDER BY c.relname;
+    """, (table, before))
+    return [row[0] for row in cur.fetchall()]
+
+def archive_partitions(args):
+    """Detach old monthly partitions, copy each to ARCHIVE_DIR and drop it
+
+    A partition is only dropped once its file has been written, and each one
+    is handled in its own transaction. Rollups keep the archived history:
+    product_sales_daily keeps its old days, and each invoice partition is
+    folded into customer_summary_archived, which customer summaries are
+    recomputed from along with the live invoices.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    archived = 0
+    try:
+        for table in PARTITIONED_TABLES:
+            (ARCHIVE_DIR / table).mkdir(parents=True, exist_ok=True)
+            for partition in monthly_partitions_before(cur, table, args.before):
+                path = ARCHIVE_DIR / table / f"{partition}.csv.gz"
+                print(f"Archiving {partition} to {path}...")
+                cur.execute(f"ALTER TABLE {table} DETACH PARTITION {partition};")
+                tmp = path.with_suffix(".tmp")
+                with gzip.open(tmp, "wt", newline="") as f:
+                    cur.copy_expert(f"COPY {partition} TO STDOUT WITH CSV HEADER", f)
+                tmp.replace(path)
+                if table == "invoice":
+                    cur.execute(ARCHIVE_CUSTOMER_TOTALS_SQL.format(partition=partition))
+                cur.execute(f"DROP TABLE {partition};")
+                conn.commit()
+                archived += 1
+        print(f"Archived {archived} partition(s)")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Archiving failed: {e}")
+        sys.exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("migrate", help="apply pending migrations (default)")
+    partitions = commands.add_parser("partitions", help="create upcoming monthly partitions")
+    partitions.add_argument("--ahead", type=int, default=3, help="months ahead of the current one")
+    archive = commands.add_parser("archive", help="archive and drop monthly partitions")
+    archive.add_argument("--before", type=date.fromisoformat, required=True, help="YYYY-MM-DD; months ending by this date are archived")
+    args = parser.parse_args()
+    {None: migrate, "migrate": migrate, "partitions": create_partitions, "archive": archive_partitions}[args.command](args)
+
+if __name__ == "__main__":
+    main()
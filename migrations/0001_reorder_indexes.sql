@@ -0,0 +1,6 @@
+-- Indexes backing /api/inventory/reorder: the sales window is found by
+-- invoice date and order lines are joined back through i_id without
+-- touching the heap.
+CREATE INDEX IF NOT EXISTS invoice_date_idx ON invoice (date, i_id);
+CREATE INDEX IF NOT EXISTS orderdetails_i_id_idx ON orderdetails (i_id) INCLUDE (p_id, quantity);
+CREATE INDEX IF NOT EXISTS product_s_id_idx ON product (s_id) INCLUDE (stock);
@@ -0,0 +1,26 @@
+-- Per-customer sales summary maintained by the invoice handlers so that
+-- lifetime value and recency queries never scan invoice.
+CREATE INDEX IF NOT EXISTS invoice_c_id_idx ON invoice (c_id) INCLUDE (amount, date);
+
+CREATE TABLE IF NOT EXISTS customer_summary (
+    c_id INTEGER PRIMARY KEY REFERENCES customer (c_id) ON DELETE CASCADE,
+    total_spend NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    invoice_count INTEGER NOT NULL DEFAULT 0,
+    first_purchase DATE,
+    last_purchase DATE
+);
+
+CREATE INDEX IF NOT EXISTS customer_summary_spend_idx ON customer_summary (total_spend DESC, c_id);
+CREATE INDEX IF NOT EXISTS customer_summary_recent_idx ON customer_summary (last_purchase DESC NULLS LAST, c_id);
+CREATE INDEX IF NOT EXISTS customer_summary_count_idx ON customer_summary (invoice_count DESC, c_id);
+
+INSERT INTO customer_summary (c_id, total_spend, invoice_count, first_purchase, last_purchase)
+SELECT i.c_id, SUM(i.amount), COUNT(*), MIN(i.date), MAX(i.date)
+FROM invoice i
+JOIN customer c ON c.c_id = i.c_id
+GROUP BY i.c_id
+ON CONFLICT (c_id) DO UPDATE
+SET total_spend = EXCLUDED.total_spend,
+    invoice_count = EXCLUDED.invoice_count,
+    first_purchase = EXCLUDED.first_purchase,
+    last_purchase = EXCLUDED.last_purchase;
@@ -0,0 +1,23 @@
+-- Daily per-product sales buckets backing the /api/analytics endpoints.
+-- Only additive quantities from orderdetails are stored, so the order line
+-- and invoice handlers can keep buckets exact by subtracting a line's old
+-- contribution and adding its new one. Revenue and margin are derived from
+-- product.price when the buckets are read.
+CREATE TABLE IF NOT EXISTS product_sales_daily (
+    day DATE NOT NULL,
+    p_id INTEGER NOT NULL,
+    units BIGINT NOT NULL DEFAULT 0,
+    cost NUMERIC(16, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, p_id) INCLUDE (units, cost)
+);
+
+TRUNCATE product_sales_daily;
+
+INSERT INTO product_sales_daily (day, p_id, units, cost)
+SELECT i.date, od.p_id, SUM(od.quantity), SUM(od.cost)
+FROM orderdetails od
+JOIN invoice i ON i.i_id = od.i_id
+WHERE od.p_id IS NOT NULL
+GROUP BY i.date, od.p_id;
+
+ANALYZE product_sales_daily;
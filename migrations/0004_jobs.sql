@@ -0,0 +1,24 @@
+-- Queue for background jobs. Workers claim rows with
+-- SELECT ... FOR UPDATE SKIP LOCKED, so any number of API processes can
+-- share the table without handing the same job out twice.
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    progress REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+    heartbeat_at TIMESTAMPTZ,
+    error TEXT,
+    result JSONB,
+    result_path TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS jobs_queued_idx ON jobs (job_type, run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS jobs_running_idx ON jobs (heartbeat_at) WHERE status = 'running';
@@ -0,0 +1,13 @@
+-- Responses of POST/PUT requests sent with an Idempotency-Key header, so
+-- a retried request is answered from here instead of writing again.
+-- Rows with a NULL status_code are reservations for requests in flight.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status_code INTEGER,
+    headers JSONB,
+    body BYTEA,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idempotency_keys_created_idx ON idempotency_keys (created_at);
@@ -0,0 +1,138 @@
+-- Convert invoice and orderdetails to monthly range partitions.
+--
+-- invoice is partitioned on date. orderdetails is partitioned on a new
+-- invoice_date column holding the date of the line's invoice, which the
+-- order line handlers fill in from i_id; date-range queries on lines can
+-- then prune to the months they cover. Order lines without an invoice (no
+-- invoice_date) and rows dated after the months created here land in a
+-- DEFAULT partition.
+--
+-- Postgres only enforces unique constraints on a partitioned table when
+-- they include the partition key, so:
+--   * invoice's primary key becomes (i_id, date); i_id still comes from
+--     its sequence, and date can no longer be NULL, so the migration stops
+--     before touching anything if an invoice has no date;
+--   * orderdetails has no primary key, only an index on order_id;
+--   * foreign keys referencing invoice (orderdetails.i_id) cannot be kept.
+-- Other foreign keys of both tables are copied over.
+--
+-- The rows are copied under an exclusive lock, so run this in a quiet
+-- window. New months are added with `python migrate.py partitions`.
+
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent regclass, first_month date, last_month date)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', first_month)::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month <= last_month LOOP
+        partition_name := format('%s_%s', (SELECT relname FROM pg_class WHERE oid = parent), to_char(month, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                partition_name, parent, month, (month + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+
+LOCK TABLE invoice, orderdetails IN ACCESS EXCLUSIVE MODE;
+
+DO $$
+DECLARE
+    undated integer;
+BEGIN
+    SELECT COUNT(*) INTO undated FROM invoice WHERE date IS NULL;
+    IF undated > 0 THEN
+        RAISE EXCEPTION '% invoice(s) have no date; set their dates first', undated;
+    END IF;
+END $$;
+
+ALTER TABLE invoice RENAME TO invoice_unpartitioned;
+ALTER TABLE orderdetails RENAME TO orderdetails_unpartitioned;
+
+CREATE TABLE invoice (
+    LIKE invoice_unpartitioned INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS INCLUDING GENERATED
+) PARTITION BY RANGE (date);
+
+CREATE TABLE orderdetails (
+    LIKE orderdetails_unpartitioned INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS INCLUDING GENERATED,
+    invoice_date DATE
+) PARTITION BY RANGE (invoice_date);
+
+CREATE TABLE invoice_default PARTITION OF invoice DEFAULT;
+CREATE TABLE orderdetails_default PARTITION OF orderdetails DEFAULT;
+
+SELECT create_monthly_partitions(
+    'invoice',
+    COALESCE((SELECT min(date) FROM invoice_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + interval '3 months')::date
+);
+SELECT create_monthly_partitions(
+    'orderdetails',
+    COALESCE((SELECT min(date) FROM invoice_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + interval '3 months')::date
+);
+
+INSERT INTO invoice SELECT * FROM invoice_unpartitioned;
+INSERT INTO orderdetails
+SELECT od.*, i.date
+FROM orderdetails_unpartitioned od
+LEFT JOIN invoice_unpartitioned i ON i.i_id = od.i_id;
+
+-- Keep id sequences: a serial sequence is handed to the new table before
+-- the old one (its owner) is dropped; an identity sequence is new and is
+-- moved past the copied ids.
+DO $$
+DECLARE
+    t record;
+    seq text;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES ('invoice', 'i_id'), ('orderdetails', 'order_id')) AS v (name, pk) LOOP
+        seq := pg_get_serial_sequence(t.name || '_unpartitioned', t.pk);
+        IF seq IS NOT NULL AND (
+            SELECT attidentity FROM pg_attribute
+            WHERE attrelid = (t.name || '_unpartitioned')::regclass AND attname = t.pk
+        ) = '' THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.%I', seq, t.name, t.pk);
+        END IF;
+        seq := pg_get_serial_sequence(t.name, t.pk);
+        IF seq IS NOT NULL THEN
+            EXECUTE format('SELECT setval(%L, max(%I)) FROM %I HAVING max(%I) IS NOT NULL', seq, t.pk, t.name, t.pk);
+        END IF;
+    END LOOP;
+END $$;
+
+DO $$
+DECLARE
+    c record;
+BEGIN
+    FOR c IN
+        SELECT replace(conrelid::regclass::text, '_unpartitioned', '') AS table_name,
+               conname, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE contype = 'f'
+          AND conrelid IN ('invoice_unpartitioned'::regclass, 'orderdetails_unpartitioned'::regclass)
+          AND confrelid NOT IN ('invoice_unpartitioned'::regclass, 'orderdetails_unpartitioned'::regclass)
+    LOOP
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I %s', c.table_name, c.conname, c.definition);
+    END LOOP;
+END $$;
+
+DROP TABLE orderdetails_unpartitioned, invoice_unpartitioned CASCADE;
+
+ALTER TABLE invoice ADD PRIMARY KEY (i_id, date);
+CREATE INDEX invoice_date_idx ON invoice (date, i_id);
+CREATE INDEX invoice_c_id_idx ON invoice (c_id) INCLUDE (amount, date);
+
+CREATE INDEX orderdetails_order_id_idx ON orderdetails (order_id);
+CREATE INDEX orderdetails_i_id_idx ON orderdetails (i_id) INCLUDE (p_id, quantity);
+CREATE INDEX orderdetails_invoice_date_idx ON orderdetails (invoice_date) INCLUDE (p_id, quantity);
+
+ANALYZE invoice;
+ANALYZE orderdetails;
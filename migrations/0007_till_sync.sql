@@ -0,0 +1,73 @@
+-- Change feed for the till agents (till_agent.py).
+--
+-- product, customer and employee get an updated_at column bumped on every
+-- write; deletes leave a row in sync_tombstones so tills can drop their
+-- copy. till_sales records the client reference of every sale pushed by a
+-- till, so a batch that is retried after a lost response is not booked twice.
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END $$;
+
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    entity TEXT NOT NULL,
+    pk TEXT NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    PRIMARY KEY (entity, pk)
+);
+
+CREATE INDEX IF NOT EXISTS sync_tombstones_deleted_at_idx ON sync_tombstones (deleted_at);
+
+-- TG_ARGV[0] is the table's primary key column
+CREATE OR REPLACE FUNCTION record_sync_tombstone() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sync_tombstones (entity, pk)
+    VALUES (TG_TABLE_NAME, to_jsonb(OLD) ->> TG_ARGV[0])
+    ON CONFLICT (entity, pk) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END $$;
+
+DO $$
+DECLARE
+    t record;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES ('product', 'p_id'), ('customer', 'c_id'), ('employee', 'e_id')) AS v (name, pk) LOOP
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()', t.name);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I (updated_at)', t.name || '_updated_at_idx', t.name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t.name || '_touch_updated_at', t.name);
+        EXECUTE format(
+            'CREATE TRIGGER %I BEFORE UPDATE ON %I FOR EACH ROW EXECUTE FUNCTION touch_updated_at()',
+            t.name || '_touch_updated_at', t.name
+        );
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t.name || '_sync_tombstone', t.name);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone(%L)',
+            t.name || '_sync_tombstone', t.name, t.pk
+        );
+    END LOOP;
+END $$;
+
+CREATE TABLE IF NOT EXISTS till_sales (
+    client_ref TEXT PRIMARY KEY,
+    till_id TEXT NOT NULL,
+    i_id INTEGER,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Till sales have no Order_Id of their own, so order lines need a sequence
+-- when the column does not already draw from one
+DO $$
+BEGIN
+    IF pg_get_serial_sequence('orderdetails', 'order_id') IS NULL THEN
+        CREATE SEQUENCE orderdetails_order_id_seq OWNED BY orderdetails.order_id;
+        ALTER TABLE orderdetails ALTER COLUMN order_id SET DEFAULT nextval('orderdetails_order_id_seq');
+    END IF;
+    PERFORM setval(
+        pg_get_serial_sequence('orderdetails', 'order_id'),
+        GREATEST((SELECT MAX(order_id) FROM orderdetails), 1)
+    );
+END $$;
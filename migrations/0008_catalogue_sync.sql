@@ -0,0 +1,4 @@
+-- Supplier catalogue sync matches a supplier's products by name, and may
+-- only delete products no order line refers to.
+CREATE INDEX IF NOT EXISTS product_s_id_name_idx ON product (s_id, name);
+CREATE INDEX IF NOT EXISTS orderdetails_p_id_idx ON orderdetails (p_id);
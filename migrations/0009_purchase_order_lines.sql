@@ -0,0 +1,13 @@
+-- Line items for purchase orders. Receiving an order adds every line's
+-- quantity to product.stock once; received_at records that it happened.
+ALTER TABLE purchaseorder ADD COLUMN IF NOT EXISTS received_at TIMESTAMPTZ;
+
+CREATE TABLE IF NOT EXISTS purchaseorder_lines (
+    purchase_id INTEGER NOT NULL REFERENCES purchaseorder (purchase_id) ON DELETE CASCADE,
+    p_id INTEGER NOT NULL REFERENCES product (p_id),
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    cost NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (purchase_id, p_id)
+);
+
+CREATE INDEX IF NOT EXISTS purchaseorder_lines_p_id_idx ON purchaseorder_lines (p_id);
@@ -0,0 +1,17 @@
+-- Before/after images of every create, update and delete made through the
+-- API, written in batches by the audit flusher in main.py.
+CREATE TABLE IF NOT EXISTS audit_log (
+    id BIGSERIAL PRIMARY KEY,
+    at TIMESTAMPTZ NOT NULL,
+    entity TEXT NOT NULL,
+    pk TEXT NOT NULL,
+    action TEXT NOT NULL CHECK (action IN ('create', 'update', 'delete')),
+    actor TEXT,
+    before JSONB,
+    after JSONB
+);
+
+CREATE INDEX IF NOT EXISTS audit_log_entity_id_idx ON audit_log (entity, id);
+CREATE INDEX IF NOT EXISTS audit_log_entity_pk_id_idx ON audit_log (entity, pk, id);
+-- Rows arrive in time order, so a BRIN index covers time filters cheaply
+CREATE INDEX IF NOT EXISTS audit_log_at_idx ON audit_log USING brin (at);
@@ -0,0 +1,75 @@
+-- Multi-store tenancy. Every entity row belongs to a store; existing rows
+-- go to store 1. Each table gets a (store_id, pk) index so a store's lists,
+-- keyset pages and counts read only that store's slice. invoice and
+-- orderdetails stay range-partitioned by date; the index is created on
+-- every partition. The rollups carry store_id so that cross-store reports
+-- never scan the fact tables.
+
+CREATE TABLE IF NOT EXISTS store (
+    store_id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+INSERT INTO store (store_id, name) VALUES (1, 'Main store') ON CONFLICT (store_id) DO NOTHING;
+SELECT setval(pg_get_serial_sequence('store', 'store_id'), GREATEST((SELECT MAX(store_id) FROM store), 1));
+
+DO $$
+DECLARE
+    t record;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES
+        ('customer', 'c_id'), ('product', 'p_id'), ('supplier', 's_id'), ('employee', 'e_id'),
+        ('invoice', 'i_id'), ('purchaseorder', 'purchase_id'), ('orderdetails', 'order_id')
+    ) AS v (name, pk) LOOP
+        EXECUTE format(
+            'ALTER TABLE %I ADD COLUMN IF NOT EXISTS store_id INTEGER NOT NULL DEFAULT 1 REFERENCES store (store_id)',
+            t.name
+        );
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I (store_id, %I)', t.name || '_store_id_idx', t.name, t.pk);
+    END LOOP;
+END $$;
+
+-- Change feed for the tills of one store
+CREATE INDEX IF NOT EXISTS product_store_updated_at_idx ON product (store_id, updated_at);
+CREATE INDEX IF NOT EXISTS customer_store_updated_at_idx ON customer (store_id, updated_at);
+CREATE INDEX IF NOT EXISTS employee_store_updated_at_idx ON employee (store_id, updated_at);
+
+ALTER TABLE sync_tombstones ADD COLUMN IF NOT EXISTS store_id INTEGER;
+UPDATE sync_tombstones SET store_id = 1 WHERE store_id IS NULL;
+CREATE INDEX IF NOT EXISTS sync_tombstones_store_deleted_at_idx ON sync_tombstones (store_id, deleted_at);
+
+CREATE OR REPLACE FUNCTION record_sync_tombstone() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sync_tombstones (entity, pk, store_id)
+    VALUES (TG_TABLE_NAME, to_jsonb(OLD) ->> TG_ARGV[0], OLD.store_id)
+    ON CONFLICT (entity, pk) DO UPDATE SET deleted_at = EXCLUDED.deleted_at, store_id = EXCLUDED.store_id;
+    RETURN OLD;
+END $$;
+
+-- customer_summary has one row per customer, so its store is the customer's
+ALTER TABLE customer_summary ADD COLUMN IF NOT EXISTS store_id INTEGER;
+UPDATE customer_summary s SET store_id = c.store_id FROM customer c WHERE c.c_id = s.c_id;
+ALTER TABLE customer_summary ALTER COLUMN store_id SET NOT NULL;
+DROP INDEX IF EXISTS customer_summary_spend_idx;
+DROP INDEX IF EXISTS customer_summary_recent_idx;
+DROP INDEX IF EXISTS customer_summary_count_idx;
+CREATE INDEX IF NOT EXISTS customer_summary_store_spend_idx ON customer_summary (store_id, total_spend DESC, c_id);
+CREATE INDEX IF NOT EXISTS customer_summary_store_recent_idx ON customer_summary (store_id, last_purchase DESC NULLS LAST, c_id);
+CREATE INDEX IF NOT EXISTS customer_summary_store_count_idx ON customer_summary (store_id, invoice_count DESC, c_id);
+
+-- product_sales_daily buckets are keyed by store first, so one store's
+-- range scans stay as narrow as before
+ALTER TABLE product_sales_daily ADD COLUMN IF NOT EXISTS store_id INTEGER NOT NULL DEFAULT 1;
+UPDATE product_sales_daily d SET store_id = p.store_id FROM product p WHERE p.p_id = d.p_id AND d.store_id <> p.store_id;
+ALTER TABLE product_sales_daily ALTER COLUMN store_id DROP DEFAULT;
+ALTER TABLE product_sales_daily DROP CONSTRAINT IF EXISTS product_sales_daily_pkey;
+ALTER TABLE product_sales_daily ADD PRIMARY KEY (store_id, day, p_id) INCLUDE (units, cost);
+ANALYZE product_sales_daily;
+
+ALTER TABLE audit_log ADD COLUMN IF NOT EXISTS store_id INTEGER;
+CREATE INDEX IF NOT EXISTS audit_log_store_id_idx ON audit_log (store_id, id);
+
+-- Jobs are queued by (and exports cover) one store
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS store_id INTEGER NOT NULL DEFAULT 1;
+CREATE INDEX IF NOT EXISTS jobs_store_id_idx ON jobs (store_id, id);
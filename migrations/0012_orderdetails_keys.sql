@@ -0,0 +1,81 @@
+-- Give orderdetails back a unique order_id.
+--
+-- Since 0006 the partitioned table only had a plain index on order_id, so a
+-- duplicate Order_Id was accepted and then matched several rows on update,
+-- delete and lookup. A unique constraint on a partitioned table must include
+-- the partition key, and invoice_date is NULL for lines without an invoice,
+-- so it cannot be a primary key:
+--   * (order_id, invoice_date) is unique, which also gives every partition a
+--     unique index to find a line by order_id;
+--   * orderdetails_ids holds every order_id in use, kept by triggers, and
+--     rejects an id that any partition already has.
+-- A cross-partition UPDATE (an invoice changing month) runs as a delete
+-- followed by an insert, so its AFTER DELETE and AFTER INSERT triggers keep
+-- the id registered.
+
+LOCK TABLE orderdetails IN SHARE ROW EXCLUSIVE MODE;
+
+DO $$
+DECLARE
+    duplicates integer;
+BEGIN
+    SELECT COUNT(*) INTO duplicates FROM (
+        SELECT order_id FROM orderdetails GROUP BY order_id HAVING COUNT(*) > 1
+    ) d;
+    IF duplicates > 0 THEN
+        RAISE EXCEPTION '% order_id value(s) are used by more than one order line; renumber them first', duplicates;
+    END IF;
+END $$;
+
+ALTER TABLE orderdetails ALTER COLUMN order_id SET NOT NULL;
+
+CREATE TABLE IF NOT EXISTS orderdetails_ids (
+    order_id BIGINT PRIMARY KEY
+);
+
+INSERT INTO orderdetails_ids (order_id)
+SELECT order_id FROM orderdetails
+ON CONFLICT (order_id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION claim_order_id() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO orderdetails_ids (order_id) VALUES (NEW.order_id) ON CONFLICT (order_id) DO NOTHING;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Order_Id % already exists', NEW.order_id USING ERRCODE = 'unique_violation';
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION release_order_id() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM orderdetails_ids WHERE order_id = OLD.order_id;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS orderdetails_release_order_id ON orderdetails;
+CREATE TRIGGER orderdetails_release_order_id
+    AFTER DELETE ON orderdetails
+    FOR EACH ROW EXECUTE FUNCTION release_order_id();
+
+DROP TRIGGER IF EXISTS orderdetails_claim_order_id ON orderdetails;
+CREATE TRIGGER orderdetails_claim_order_id
+    AFTER INSERT ON orderdetails
+    FOR EACH ROW EXECUTE FUNCTION claim_order_id();
+
+-- An order_id changed in place (same partition). Triggers fire in name
+-- order, so the old id is released before the new one is claimed.
+DROP TRIGGER IF EXISTS orderdetails_release_changed_order_id ON orderdetails;
+CREATE TRIGGER orderdetails_release_changed_order_id
+    AFTER UPDATE OF order_id ON orderdetails
+    FOR EACH ROW WHEN (OLD.order_id IS DISTINCT FROM NEW.order_id) EXECUTE FUNCTION release_order_id();
+DROP TRIGGER IF EXISTS orderdetails_zclaim_changed_order_id ON orderdetails;
+CREATE TRIGGER orderdetails_zclaim_changed_order_id
+    AFTER UPDATE OF order_id ON orderdetails
+    FOR EACH ROW WHEN (OLD.order_id IS DISTINCT FROM NEW.order_id) EXECUTE FUNCTION claim_order_id();
+
+ALTER TABLE orderdetails ADD CONSTRAINT orderdetails_order_id_invoice_date_key UNIQUE (order_id, invoice_date);
+DROP INDEX IF EXISTS orderdetails_order_id_idx;
+
+ANALYZE orderdetails_ids;
@@ -0,0 +1,33 @@
+-- Totals of archived invoices per customer.
+--
+-- `migrate.py archive` drops old invoice partitions, but customer_summary
+-- is recomputed from invoices whenever a customer's invoice changes and on
+-- a rebuild. Archiving now folds each invoice partition into
+-- customer_summary_archived before dropping it, and the recomputations add
+-- these totals to the live ones.
+CREATE TABLE IF NOT EXISTS customer_summary_archived (
+    c_id INTEGER PRIMARY KEY REFERENCES customer (c_id) ON DELETE CASCADE,
+    total_spend NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    invoice_count INTEGER NOT NULL DEFAULT 0,
+    first_purchase DATE,
+    last_purchase DATE
+);
+
+-- Partitions archived before this migration survive only in the summaries:
+-- whatever a summary holds beyond the live invoices is archived history.
+-- Its last purchase date is not known when live invoices remain; the first
+-- purchase date stands in for it (it only matters once those are deleted).
+INSERT INTO customer_summary_archived (c_id, total_spend, invoice_count, first_purchase, last_purchase)
+SELECT s.c_id,
+       s.total_spend - COALESCE(l.total_spend, 0),
+       s.invoice_count - COALESCE(l.invoice_count, 0),
+       s.first_purchase,
+       CASE WHEN l.invoice_count IS NULL THEN s.last_purchase ELSE s.first_purchase END
+FROM customer_summary s
+LEFT JOIN (
+    SELECT c_id, SUM(amount) AS total_spend, COUNT(*) AS invoice_count
+    FROM invoice
+    GROUP BY c_id
+) l ON l.c_id = s.c_id
+WHERE s.invoice_count > COALESCE(l.invoice_count, 0)
+ON CONFLICT (c_id) DO NOTHING;
@@ -0,0 +1,12 @@
+-- Keep server-assigned and user-entered order line ids apart.
+--
+-- Order_Id is typed in by users for lines created through the API, while
+-- till sales draw ids from the orderdetails sequence (0007). The sequence
+-- now continues from 1000000000 (main.ORDER_ID_SERVER_START), and the API
+-- rejects user ids from there up. Ids the sequence handed out before this
+-- migration stay where they are; orderdetails_ids (0012) rejects any later
+-- collision with them instead of letting it through.
+SELECT setval(
+    pg_get_serial_sequence('orderdetails', 'order_id'),
+    GREATEST((SELECT MAX(order_id) FROM orderdetails), 999999999)
+);
@@ -0,0 +1,63 @@
+-- Let a month's partition be created after rows for it reached the default.
+--
+-- A row dated in a month without a partition (say after a missed
+-- `migrate.py partitions` run) lands in the DEFAULT partition, and
+-- creating that month's partition afterwards failed with "updated
+-- partition constraint for default partition would be violated".
+-- create_monthly_partitions now takes such rows out of the default
+-- partition, creates the partition and inserts them again through the
+-- parent, so they land in the new month. The delete and the insert fire the
+-- row triggers as a cross-partition move does, which keeps orderdetails_ids
+-- (0012) in step.
+
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent regclass, first_month date, last_month date)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', first_month)::date;
+    next_month date;
+    partition_name text;
+    default_partition regclass;
+    partition_key name;
+    has_rows boolean;
+    created integer := 0;
+BEGIN
+    SELECT NULLIF(pt.partdefid, 0)::regclass, a.attname
+    INTO default_partition, partition_key
+    FROM pg_partitioned_table pt
+    JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+    WHERE pt.partrelid = parent;
+
+    WHILE month <= last_month LOOP
+        next_month := (month + interval '1 month')::date;
+        partition_name := format('%s_%s', (SELECT relname FROM pg_class WHERE oid = parent), to_char(month, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            has_rows := false;
+            IF default_partition IS NOT NULL THEN
+                EXECUTE format(
+                    'SELECT EXISTS (SELECT 1 FROM %s WHERE %I >= %L AND %I < %L)',
+                    default_partition, partition_key, month, partition_key, next_month
+                ) INTO has_rows;
+            END IF;
+            IF has_rows THEN
+                EXECUTE format('CREATE TEMP TABLE moving_rows (LIKE %s) ON COMMIT DROP', parent);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %s WHERE %I >= %L AND %I < %L RETURNING *) '
+                    'INSERT INTO moving_rows SELECT * FROM moved',
+                    default_partition, partition_key, month, partition_key, next_month
+                );
+            END IF;
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                partition_name, parent, month, next_month
+            );
+            IF has_rows THEN
+                EXECUTE format('INSERT INTO %s SELECT * FROM moving_rows', parent);
+                DROP TABLE moving_rows;
+            END IF;
+            created := created + 1;
+        END IF;
+        month := next_month;
+    END LOOP;
+    RETURN created;
+END $$;
@@ -0,0 +1,29 @@
+-- Record the selling price on each order line.
+--
+-- Analytics derived revenue and margin from product.price when the buckets
+-- were read, so changing a price rewrote the revenue of every past sale.
+-- orderdetails.unit_price now holds the product's price when the line was
+-- written, and product_sales_daily sums quantity * unit_price into revenue
+-- as lines are added and removed. Prices before this migration are not
+-- known; existing lines and buckets take the current price, which is what
+-- they reported until now.
+
+ALTER TABLE orderdetails ADD COLUMN IF NOT EXISTS unit_price NUMERIC(12, 2);
+
+UPDATE orderdetails od
+SET unit_price = p.price
+FROM product p
+WHERE p.p_id = od.p_id AND p.store_id = od.store_id AND od.unit_price IS NULL;
+
+ALTER TABLE product_sales_daily ADD COLUMN IF NOT EXISTS revenue NUMERIC(16, 2) NOT NULL DEFAULT 0;
+
+UPDATE product_sales_daily d
+SET revenue = d.units * COALESCE(p.price, 0)
+FROM product p
+WHERE p.p_id = d.p_id AND p.store_id = d.store_id;
+
+ALTER TABLE product_sales_daily DROP CONSTRAINT IF EXISTS product_sales_daily_pkey;
+ALTER TABLE product_sales_daily ADD PRIMARY KEY (store_id, day, p_id) INCLUDE (units, cost, revenue);
+
+ANALYZE orderdetails;
+ANALYZE product_sales_daily;
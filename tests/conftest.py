@@ -0,0 +1,84 @@
+"""
+Shared test setup.
+
+The API runs with the in-memory storage engine (VIJAY_STORAGE=memory) and
+requests are driven through the ASGI app in-process, so most tests need no
+Postgres. Tests that do need one use the `database` fixture, which skips
+when the server in main.DB_CONFIG is unreachable.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["VIJAY_STORAGE"] = "memory"
+
+import main  # noqa: E402
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+async def asgi_request(method, path, query, body, headers):
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": query.encode(),
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json")]
+                   + [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 50000), "server": ("test", 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    status, response_headers, chunks = None, {}, []
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update(
+                (k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", [])
+            )
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await main.app(scope, receive, send)
+    return Response(status, response_headers, b"".join(chunks))
+
+@pytest.fixture
+def api():
+    """api(method, path, query="", body=None, store=None, headers=None) -> Response"""
+    def request(method, path, query="", body=None, store=None, headers=None):
+        headers = dict(headers or {})
+        if store is not None:
+            headers["X-Store-Id"] = str(store)
+        return asyncio.run(asgi_request(method, path, query, body, headers))
+    return request
+
+@pytest.fixture
+def database():
+    try:
+        conn = psycopg2.connect(**main.DB_CONFIG)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres unavailable: {e}")
+    conn.close()
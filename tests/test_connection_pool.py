@@ -0,0 +1,41 @@
+import main
+
+def test_closing_a_dead_connection_frees_its_slot(database):
+    pool = main.ConnectionPool(maxconn=2, timeout=1, **main.DB_CONFIG)
+    conn = pool.acquire()
+    assert pool.size == 1
+    # Closed underneath the pool, as after a server restart
+    main.psycopg2.extensions.connection.close(conn)
+    conn.close()
+    assert pool.size == 0
+    assert pool.idle == []
+    pool.close_all()
+
+def test_closing_a_connection_whose_rollback_fails_frees_its_slot(database):
+    pool = main.ConnectionPool(maxconn=2, timeout=1, **main.DB_CONFIG)
+    conn = pool.acquire()
+    cur = conn.cursor()
+    cur.execute("SELECT 1;")
+    cur.close()
+
+    def broken_rollback():
+        raise main.psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    conn.rollback = broken_rollback
+    conn.close()
+    assert conn.closed
+    assert pool.size == 0
+    assert pool.idle == []
+    pool.close_all()
+
+def test_pool_recovers_after_maxconn_broken_connections(database):
+    pool = main.ConnectionPool(maxconn=2, timeout=1, **main.DB_CONFIG)
+    for _ in range(3):
+        conn = pool.acquire()
+        main.psycopg2.extensions.connection.close(conn)
+        conn.close()
+    conn = pool.acquire()
+    assert not conn.closed
+    conn.close()
+    assert pool.size == 1
+    pool.close_all()
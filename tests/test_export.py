@@ -0,0 +1,24 @@
+import io
+
+import main
+
+COLUMNS = ["order_id", "quantity", "cost", "i_id", "p_id", "store_id", "invoice_date"]
+
+def files(text):
+    return io.StringIO(text), io.StringIO()
+
+def test_archive_without_store_columns_is_written_as_the_live_columns():
+    src, dst = files("order_id,quantity,cost,i_id,p_id\n1,2,3.0,4,5\n")
+    main.copy_archived_rows(src, dst, main.DEFAULT_STORE_ID, COLUMNS)
+    assert dst.getvalue() == f"1,2,3.0,4,5,{main.DEFAULT_STORE_ID},\n"
+
+def test_archive_without_store_column_has_no_rows_for_other_stores():
+    src, dst = files("order_id,quantity,cost,i_id,p_id\n1,2,3.0,4,5\n")
+    main.copy_archived_rows(src, dst, main.DEFAULT_STORE_ID + 1, COLUMNS)
+    assert dst.getvalue() == ""
+
+def test_archive_rows_are_filtered_by_store_and_reordered():
+    src, dst = files("store_id,order_id,quantity,cost,i_id,p_id,invoice_date\n"
+                        "2,7,1,1.5,8,9,2024-01-03\n3,8,1,1.5,8,9,2024-01-03\n")
+    main.copy_archived_rows(src, dst, 2, COLUMNS)
+    assert dst.getvalue() == "7,1,1.5,8,9,2,2024-01-03\n"
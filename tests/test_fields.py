@@ -0,0 +1,22 @@
+import pytest
+
+PRODUCT = {"name": "Rice 5kg", "category": "Grains", "stock": 12, "price": 9.5, "s_id": None}
+
+@pytest.fixture
+def product(api):
+    return api("POST", "/api/products", body=PRODUCT).json()
+
+def test_fields_selects_the_named_fields(api, product):
+    response = api("GET", f"/api/products/{product['P_id']}", "fields=name,price")
+    assert response.status == 200
+    assert response.json() == {"name": "Rice 5kg", "price": 9.5}
+
+@pytest.mark.parametrize("fields", [",", " , ,", "%2C"])
+def test_empty_field_list_is_rejected(api, product, fields):
+    assert api("GET", f"/api/products/{product['P_id']}", f"fields={fields}").status == 400
+    assert api("GET", "/api/products", f"fields={fields}").status == 400
+
+def test_unknown_field_is_rejected(api, product):
+    response = api("GET", "/api/products", "fields=name,colour")
+    assert response.status == 400
+    assert "colour" in response.json()["detail"]
@@ -0,0 +1,18 @@
+PRODUCT = {"name": "Rice 1kg", "category": "Grains", "stock": 10, "price": 2.5, "s_id": None}
+
+def test_keyed_post_runs_once_and_is_replayed(api):
+    headers = {"Idempotency-Key": "create-rice-1"}
+    first = api("POST", "/api/products", body=PRODUCT, store=1, headers=headers)
+    assert first.status == 200
+    again = api("POST", "/api/products", body=PRODUCT, store=1, headers=headers)
+    assert again.status == 200
+    assert again.headers["idempotent-replayed"] == "true"
+    assert again.json() == first.json()
+    names = [p["name"] for p in api("GET", "/api/products", store=1).json()]
+    assert names.count("Rice 1kg") == 1
+
+def test_key_reused_for_a_different_request_is_rejected(api):
+    headers = {"Idempotency-Key": "create-rice-2"}
+    assert api("POST", "/api/products", body=PRODUCT, store=1, headers=headers).status == 200
+    other = dict(PRODUCT, name="Rice 5kg")
+    assert api("POST", "/api/products", body=other, store=1, headers=headers).status == 422
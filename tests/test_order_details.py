@@ -0,0 +1,26 @@
+import pytest
+
+@pytest.fixture
+def invoice(api):
+    body = {"date": "2024-05-02", "amount": 12.0, "paymentMethod": "Cash", "c_id": None, "e_id": None}
+    return api("POST", "/api/invoices", body=body).json()
+
+def line(order_id, invoice):
+    return {"Order_Id": str(order_id), "quantity": 2, "cost": 3.5, "i_id": int(invoice["Lid"]), "p_id": None}
+
+def test_duplicate_order_id_is_rejected(api, invoice):
+    assert api("POST", "/api/order-details", body=line(9001, invoice)).status == 200
+    assert api("POST", "/api/order-details", body=line(9001, invoice)).status == 400
+    assert api("GET", "/api/order-details/9001").json()["quantity"] == 2
+
+def test_update_to_an_existing_order_id_is_rejected(api, invoice):
+    api("POST", "/api/order-details", body=line(9011, invoice))
+    api("POST", "/api/order-details", body=line(9012, invoice))
+    assert api("PUT", "/api/order-details/9011", body=line(9012, invoice)).status == 400
+    assert api("GET", "/api/order-details/9011").status == 200
+
+def test_order_id_in_the_server_range_is_rejected(api, invoice):
+    assert api("POST", "/api/order-details", body=line(1_000_000_000, invoice)).status == 400
+    api("POST", "/api/order-details", body=line(9021, invoice))
+    assert api("PUT", "/api/order-details/9021", body=line(1_000_000_001, invoice)).status == 400
+    assert api("GET", "/api/order-details/9021").status == 200
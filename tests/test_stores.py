@@ -0,0 +1,51 @@
+import pytest
+
+PRODUCT = {"name": "Tea 250g", "category": "Drinks", "stock": 4, "price": 3.0, "s_id": None}
+
+def customer(name):
+    return {"name": {"firstName": name, "secondName": "Store"}, "email": f"{name}@example.com",
+            "phone": ["9800000000"], "address": "Market Road"}
+
+def invoice(c_id=None, e_id=None):
+    return {"date": "2024-05-02", "amount": 10.0, "paymentMethod": "Cash", "c_id": c_id, "e_id": e_id}
+
+@pytest.fixture
+def store_1_customer(api):
+    return int(api("POST", "/api/customers", body=customer("one"), store=1).json()["C_id"])
+
+def test_rows_are_only_visible_in_their_store(api):
+    p_id = api("POST", "/api/products", body=PRODUCT, store=2).json()["P_id"]
+    assert api("GET", f"/api/products/{p_id}", store=2).status == 200
+    assert api("GET", f"/api/products/{p_id}", store=1).status == 404
+    assert api("GET", f"/api/products/{p_id}").status == 404
+    assert p_id not in {p["P_id"] for p in api("GET", "/api/products", store=1).json()}
+    assert api("PUT", f"/api/products/{p_id}", body=PRODUCT, store=1).status == 404
+    assert api("DELETE", f"/api/products/{p_id}", store=1).status == 404
+
+def test_invoice_cannot_name_a_customer_of_another_store(api, store_1_customer):
+    assert api("POST", "/api/invoices", body=invoice(c_id=store_1_customer), store=2).status == 400
+    assert api("POST", "/api/invoices", body=invoice(c_id=store_1_customer), store=1).status == 200
+
+def test_update_cannot_move_a_reference_to_another_store(api, store_1_customer):
+    i_id = api("POST", "/api/invoices", body=invoice(), store=2).json()["Lid"]
+    assert api("PUT", f"/api/invoices/{i_id}", body=invoice(c_id=store_1_customer), store=2).status == 400
+    assert api("GET", f"/api/invoices/{i_id}", store=2).json()["c_id"] is None
+
+def test_order_line_cannot_name_an_invoice_or_product_of_another_store(api):
+    i_id = int(api("POST", "/api/invoices", body=invoice(), store=1).json()["Lid"])
+    p_id = int(api("POST", "/api/products", body=PRODUCT, store=1).json()["P_id"])
+    line = {"Order_Id": "9101", "quantity": 1, "cost": 2.0, "i_id": i_id, "p_id": None}
+    assert api("POST", "/api/order-details", body=line, store=2).status == 400
+    line.update(i_id=None, p_id=p_id)
+    assert api("POST", "/api/order-details", body=line, store=2).status == 400
+    assert api("POST", "/api/order-details", body=line, store=1).status == 200
+
+def test_product_cannot_name_a_supplier_of_another_store(api):
+    supplier = {"name": "Acme", "address": "Depot", "email": "acme@example.com", "phone": ["9700000000"]}
+    s_id = int(api("POST", "/api/suppliers", body=supplier, store=1).json()["S_id"])
+    assert api("POST", "/api/products", body=dict(PRODUCT, s_id=s_id), store=2).status == 400
+    assert api("POST", "/api/products", body=dict(PRODUCT, s_id=s_id), store=1).status == 200
+
+def test_invalid_store_header_is_rejected(api):
+    assert api("GET", "/api/products", store="abc").status == 400
+    assert api("GET", "/api/products", store=0).status == 400
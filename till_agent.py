@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Till agent: keeps the till selling when the store network drops.
+
+Run one per till and point the till's API_BASE_URL at it
+(http://localhost:3001/api by default):
+
+    python till_agent.py --server http://<api-host>:3000/api --till-id till-1
+
+- Products, customers and employees are copied into a local SQLite file and
+  kept current from the server's change feed (/api/sync/changes). Reads of
+  those entities are answered from memory, without a network round trip.
+- Sales posted to /api/till/sales are written to a local outbox first and
+  pushed to the server (/api/sync/sales) in batches whenever it is
+  reachable. Each sale has a client reference, so a batch that is sent
+  twice is only booked once.
+- Every other request is passed through to the server, and fails with 503
+  while it cannot be reached.
+
+Only sales posted to /api/till/sales (by the till's point-of-sale front
+end) are taken offline. The web UI in this repository creates invoices
+and order lines through the regular endpoints, so with the server
+unreachable it can browse products, customers and employees but not sell.
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+logger = logging.getLogger("vijay_sales.till")
+
+# entity -> id field in the frontend format
+REPLICATED = {"products": "P_id", "customers": "C_id", "employees": "E_id"}
+SYNC_INTERVAL = 5.0
+MAX_BACKOFF = 60.0
+PUSH_BATCH = 200
+REQUEST_TIMEOUT = 10
+
+def id_order(id_):
+    """Sort key putting numeric ids in numeric order, as the server lists them"""
+    return (len(id_), id_)
+
+class LocalStore:
+    """SQLite replica of the synced entities plus the outbox of unsent sales.
+
+    The replicated rows are also held in memory as ready-to-send JSON, which
+    is what reads are served from; SQLite keeps them across restarts.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL;")
+        self.lock = threading.Lock()
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS replica (
+                entity TEXT NOT NULL,
+                id TEXT NOT NULL,
+                doc TEXT NOT NULL,
+                PRIMARY KEY (entity, id)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS outbox (
+                client_ref TEXT PRIMARY KEY,
+                sale TEXT NOT NULL,
+                queued_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                result TEXT
+            );
+        """)
+        self.docs = {}
+        self.order = {}
+        self.lists = {}
+        for entity in REPLICATED:
+            rows = self.db.execute("SELECT id, doc FROM replica WHERE entity = ?;", (entity,)).fetchall()
+            self.docs[entity] = {id_: doc for id_, doc in rows}
+            self.rebuild_list(entity)
+
+    def rebuild_list(self, entity):
+        docs = self.docs[entity]
+        ordered = self.order[entity] = sorted(docs, key=id_order)
+        self.lists[entity] = ("[" + ",".join(docs[id_] for id_ in ordered) + "]").encode()
+
+    def get_state(self, key):
+        row = self.db.execute("SELECT value FROM sync_state WHERE key = ?;", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        self.db.execute(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value;",
+            (key, value),
+        )
+
+    def apply_changes(self, changes):
+        """Apply one /api/sync/changes response and advance the cursor"""
+        with self.lock:
+            self.db.execute("BEGIN;")
+            try:
+                for entity, id_field in REPLICATED.items():
+                    if changes["reset"]:
+                        self.db.execute("DELETE FROM replica WHERE entity = ?;", (entity,))
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO replica (entity, id, doc) VALUES (?, ?, ?);",
+                        [(entity, str(row[id_field]), json.dumps(row)) for row in changes["upserts"][entity]],
+                    )
+                    self.db.executemany(
+                        "DELETE FROM replica WHERE entity = ? AND id = ?;",
+                        [(entity, id_) for id_ in changes["deletes"][entity]],
+                    )
+                self.set_state("cursor", changes["cursor"])
+                self.db.execute("COMMIT;")
+            except Exception:
+                self.db.execute("ROLLBACK;")
+                raise
+            for entity, id_field in REPLICATED.items():
+                docs = {} if changes["reset"] else dict(self.docs[entity])
+                for row in changes["upserts"][entity]:
+                    docs[str(row[id_field])] = json.dumps(row)
+                for id_ in changes["deletes"][entity]:
+                    docs.pop(id_, None)
+                self.docs[entity] = docs
+                self.rebuild_list(entity)
+
+    def queue_sale(self, sale):
+        sale.setdefault("clientRef", str(uuid.uuid4()))
+        sale.setdefault("date", date.today().isoformat())
+        with self.lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO outbox (client_ref, sale, queued_at) VALUES (?, ?, ?);",
+                (sale["clientRef"], json.dumps(sale), time.time()),
+            )
+        return sale
+
+    def pending_sales(self, limit):
+        rows = self.db.execute(
+            "SELECT sale FROM outbox WHERE status = 'pending' ORDER BY queued_at LIMIT ?;", (limit,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def record_results(self, results):
+        """Drop booked sales from the outbox; keep rejected ones for review"""
+        with self.lock:
+            self.db.execute("BEGIN;")
+            for result in results:
+                if result["status"] == "rejected":
+                    self.db.execute(
+                        "UPDATE outbox SET status = 'rejected', result = ? WHERE client_ref = ?;",
+                        (json.dumps(result), result["clientRef"]),
+                    )
+                else:
+                    self.db.execute("DELETE FROM outbox WHERE client_ref = ?;", (result["clientRef"],))
+            self.db.execute("COMMIT;")
+
+    def outbox_counts(self):
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status;").fetchall())
+
+class SyncLoop(threading.Thread):
+    """Pulls the change feed and pushes queued sales, backing off while offline"""
+
+    def __init__(self, store, server, till_id, store_id=None, interval=SYNC_INTERVAL):
+        super().__init__(name="till-sync", daemon=True)
+        self.store = store
+        self.server = server.rstrip("/")
+        self.till_id = till_id
+        self.headers = {"Content-Type": "application/json"}
+        if store_id is not None:
+            self.headers["X-Store-Id"] = str(store_id)
+        self.interval = interval
+        self.online = False
+        self.last_sync = None
+        self.wake = threading.Event()
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(
+            self.server + path, data=data, method=method, headers=self.headers
+        )
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+            return json.loads(response.read())
+
+    def pull(self):
+        cursor = self.store.get_state("cursor")
+        path = "/sync/changes" + (f"?since={quote(cursor)}" if cursor else "")
+        self.store.apply_changes(self.request("GET", path))
+
+    def send_sales(self, sales):
+        """Push one batch; if the server refuses it as malformed, resend the
+        sales one by one so only the bad ones are marked rejected"""
+        try:
+            return self.request("POST", "/sync/sales", {"tillId": self.till_id, "sales": sales})["results"]
+        except urllib.error.HTTPError as e:
+            if e.code not in (400, 422):
+                raise
+            if len(sales) == 1:
+                return [{"clientRef": sales[0]["clientRef"], "status": "rejected", "detail": e.read().decode(errors="replace")}]
+            return [result for sale in sales for result in self.send_sales([sale])]
+
+    def push(self):
+        while True:
+            sales = self.store.pending_sales(PUSH_BATCH)
+            if not sales:
+                return
+            results = self.send_sales(sales)
+            self.store.record_results(results)
+            for result in results:
+                if result["status"] == "rejected":
+                    logger.warning("Sale %s rejected: %s", result["clientRef"], result.get("detail"))
+                elif result.get("conflicts"):
+                    logger.info("Sale %s booked with conflicts: %s", result["clientRef"], result["conflicts"])
+            if len(sales) < PUSH_BATCH:
+                return
+
+    def run(self):
+        delay = self.interval
+        while True:
+            try:
+                self.push()
+                self.pull()
+                if not self.online:
+                    logger.info("Server reachable, till is online")
+                self.online = True
+                self.last_sync = time.time()
+                delay = self.interval
+            except (urllib.error.URLError, OSError) as e:
+                if self.online:
+                    logger.warning("Server unreachable, till is offline: %s", e)
+                self.online = False
+                delay = min(delay * 2, MAX_BACKOFF)
+            except Exception:
+                logger.exception("Sync failed")
+                delay = min(delay * 2, MAX_BACKOFF)
+            self.wake.wait(delay)
+            self.wake.clear()
+
+class TillRequestHandler(BaseHTTPRequestHandler):
+    store = None
+    sync = None
+
+    def send_json(self, status, body):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cors_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, Idempotency-Key, X-Store-Id")
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_cors_headers()
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts[:1] == ["api"] and len(parts) in (2, 3) and parts[1] in REPLICATED:
+            return self.serve_replica(parts[1], parts[2] if len(parts) == 3 else None, parse_qs(url.query))
+        if url.path.rstrip("/") == "/api/till/status":
+            return self.send_json(200, {
+                "online": self.sync.online,
+                "lastSync": self.sync.last_sync,
+                "outbox": self.store.outbox_counts(),
+            })
+        self.proxy()
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip("/") == "/api/till/sales":
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                sale = json.loads(self.rfile.read(length))
+            except ValueError:
+                return self.send_json(400, {"detail": "Body must be JSON"})
+            if not isinstance(sale, dict):
+                return self.send_json(400, {"detail": "Body must be a JSON object"})
+            sale = self.store.queue_sale(sale)
+            self.sync.wake.set()
+            return self.send_json(202, {"clientRef": sale["clientRef"], "queued": True})
+        self.proxy()
+
+    def do_PUT(self):
+        self.proxy()
+
+    do_DELETE = do_PUT
+
+    def serve_replica(self, entity, id_, query):
+        if id_ == "count":
+            return self.send_json(200, {"count": len(self.store.docs[entity])})
+        fields = query.get("fields", [""])[0]
+        if id_ is None:
+            after, limit = query.get("after", [None])[0], query.get("limit", [None])[0]
+            if limit is not None and not limit.isdigit():
+                return self.send_json(400, {"detail": "limit must be a positive integer"})
+            if after is None and limit is None and not fields:
+                return self.send_json(200, self.store.lists[entity])
+            ordered, docs = self.store.order[entity], self.store.docs[entity]
+            start = bisect.bisect_right(ordered, id_order(after), key=id_order) if after else 0
+            ids = ordered[start:start + int(limit)] if limit else ordered[start:]
+            # A sync may have swapped in a newer copy between the two reads
+            docs = [json.loads(docs[i]) for i in ids if i in docs]
+            if not fields:
+                return self.send_json(200, docs)
+        else:
+            doc = self.store.docs[entity].get(id_)
+            if doc is None:
+                return self.send_json(404, {"detail": f"{entity[:-1].capitalize()} not found"})
+            if not fields:
+                return self.send_json(200, doc.encode())
+            docs = [json.loads(doc)]
+        wanted = {f.strip() for f in fields.split(",")}
+        docs = [{k: v for k, v in doc.items() if k in wanted} for doc in docs]
+        self.send_json(200, docs if id_ is None else docs[0])
+
+    def proxy(self):
+        """Forward the request to the server unchanged"""
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else None
+        headers = {k: v for k, v in self.headers.items() if k.lower() in ("content-type", "idempotency-key")}
+        # Every request through this till is for the till's own store
+        if "X-Store-Id" in self.sync.headers:
+            headers["X-Store-Id"] = self.sync.headers["X-Store-Id"]
+        upstream = self.sync.server + self.path[len("/api"):] if self.path.startswith("/api") else None
+        if upstream is None:
+            return self.send_json(404, {"detail": "Not Found"})
+        req = urllib.request.Request(upstream, data=data, method=self.command, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+                self.send_json(response.status, response.read())
+        except urllib.error.HTTPError as e:
+            self.send_json(e.code, e.read())
+        except (urllib.error.URLError, OSError):
+            self.send_json(503, {"detail": "Server unreachable; only products, customers, employees and sales are available offline"})
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", default="http://localhost:3000/api", help="API base URL of main.py")
+    parser.add_argument("--till-id", required=True, help="name of this till, recorded with its sales")
+    parser.add_argument("--store-id", type=int, help="store this till belongs to (default: the server's default store)")
+    parser.add_argument("--db", default="till.sqlite3", help="SQLite file for the local copy and outbox")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--interval", type=float, default=SYNC_INTERVAL, help="seconds between syncs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    store = LocalStore(args.db)
+    sync = SyncLoop(store, args.server, args.till_id, args.store_id, args.interval)
+    sync.start()
+    TillRequestHandler.store = store
+    TillRequestHandler.sync = sync
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), TillRequestHandler)
+    print(f"Till agent for {args.till_id} on http://localhost:{args.port}/api, syncing with {args.server}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nTill agent stopped")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()